@@ -22,3 +22,79 @@ class Config:
     
     # ✅ NUEVA CONFIGURACIÓN PARA FLASK-JWT-EXTENDED
     JWT_IDENTITY_CLAIM = 'sub'  # Asegurar que use 'sub' como claim de identidad
+
+    # 🌍 GEOCODIFICACIÓN DE PARROQUIAS (se ejecuta en backend, nunca desde el navegador)
+    # Proveedor: 'nominatim' (OpenStreetMap) o 'ninguno' (sólo cache, sin llamadas externas)
+    GEOCODER_PROVIDER = os.environ.get('GEOCODER_PROVIDER', 'nominatim')
+    GEOCODER_REGION = os.environ.get('GEOCODER_REGION', 'Lambayeque, Perú')
+    GEOCODER_TIMEOUT = 5  # segundos por consulta al proveedor
+    GEOCODER_USER_AGENT = 'parroquia-system/1.0 (geocodificacion de parroquias)'
+    GEOCODER_CACHE_NEGATIVO_DIAS = 30  # días antes de reintentar una dirección no encontrada
+
+    # 📍 Índice espacial de parroquias (por worker): segundos antes de reconstruirlo
+    SPATIAL_INDEX_TTL = 300
+
+    # 📥 Importación masiva de personas (CSV → COPY): filas validadas por bloque
+    PERSONA_IMPORT_CHUNK = 5000
+    MAX_CONTENT_LENGTH = 64 * 1024 * 1024  # 64 MB por subida (padrones grandes)
+
+    # 👥 Detección de personas duplicadas (scripts/dedupe_personas.py)
+    PERSONA_DEDUPE_UMBRAL = 0.85      # puntaje mínimo para proponer una fusión
+    PERSONA_DEDUPE_MAX_BLOQUE = 50    # bloques más grandes no se comparan par a par
+
+    # 📤 Exportación de reservas en streaming: filas por bloque leídas del cursor de servidor
+    RESERVAS_EXPORT_BATCH = 2000
+
+    # 📅 Calendario litúrgico: cache por (parroquia, día) y rango máximo por consulta
+    CALENDARIO_CACHE_TTL = 120  # segundos (otros workers pueden haber escrito)
+    CALENDARIO_MAX_DIAS = 400
+
+    # 🔁 Recurrencias de horarios: horizonte por defecto y máximo al expandir reglas
+    RECURRENCIA_HORIZONTE_DIAS = 365
+    RECURRENCIA_HORIZONTE_MAX_DIAS = 800
+
+    # 📦 Operaciones en lote (horarios / reservas): máximo de elementos por petición
+    HORARIOS_BULK_MAX = 1000
+    RESERVAS_BATCH_MAX = 500
+    HORARIOS_CONFLICTOS_MAX = 1000  # pares devueltos por /horarios/conflictos
+
+    # 🕰️ Disponibilidad: jornada por defecto (parroquias sin filas en parroquia_jornada),
+    # duración en minutos por tipo de acto y rango máximo por consulta
+    DISPONIBILIDAD_JORNADA = [('08:00', '13:00'), ('15:00', '20:00')]  # todos los días
+    DISPONIBILIDAD_DURACION = 60
+    DISPONIBILIDAD_DURACION_ACTO = {'matrimonio': 90, 'confirmacion': 90, 'comunion': 90}
+    DISPONIBILIDAD_MAX_DIAS = 186
+
+    # 🗑️ Purga de actos/horarios con borrado lógico (scripts/purge_deleted.py): filas por lote
+    PURGA_LOTE = 1000
+
+    # 🗓️ Particiones mensuales de horario/reserva (scripts/crear_particiones.py): meses creados por adelantado
+    PARTICIONES_MESES_ADELANTE = 36
+    # Fecha más lejana aceptada para un horario (días desde hoy); más allá se responde 400
+    HORARIO_HORIZONTE_MAX_DIAS = 1825
+
+    # 🗄️ Archivo de años cerrados (scripts/archive_history.py): años completos que quedan en
+    # las tablas vivas además del actual, y horarios movidos por lote
+    ARCHIVO_RETENCION_ANIOS = 1
+    ARCHIVO_LOTE = 1000
+
+    # 📋 Agenda del día precalculada (scripts/warm_agenda.py): días calculados por adelantado
+    # cada noche y días pasados que se conservan en agenda_dia
+    AGENDA_DIAS_ADELANTE = 14
+    AGENDA_DIAS_ATRAS = 7
+
+    # 📆 Feed iCalendar por parroquia (/parroquias/<id>/calendar.ics): meses completos que
+    # cubre, zona horaria informada a los clientes y dominio de los UID de los eventos
+    ICAL_MESES_ATRAS = 1
+    ICAL_MESES_ADELANTE = 12
+    ICAL_ZONA = 'America/Lima'
+    ICAL_DOMINIO = os.environ.get('ICAL_DOMINIO', 'parroquia-system')
+
+    # ⛪ Año litúrgico (app/utils/liturgical_year.py): Epifanía, Ascensión y Corpus Christi
+    # se celebran el domingo (como en Perú); False = 6 de enero y los jueves
+    LITURGIA_TRASLADAR_A_DOMINGO = True
+
+    # 🔥 Reporte de ocupación día × hora (/reportes/ocupacion): segundos que vale cada mes
+    # guardado en el cache por worker y meses que puede abarcar una consulta
+    OCUPACION_CACHE_TTL = 900
+    OCUPACION_MAX_MESES = 24
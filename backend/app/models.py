@@ -1,6 +1,6 @@
 from app import db
 from app.utils.security import hash_password, check_password
-from sqlalchemy.dialects.postgresql import JSON
+from sqlalchemy.dialects.postgresql import JSON, ARRAY
 from datetime import datetime, timedelta
 
 class Role(db.Model):
@@ -144,6 +144,8 @@ class Parroquia(db.Model):
     distritoid = db.Column(db.Integer, db.ForeignKey('distrito.distritoid'), nullable=False)
     par_telefono1 = db.Column(db.String, nullable=False)
     par_telefono2 = db.Column(db.String)
+    par_latitud = db.Column(db.Float)   # se llena con la geocodificación del backend (app.utils.geocoding)
+    par_longitud = db.Column(db.Float)
 
     distrito = db.relationship('Distrito')
     personas = db.relationship('Persona', back_populates='parroquia')
@@ -165,10 +167,23 @@ class Parroquia(db.Model):
             'prov_nombre': prov.prov_nombre if prov else None,
             'dis_nombre': dis.dis_nombre if dis else None,
             'par_telefono1': self.par_telefono1,
-            'par_telefono2': self.par_telefono2
+            'par_telefono2': self.par_telefono2,
+            'par_latitud': self.par_latitud,
+            'par_longitud': self.par_longitud
         }
 
 
+class GeocodeCache(db.Model):
+    __tablename__ = 'geocode_cache'
+
+    # Clave: dirección normalizada (minúsculas, sin tildes ni signos)
+    direccion_norm = db.Column(db.String(500), primary_key=True)
+    latitud = db.Column(db.Float)   # NULL = el proveedor no encontró la dirección (cache negativo)
+    longitud = db.Column(db.Float)
+    proveedor = db.Column(db.String(30), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
 class Persona(db.Model):
     __tablename__ = 'persona'
     personaid = db.Column(db.Integer, primary_key=True)
@@ -179,6 +194,7 @@ class Persona(db.Model):
     per_telefono = db.Column(db.String)
     fecha_nacimiento = db.Column(db.Date, nullable=False)
     parroquiaid = db.Column(db.Integer, db.ForeignKey('parroquia.parroquiaid'), nullable=False)
+    # per_busqueda (tsvector mantenido por triggers) sólo se usa desde SQL (app/utils/search.py)
 
     user = db.relationship('User', backref=db.backref('persona_rel', uselist=False))
     parroquia = db.relationship('Parroquia', back_populates='personas')
@@ -197,6 +213,36 @@ class Persona(db.Model):
         }
 
 
+class PersonaMergeCandidato(db.Model):
+    __tablename__ = 'persona_merge_candidato'
+
+    candidatoid = db.Column(db.Integer, primary_key=True)
+    # Sin FK a propósito: el registro se conserva como auditoría después de fusionar
+    personaid_a = db.Column(db.Integer, nullable=False)  # se conserva (id menor)
+    personaid_b = db.Column(db.Integer, nullable=False)  # duplicado a fusionar en A
+    parroquiaid = db.Column(db.Integer, nullable=False)
+    puntaje = db.Column(db.Numeric(4, 3), nullable=False)
+    clave_bloque = db.Column(db.String(255), nullable=False)
+    estado = db.Column(db.String(15), nullable=False, default='pendiente')  # pendiente, aplicado, descartado
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    resuelto_at = db.Column(db.DateTime)
+
+    __table_args__ = (db.UniqueConstraint('personaid_a', 'personaid_b', name='uq_persona_merge_par'),)
+
+    def to_dict(self):
+        return {
+            'candidatoid': self.candidatoid,
+            'personaid_a': self.personaid_a,
+            'personaid_b': self.personaid_b,
+            'parroquiaid': self.parroquiaid,
+            'puntaje': float(self.puntaje) if self.puntaje is not None else None,
+            'clave_bloque': self.clave_bloque,
+            'estado': self.estado,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'resuelto_at': self.resuelto_at.isoformat() if self.resuelto_at else None
+        }
+
+
 # ==========================
 #  Liturgia
 # ==========================
@@ -209,6 +255,8 @@ class ActoLiturgico(db.Model):
     act_titulo = db.Column(db.String(200), nullable=False)  # ej. Misa Dominical, Misa Señor de los Milagros
     act_descripcion = db.Column(db.Text)
     act_estado = db.Column(db.Boolean, default=True)
+    # act_busqueda (tsvector mantenido por triggers) sólo se usa desde SQL (app/utils/search.py)
+    deleted_at = db.Column(db.DateTime)  # borrado lógico; scripts/purge_deleted.py borra por lotes
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -236,7 +284,15 @@ class Horario(db.Model):
     actoliturgicoid = db.Column(db.Integer, db.ForeignKey('actoliturgico.actoliturgicoid'), nullable=False)
     h_fecha = db.Column(db.Date, nullable=False)  # fecha específica del horario
     h_hora = db.Column(db.Time, nullable=False)   # hora específica del horario
-    # parroquiaid eliminado - se obtiene mediante acto_liturgico.parroquia
+    # Copia de acto_liturgico.parroquiaid mantenida por triggers (filtros por parroquia + fecha)
+    parroquiaid = db.Column(db.Integer)
+    # Contadores mantenidos por triggers de reserva/pago (no escribir desde la app)
+    reservas_total = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    reservas_activas = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    h_capacidad = db.Column(db.Integer)  # cupos (reservas activas); None = sin límite
+    h_duracion = db.Column(db.SmallInteger, nullable=False, default=60, server_default='60')  # minutos
+    # h_rango (tsrange generado a partir de fecha, hora y duración) sólo se usa desde SQL
+    deleted_at = db.Column(db.DateTime)  # borrado lógico; scripts/purge_deleted.py borra por lotes
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -251,22 +307,102 @@ class Horario(db.Model):
             'acto_titulo': self.acto_liturgico.act_titulo if self.acto_liturgico else None,
             'h_fecha': self.h_fecha.isoformat() if self.h_fecha else None,
             'h_hora': self.h_hora.strftime('%H:%M') if self.h_hora else None,
-            'parroquiaid': self.acto_liturgico.parroquiaid if self.acto_liturgico and hasattr(self.acto_liturgico, 'parroquiaid') else None,
+            'parroquiaid': self.parroquiaid,
             'parroquia_nombre': self.acto_liturgico.parroquia.par_nombre if self.acto_liturgico and self.acto_liturgico.parroquia else None,
+            'reservas_total': self.reservas_total,
+            'reservas_activas': self.reservas_activas,
+            'h_capacidad': self.h_capacidad,
+            'h_duracion': self.h_duracion,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class HorarioRecurrencia(db.Model):
+    """Regla que genera horarios de un acto (app/utils/recurrence.py)"""
+    __tablename__ = 'horario_recurrencia'
+
+    recurrenciaid = db.Column(db.Integer, primary_key=True)
+    actoliturgicoid = db.Column(db.Integer, db.ForeignKey('actoliturgico.actoliturgicoid', ondelete='CASCADE'), nullable=False)
+    frecuencia = db.Column(db.String(10), nullable=False)  # semanal, mensual
+    dia_semana = db.Column(db.SmallInteger, nullable=False)  # 0=lunes ... 6=domingo
+    semana_mes = db.Column(db.SmallInteger)  # mensual: 1..5 (n-ésimo) o -1 (último)
+    intervalo = db.Column(db.SmallInteger, nullable=False, default=1)  # semanal: cada N semanas
+    h_hora = db.Column(db.Time, nullable=False)
+    fecha_inicio = db.Column(db.Date, nullable=False)
+    fecha_fin = db.Column(db.Date)
+    excepciones = db.Column(ARRAY(db.Date), nullable=False, default=list)  # fechas sin horario
+    # Tiempos o fiestas (claves de app/utils/liturgical_year.py) sin horario, ej. ['triduo']
+    omitir_liturgia = db.Column(ARRAY(db.Text), nullable=False, default=list)
+    activo = db.Column(db.Boolean, nullable=False, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    acto_liturgico = db.relationship('ActoLiturgico')
+
+    def to_dict(self):
+        return {
+            'recurrenciaid': self.recurrenciaid,
+            'actoliturgicoid': self.actoliturgicoid,
+            'acto_titulo': self.acto_liturgico.act_titulo if self.acto_liturgico else None,
+            'parroquiaid': self.acto_liturgico.parroquiaid if self.acto_liturgico else None,
+            'frecuencia': self.frecuencia,
+            'dia_semana': self.dia_semana,
+            'semana_mes': self.semana_mes,
+            'intervalo': self.intervalo,
+            'h_hora': self.h_hora.strftime('%H:%M') if self.h_hora else None,
+            'fecha_inicio': self.fecha_inicio.isoformat() if self.fecha_inicio else None,
+            'fecha_fin': self.fecha_fin.isoformat() if self.fecha_fin else None,
+            'excepciones': [f.isoformat() for f in (self.excepciones or [])],
+            'omitir_liturgia': list(self.omitir_liturgia or []),
+            'activo': self.activo,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
 
+class ParroquiaJornada(db.Model):
+    """Jornada de atención de una parroquia por día (app/utils/availability.py)"""
+    __tablename__ = 'parroquia_jornada'
+
+    jornadaid = db.Column(db.Integer, primary_key=True)
+    parroquiaid = db.Column(db.Integer, db.ForeignKey('parroquia.parroquiaid', ondelete='CASCADE'), nullable=False)
+    dia_semana = db.Column(db.SmallInteger, nullable=False)  # 0=lunes ... 6=domingo
+    hora_inicio = db.Column(db.Time, nullable=False)
+    hora_fin = db.Column(db.Time, nullable=False)
+
+    def to_dict(self):
+        return {
+            'jornadaid': self.jornadaid,
+            'parroquiaid': self.parroquiaid,
+            'dia_semana': self.dia_semana,
+            'hora_inicio': self.hora_inicio.strftime('%H:%M') if self.hora_inicio else None,
+            'hora_fin': self.hora_fin.strftime('%H:%M') if self.hora_fin else None
+        }
+
+
+class AgendaDia(db.Model):
+    """Agenda precalculada de una parroquia en un día (app/utils/agenda.py)"""
+    __tablename__ = 'agenda_dia'
+
+    fecha = db.Column(db.Date, primary_key=True)
+    parroquiaid = db.Column(db.Integer, db.ForeignKey('parroquia.parroquiaid', ondelete='CASCADE'), primary_key=True)
+    horarios = db.Column(JSON, nullable=False, default=list)  # horarios con asistentes y pagos
+    resumen = db.Column(JSON, nullable=False, default=dict)
+    calculado_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class Reserva(db.Model):
     __tablename__ = 'reserva'
 
     reservaid = db.Column(db.Integer, primary_key=True)
     horarioid = db.Column(db.Integer, db.ForeignKey('horario.horarioid'), nullable=False)
+    # Copia de horario.h_fecha: clave de partición y parte de la FK compuesta (horarioid, h_fecha)
+    h_fecha = db.Column(db.Date, nullable=False)
     personaid = db.Column(db.Integer, db.ForeignKey('persona.personaid'))
     res_persona_nombre = db.Column(db.String(255))  # Nombre de persona no registrada
     res_descripcion = db.Column(db.Text, nullable=False)
     pagoid = db.Column(db.Integer, db.ForeignKey('pago.pagoid', ondelete='SET NULL'), nullable=True)  # FK a tabla pago
+    # res_busqueda (tsvector mantenido por triggers) sólo se usa desde SQL (app/utils/search.py)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -309,6 +445,20 @@ class Reserva(db.Model):
         }
 
 
+class ArchivoBloque(db.Model):
+    """Bloque de horarios o reservas archivados (una parroquia, un mes): ver app/utils/archive.py"""
+    __tablename__ = 'archivo_bloque'
+
+    bloqueid = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(10), nullable=False)  # 'horario' | 'reserva'
+    parroquiaid = db.Column(db.Integer)
+    desde = db.Column(db.Date, nullable=False)
+    hasta = db.Column(db.Date, nullable=False)
+    filas = db.Column(db.Integer, nullable=False)
+    datos = db.Column(JSON, nullable=False)  # array de filas desnormalizadas
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
 class Pago(db.Model):
     __tablename__ = 'pago'
 
@@ -1,9 +1,26 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify
 from flask_jwt_extended import jwt_required
 from datetime import datetime, timedelta
+import base64
+import csv
+import io
+import json
 from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
 from app import db
-from app.models import ActoLiturgico, Horario, Reserva
+from app.models import ActoLiturgico, Horario, Reserva, HorarioRecurrencia
+from app.utils.scope import resolve_parroquia_filter
+from app.utils.calendar_cache import get_calendar_events, invalidate_calendar_days
+from app.utils.recurrence import FRECUENCIAS, expand_recurrences
+from app.utils.normalize import normalize_text
+from app.utils.availability import parse_jornada, load_parroquias, find_availability
+from app.utils.partitions import ensure_partitions, max_horario_date, month_start
+from app.utils.archive import archived_reservas_sql
+from app.utils.search import TIPOS as BUSQUEDA_TIPOS, search
+from app.utils.agenda import get_day_agenda
+from app.utils.ical import feed_etag, feed_window, iter_calendar, month_fingerprints
+from app.utils.liturgical_year import ANIO_MAX, ANIO_MIN, FIESTAS, TIEMPOS, liturgical_year
+from app.utils.occupancy import DIAS, HORAS, load_occupancy, occupancy_series
 
 liturgical_bp = Blueprint('liturgical', __name__)
 
@@ -21,6 +38,110 @@ def parse_time(time_str):
     except Exception:
         return None
 
+def encode_cursor(created_at, row_id):
+    """Cursor opaco para paginación por clave (created_at, id)"""
+    raw = f'{created_at.isoformat()}|{row_id}'
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        created_at, row_id = raw.split('|')
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        return None
+
+def constraint_name(e):
+    """Restricción de Postgres que provocó un IntegrityError (o None)"""
+    diag = getattr(getattr(e, 'orig', None), 'diag', None)
+    return getattr(diag, 'constraint_name', None)
+
+def is_capacity_error(e):
+    """True si la excepción viene del trigger de cupos del horario (sin cupos disponibles)"""
+    return constraint_name(e) == 'horario_capacidad'
+
+MENSAJE_SOLAPE = 'El horario se cruza con otro horario de la misma parroquia'
+
+def is_overlap_error(e):
+    """True si la excepción viene de horario_sin_solape (o de la de una partición, horario_p2026_01_sin_solape)"""
+    nombre = constraint_name(e) or ''
+    return nombre.startswith('horario') and nombre.endswith('_sin_solape')
+
+def parse_capacidad(valor):
+    """Capacidad opcional de un horario: (capacidad | None, error | None)"""
+    if valor in (None, ''):
+        return None, None
+    try:
+        capacidad = int(valor)
+    except (TypeError, ValueError):
+        return None, 'h_capacidad debe ser un número'
+    if capacidad < 0:
+        return None, 'h_capacidad no puede ser negativa'
+    return capacidad, None
+
+def parse_duracion(valor, defecto):
+    """Duración en minutos (1..1440) de un horario: (duracion, error | None)"""
+    if valor in (None, ''):
+        return defecto, None
+    try:
+        duracion = int(valor)
+    except (TypeError, ValueError):
+        return None, 'La duración debe ser un número de minutos'
+    if not 0 < duracion <= 1440:
+        return None, 'La duración debe estar entre 1 y 1440 minutos'
+    return duracion, None
+
+def check_horizonte(h_fecha):
+    """Error si la fecha de un horario pasa max_horario_date() (HORARIO_HORIZONTE_MAX_DIAS), o None"""
+    limite = max_horario_date()
+    if h_fecha and h_fecha > limite:
+        return f'h_fecha no puede ser posterior a {limite.isoformat()}'
+    return None
+
+def parse_flag(valor):
+    """Parámetro booleano de query string (1/true/si)"""
+    return (valor or '').strip().lower() in ('1', 'true', 'si', 'sí')
+
+def build_reservas_filters(args):
+    """Filtros comunes del listado/exportación de reservas.
+
+    Devuelve (where_clauses, params, error). El alcance por parroquia del usuario
+    siempre se aplica, y se omiten las reservas de horarios con borrado lógico.
+    """
+    params = {}
+    where_clauses = ['h.deleted_at IS NULL']
+
+    parroquia_id = resolve_parroquia_filter(args.get('parroquiaid', type=int))
+    if parroquia_id:
+        where_clauses.append('h.parroquiaid = :parroquiaid')
+        params['parroquiaid'] = parroquia_id
+
+    # El rango va sobre r.h_fecha y h.h_fecha (iguales por el JOIN): así se podan las
+    # particiones de ambas tablas
+    for arg, op in (('desde', '>='), ('hasta', '<=')):
+        if args.get(arg):
+            fecha = parse_date(args.get(arg))
+            if not fecha:
+                return None, None, f'Fecha inválida en {arg}'
+            where_clauses.append(f'r.h_fecha {op} :{arg}')
+            where_clauses.append(f'h.h_fecha {op} :{arg}')
+            params[arg] = fecha
+
+    if args.get('act_nombre'):
+        where_clauses.append('a.act_nombre = :act_nombre')
+        params['act_nombre'] = args.get('act_nombre').strip()
+
+    if args.get('pago_estado'):
+        where_clauses.append("COALESCE(pg.pago_estado, 'pendiente') = :pago_estado")
+        params['pago_estado'] = args.get('pago_estado').strip().lower()
+
+    personaid = args.get('personaid', type=int)
+    if personaid:
+        where_clauses.append('r.personaid = :personaid')
+        params['personaid'] = personaid
+
+    return where_clauses, params, None
+
 # =========================================================
 # ACTOS LITÚRGICOS CON HORARIO (OPERACIÓN COMBINADA)
 # =========================================================
@@ -56,44 +177,24 @@ def create_acto_con_horario():
 
         if not h_fecha or not h_hora:
             return jsonify({'error': 'Fecha y hora inválidas'}), 400
-
-        # Iniciar transacción
-        acto_id = None
-        horario_id = None
+        error = check_horizonte(h_fecha)
+        if error:
+            return jsonify({'error': error}), 400
 
         try:
-            # 1. Crear el acto litúrgico
-            acto_result = db.session.execute(text("""
-                INSERT INTO public.actoliturgico (parroquiaid, act_nombre, act_titulo, act_descripcion, act_estado)
-                VALUES (:parroquiaid, :act_nombre, :act_titulo, :act_descripcion, :act_estado)
-                RETURNING actoliturgicoid
-            """), {
-                'parroquiaid': data.get('parroquiaid'),
-                'act_nombre': (data.get('act_nombre') or '').strip(),
-                'act_titulo': (data.get('act_titulo') or '').strip(),
-                'act_descripcion': (data.get('act_descripcion') or '').strip() or None,
-                'act_estado': bool(data.get('act_estado', True))
-            })
-
-            acto_id = acto_result.fetchone().actoliturgicoid
-
-            # 2. Crear el horario asociado
-            horario_result = db.session.execute(text("""
-                INSERT INTO public.horario (actoliturgicoid, h_fecha, h_hora)
-                VALUES (:actoliturgicoid, :h_fecha, :h_hora)
-                RETURNING horarioid
-            """), {
-                'actoliturgicoid': acto_id,
-                'h_fecha': h_fecha,
-                'h_hora': h_hora
-            })
-
-            horario_id = horario_result.fetchone().horarioid
-
-            db.session.commit()
-
-            # Obtener el resultado completo
+            ensure_partitions([h_fecha])
+            # Acto + horario + datos para la respuesta en una sola sentencia (CTEs con RETURNING).
+            # El horario recibe la parroquia del acto desde la CTE: el trigger no ve el acto nuevo.
             resultado = db.session.execute(text("""
+                WITH a AS (
+                    INSERT INTO public.actoliturgico (parroquiaid, act_nombre, act_titulo, act_descripcion, act_estado)
+                    VALUES (:parroquiaid, :act_nombre, :act_titulo, :act_descripcion, :act_estado)
+                    RETURNING *
+                ), h AS (
+                    INSERT INTO public.horario (actoliturgicoid, parroquiaid, h_fecha, h_hora)
+                    SELECT actoliturgicoid, parroquiaid, :h_fecha, :h_hora FROM a
+                    RETURNING horarioid, actoliturgicoid, h_fecha, h_hora, created_at, updated_at
+                )
                 SELECT
                     a.actoliturgicoid,
                     a.parroquiaid,
@@ -109,11 +210,21 @@ def create_acto_con_horario():
                     h.h_hora,
                     h.created_at as horario_created_at,
                     h.updated_at as horario_updated_at
-                FROM public.actoliturgico a
+                FROM a
                 LEFT JOIN public.parroquia p ON a.parroquiaid = p.parroquiaid
-                LEFT JOIN public.horario h ON a.actoliturgicoid = h.actoliturgicoid
-                WHERE a.actoliturgicoid = :acto_id
-            """), {'acto_id': acto_id}).fetchone()
+                LEFT JOIN h ON a.actoliturgicoid = h.actoliturgicoid
+            """), {
+                'parroquiaid': data.get('parroquiaid'),
+                'act_nombre': (data.get('act_nombre') or '').strip(),
+                'act_titulo': (data.get('act_titulo') or '').strip(),
+                'act_descripcion': (data.get('act_descripcion') or '').strip() or None,
+                'act_estado': bool(data.get('act_estado', True)),
+                'h_fecha': h_fecha,
+                'h_hora': h_hora
+            }).fetchone()
+
+            db.session.commit()
+            invalidate_calendar_days([h_fecha])
 
             return jsonify({
                 'success': True,
@@ -144,6 +255,12 @@ def create_acto_con_horario():
             db.session.rollback()
             raise inner_e
 
+    except IntegrityError as e:
+        db.session.rollback()
+        if is_overlap_error(e):
+            return jsonify({'error': MENSAJE_SOLAPE}), 409
+        print('Error create_acto_con_horario', e)
+        return jsonify({'error': 'Error interno del servidor'}), 500
     except Exception as e:
         print('Error create_acto_con_horario', e)
         db.session.rollback()
@@ -152,9 +269,16 @@ def create_acto_con_horario():
 @liturgical_bp.route('/actos', methods=['GET'])
 @jwt_required()
 def list_actos():
-    """Lista todos los actos litúrgicos activos con sus horarios asociados"""
+    """Lista los actos litúrgicos activos (de la parroquia del usuario) con sus horarios asociados"""
     try:
-        items = db.session.execute(text("""
+        params = {}
+        parroquia_sql = ''
+        parroquia_id = resolve_parroquia_filter(request.args.get('parroquiaid', type=int))
+        if parroquia_id:
+            parroquia_sql = 'AND a.parroquiaid = :parroquiaid'
+            params['parroquiaid'] = parroquia_id
+
+        items = db.session.execute(text(f"""
             SELECT
                 a.actoliturgicoid,
                 a.parroquiaid,
@@ -170,10 +294,10 @@ def list_actos():
                 h.h_hora
             FROM public.actoliturgico a
             LEFT JOIN public.parroquia p ON a.parroquiaid = p.parroquiaid
-            LEFT JOIN public.horario h ON a.actoliturgicoid = h.actoliturgicoid
-            WHERE a.act_estado = TRUE
+            LEFT JOIN public.horario h ON a.actoliturgicoid = h.actoliturgicoid AND h.deleted_at IS NULL
+            WHERE a.act_estado = TRUE AND a.deleted_at IS NULL {parroquia_sql}
             ORDER BY a.actoliturgicoid DESC
-        """)).fetchall()
+        """), params).fetchall()
 
         result = []
         for row in items:
@@ -213,47 +337,38 @@ def create_acto():
         if any(v in [None, '', False] for v in required):
             return jsonify({'error': 'parroquiaid, act_nombre y act_titulo son requeridos'}), 400
 
-        # Iniciar transacción
-        acto_id = None
-        horario_id = None
+        # Horario opcional: sólo si se proporcionan fecha y hora válidas
+        h_fecha = h_hora = None
+        if 'h_fecha' in data and 'h_hora' in data:
+            h_fecha = parse_date(data.get('h_fecha'))
+            h_hora = parse_time(data.get('h_hora'))
+        con_horario = bool(h_fecha and h_hora)
+        error = check_horizonte(h_fecha)
+        if error:
+            return jsonify({'error': error}), 400
+
+        horario_cte = ''
+        horario_cols = 'NULL::integer as horarioid, NULL::date as h_fecha, NULL::time as h_hora'
+        horario_join = ''
+        if con_horario:
+            horario_cte = """, h AS (
+                    INSERT INTO public.horario (actoliturgicoid, parroquiaid, h_fecha, h_hora)
+                    SELECT actoliturgicoid, parroquiaid, :h_fecha, :h_hora FROM a
+                    RETURNING horarioid, actoliturgicoid, h_fecha, h_hora
+                )"""
+            horario_cols = 'h.horarioid, h.h_fecha, h.h_hora'
+            horario_join = 'LEFT JOIN h ON a.actoliturgicoid = h.actoliturgicoid'
 
         try:
-            # 1. Crear el acto litúrgico
-            result = db.session.execute(text("""
-                INSERT INTO public.actoliturgico (parroquiaid, act_nombre, act_titulo, act_descripcion, act_estado)
-                VALUES (:parroquiaid, :act_nombre, :act_titulo, :act_descripcion, :act_estado)
-                RETURNING actoliturgicoid, created_at, updated_at
-            """), {
-                'parroquiaid': data.get('parroquiaid'),
-                'act_nombre': (data.get('act_nombre') or '').strip(),
-                'act_titulo': (data.get('act_titulo') or '').strip(),
-                'act_descripcion': (data.get('act_descripcion') or '').strip() or None,
-                'act_estado': bool(data.get('act_estado', True))
-            })
-
-            acto_id = result.fetchone().actoliturgicoid
-
-            # 2. Crear horario si se proporcionan fecha y hora
-            if 'h_fecha' in data and 'h_hora' in data:
-                h_fecha = parse_date(data.get('h_fecha'))
-                h_hora = parse_time(data.get('h_hora'))
-
-                if h_fecha and h_hora:
-                    horario_result = db.session.execute(text("""
-                        INSERT INTO public.horario (actoliturgicoid, h_fecha, h_hora)
-                        VALUES (:actoliturgicoid, :h_fecha, :h_hora)
-                        RETURNING horarioid
-                    """), {
-                        'actoliturgicoid': acto_id,
-                        'h_fecha': h_fecha,
-                        'h_hora': h_hora
-                    })
-                    horario_id = horario_result.fetchone().horarioid
-
-            db.session.commit()
-
-            # Obtener el acto creado completo
-            acto = db.session.execute(text("""
+            if con_horario:
+                ensure_partitions([h_fecha])
+            # Acto (+ horario) y datos para la respuesta en una sola sentencia
+            acto = db.session.execute(text(f"""
+                WITH a AS (
+                    INSERT INTO public.actoliturgico (parroquiaid, act_nombre, act_titulo, act_descripcion, act_estado)
+                    VALUES (:parroquiaid, :act_nombre, :act_titulo, :act_descripcion, :act_estado)
+                    RETURNING *
+                ){horario_cte}
                 SELECT
                     a.actoliturgicoid,
                     a.parroquiaid,
@@ -264,14 +379,23 @@ def create_acto():
                     a.act_estado,
                     a.created_at,
                     a.updated_at,
-                    h.horarioid,
-                    h.h_fecha,
-                    h.h_hora
-                FROM public.actoliturgico a
+                    {horario_cols}
+                FROM a
                 LEFT JOIN public.parroquia p ON a.parroquiaid = p.parroquiaid
-                LEFT JOIN public.horario h ON a.actoliturgicoid = h.actoliturgicoid
-                WHERE a.actoliturgicoid = :id
-            """), {'id': acto_id}).fetchone()
+                {horario_join}
+            """), {
+                'parroquiaid': data.get('parroquiaid'),
+                'act_nombre': (data.get('act_nombre') or '').strip(),
+                'act_titulo': (data.get('act_titulo') or '').strip(),
+                'act_descripcion': (data.get('act_descripcion') or '').strip() or None,
+                'act_estado': bool(data.get('act_estado', True)),
+                'h_fecha': h_fecha,
+                'h_hora': h_hora
+            }).fetchone()
+
+            db.session.commit()
+            if con_horario:
+                invalidate_calendar_days([h_fecha])
 
             return jsonify({
                 'item': {
@@ -294,6 +418,12 @@ def create_acto():
             db.session.rollback()
             raise inner_e
 
+    except IntegrityError as e:
+        db.session.rollback()
+        if is_overlap_error(e):
+            return jsonify({'error': MENSAJE_SOLAPE}), 409
+        print('Error create_acto', e)
+        return jsonify({'error': 'Error interno del servidor'}), 500
     except Exception as e:
         print('Error create_acto', e)
         db.session.rollback()
@@ -331,58 +461,57 @@ def update_acto(acto_id):
 
         set_clause_acto = ', '.join(set_parts_acto)
 
-        # Iniciar transacción
-        try:
-            # 1. Actualizar el acto litúrgico
-            query_acto = f'UPDATE public.actoliturgico SET {set_clause_acto} WHERE actoliturgicoid = :id'
-            result_acto = db.session.execute(text(query_acto), params)
-
-            # 2. Actualizar horario si hay cambios en fecha/hora
-            if 'h_fecha' in data or 'h_hora' in data:
-                h_fecha = None
-                h_hora = None
-
-                if 'h_fecha' in data and data.get('h_fecha'):
-                    h_fecha = parse_date(data.get('h_fecha'))
-                if 'h_hora' in data and data.get('h_hora'):
-                    h_hora = parse_time(data.get('h_hora'))
-
-                if h_fecha and h_hora:
-                    # Verificar si ya existe horario para este acto
-                    existing_horario = db.session.execute(
-                        text('SELECT horarioid FROM public.horario WHERE actoliturgicoid = :acto_id'),
-                        {'acto_id': acto_id}
-                    ).fetchone()
-
-                    if existing_horario:
-                        # Actualizar horario existente
-                        db.session.execute(text("""
-                            UPDATE public.horario
-                            SET h_fecha = :h_fecha, h_hora = :h_hora
-                            WHERE actoliturgicoid = :acto_id
-                        """), {
-                            'acto_id': acto_id,
-                            'h_fecha': h_fecha,
-                            'h_hora': h_hora
-                        })
-                    else:
-                        # Crear nuevo horario
-                        db.session.execute(text("""
-                            INSERT INTO public.horario (actoliturgicoid, h_fecha, h_hora)
-                            VALUES (:actoliturgicoid, :h_fecha, :h_hora)
-                        """), {
-                            'actoliturgicoid': acto_id,
-                            'h_fecha': h_fecha,
-                            'h_hora': h_hora
-                        })
-
-            db.session.commit()
-
-            if result_acto.rowcount == 0:
-                return jsonify({'error': 'Acto no encontrado'}), 404
+        # Horario: con fecha y hora válidas se mueve el primer horario del acto (o se crea)
+        h_fecha = h_hora = None
+        if 'h_fecha' in data or 'h_hora' in data:
+            if 'h_fecha' in data and data.get('h_fecha'):
+                h_fecha = parse_date(data.get('h_fecha'))
+            if 'h_hora' in data and data.get('h_hora'):
+                h_hora = parse_time(data.get('h_hora'))
+        con_horario = bool(h_fecha and h_hora)
+        error = check_horizonte(h_fecha)
+        if error:
+            return jsonify({'error': error}), 400
+
+        horario_cte = ''
+        horario_join = 'LEFT JOIN public.horario h ON a.actoliturgicoid = h.actoliturgicoid AND h.deleted_at IS NULL'
+        if con_horario:
+            horario_cte = """, actual AS (
+                    SELECT horarioid FROM public.horario
+                    WHERE actoliturgicoid = :id AND deleted_at IS NULL
+                    ORDER BY h_fecha, h_hora, horarioid
+                    LIMIT 1
+                ), hu AS (
+                    UPDATE public.horario
+                    SET h_fecha = :h_fecha, h_hora = :h_hora
+                    WHERE horarioid = (SELECT horarioid FROM actual) AND EXISTS (SELECT 1 FROM a)
+                    RETURNING horarioid, actoliturgicoid, h_fecha, h_hora
+                ), hi AS (
+                    INSERT INTO public.horario (actoliturgicoid, parroquiaid, h_fecha, h_hora)
+                    SELECT actoliturgicoid, parroquiaid, :h_fecha, :h_hora FROM a
+                    WHERE NOT EXISTS (SELECT 1 FROM actual)
+                    ON CONFLICT (actoliturgicoid, h_fecha, h_hora) WHERE deleted_at IS NULL DO NOTHING
+                    RETURNING horarioid, actoliturgicoid, h_fecha, h_hora
+                ), h AS (
+                    SELECT * FROM hu UNION ALL SELECT * FROM hi
+                )"""
+            horario_join = 'LEFT JOIN h ON a.actoliturgicoid = h.actoliturgicoid'
+            params.update({'h_fecha': h_fecha, 'h_hora': h_hora})
 
-            # Obtener el acto actualizado completo
-            acto = db.session.execute(text("""
+        try:
+            if con_horario:
+                ensure_partitions([h_fecha])
+            # Acto, horario y respuesta en una sola sentencia. `previas` lee los días de los
+            # horarios antes de la escritura (para invalidar el calendario).
+            acto = db.session.execute(text(f"""
+                WITH previas AS (
+                    SELECT array_agg(DISTINCT h_fecha) AS fechas
+                    FROM public.horario WHERE actoliturgicoid = :id AND deleted_at IS NULL
+                ), a AS (
+                    UPDATE public.actoliturgico SET {set_clause_acto}
+                    WHERE actoliturgicoid = :id AND deleted_at IS NULL
+                    RETURNING *
+                ){horario_cte}
                 SELECT
                     a.actoliturgicoid,
                     a.parroquiaid,
@@ -395,12 +524,19 @@ def update_acto(acto_id):
                     a.updated_at,
                     h.horarioid,
                     h.h_fecha,
-                    h.h_hora
-                FROM public.actoliturgico a
+                    h.h_hora,
+                    (SELECT fechas FROM previas) as fechas_previas
+                FROM a
                 LEFT JOIN public.parroquia p ON a.parroquiaid = p.parroquiaid
-                LEFT JOIN public.horario h ON a.actoliturgicoid = h.actoliturgicoid
-                WHERE a.actoliturgicoid = :id
-            """), {'id': acto_id}).fetchone()
+                {horario_join}
+            """), params).fetchone()
+
+            if not acto:
+                db.session.rollback()
+                return jsonify({'error': 'Acto no encontrado'}), 404
+
+            db.session.commit()
+            invalidate_calendar_days(set(acto.fechas_previas or []) | ({h_fecha} if con_horario else set()))
 
             return jsonify({
                 'item': {
@@ -423,6 +559,12 @@ def update_acto(acto_id):
             db.session.rollback()
             raise inner_e
 
+    except IntegrityError as e:
+        db.session.rollback()
+        if is_overlap_error(e):
+            return jsonify({'error': MENSAJE_SOLAPE}), 409
+        print('Error update_acto', e)
+        return jsonify({'error': 'Error interno del servidor'}), 500
     except Exception as e:
         print('Error update_acto', e)
         db.session.rollback()
@@ -431,17 +573,32 @@ def update_acto(acto_id):
 @liturgical_bp.route('/actos/<int:acto_id>', methods=['DELETE'])
 @jwt_required()
 def delete_acto(acto_id):
-    """Elimina un acto litúrgico (y sus horarios asociados en cascada)"""
+    """Elimina un acto litúrgico (borrado lógico del acto y sus horarios).
+
+    Sólo marca deleted_at, así responde al instante aunque el acto tenga miles de reservas;
+    scripts/purge_deleted.py borra después las reservas, horarios y el acto por lotes.
+    """
     try:
-        result = db.session.execute(
-            text('DELETE FROM public.actoliturgico WHERE actoliturgicoid = :id'),
-            {'id': acto_id}
-        )
+        borrado = db.session.execute(text("""
+            WITH a AS (
+                UPDATE public.actoliturgico SET deleted_at = NOW()
+                WHERE actoliturgicoid = :id AND deleted_at IS NULL
+                RETURNING actoliturgicoid
+            ), h AS (
+                UPDATE public.horario SET deleted_at = NOW()
+                WHERE actoliturgicoid IN (SELECT actoliturgicoid FROM a) AND deleted_at IS NULL
+                RETURNING h_fecha
+            )
+            SELECT
+                (SELECT count(*) FROM a) as actos,
+                (SELECT array_agg(DISTINCT h_fecha) FROM h) as fechas
+        """), {'id': acto_id}).fetchone()
         db.session.commit()
 
-        if result.rowcount == 0:
+        if not borrado.actos:
             return jsonify({'error': 'No encontrado'}), 404
 
+        invalidate_calendar_days(borrado.fechas or [])
         return jsonify({'message': 'Eliminado correctamente'}), 200
 
     except Exception as e:
@@ -459,15 +616,15 @@ def list_horarios():
     """Lista todos los horarios de actos litúrgicos (acepta filtros por parroquia y fecha)"""
     try:
         # Leer parámetros opcionales
-        parroquia_id = request.args.get('parroquiaid', type=int)
+        parroquia_id = resolve_parroquia_filter(request.args.get('parroquiaid', type=int))
         fecha_str = request.args.get('fecha', type=str)
 
         params = {}
-        where_clauses = []
+        where_clauses = ['h.deleted_at IS NULL']
 
-        # Aplicar filtro por parroquia si se proporcionó
+        # Aplicar filtro por parroquia (pedida o la del usuario)
         if parroquia_id:
-            where_clauses.append('a.parroquiaid = :parroquiaid')
+            where_clauses.append('h.parroquiaid = :parroquiaid')
             params['parroquiaid'] = parroquia_id
 
         # Aplicar filtro por fecha si se proporcionó (validar formato YYYY-MM-DD)
@@ -478,7 +635,7 @@ def list_horarios():
             where_clauses.append('h.h_fecha = :fecha')
             params['fecha'] = fecha
 
-        where_sql = ('WHERE ' + ' AND '.join(where_clauses)) if where_clauses else ''
+        where_sql = 'WHERE ' + ' AND '.join(where_clauses)
 
         # Consulta parametrizada con cláusula WHERE dinámica
         items = db.session.execute(text(f"""
@@ -489,15 +646,15 @@ def list_horarios():
                 a.act_titulo,
                 h.h_fecha,
                 h.h_hora,
-                a.parroquiaid,
+                h.parroquiaid,
                 p.par_nombre as parroquia_nombre,
-                COALESCE(COUNT(r.reservaid), 0) as reservas_total
+                h.reservas_total,
+                h.reservas_activas,
+                h.h_capacidad
             FROM public.horario h
             LEFT JOIN public.actoliturgico a ON h.actoliturgicoid = a.actoliturgicoid
-            LEFT JOIN public.parroquia p ON a.parroquiaid = p.parroquiaid
-            LEFT JOIN public.reserva r ON h.horarioid = r.horarioid
+            LEFT JOIN public.parroquia p ON h.parroquiaid = p.parroquiaid
             {where_sql}
-            GROUP BY h.horarioid, h.actoliturgicoid, a.act_nombre, a.act_titulo, h.h_fecha, h.h_hora, a.parroquiaid, p.par_nombre
             ORDER BY h.h_fecha DESC, h.h_hora DESC
         """), params).fetchall()
 
@@ -513,6 +670,9 @@ def list_horarios():
                 'parroquiaid': row.parroquiaid,
                 'parroquia_nombre': row.parroquia_nombre,
                 'reservas_total': row.reservas_total,
+                'reservas_activas': row.reservas_activas,
+                'h_capacidad': row.h_capacidad,
+                'cupos_disponibles': max(row.h_capacidad - row.reservas_activas, 0) if row.h_capacidad is not None else None,
                 'created_at': getattr(row, 'created_at', None).isoformat() if getattr(row, 'created_at', None) else None,
                 'updated_at': getattr(row, 'updated_at', None).isoformat() if getattr(row, 'updated_at', None) else None
             })
@@ -543,41 +703,66 @@ def create_horario():
 
         if not h_fecha or not h_hora:
             return jsonify({'error': 'Fecha y hora inválidas'}), 400
-
-        result = db.session.execute(text("""
-            INSERT INTO public.horario (actoliturgicoid, h_fecha, h_hora)
-            VALUES (:actoliturgicoid, :h_fecha, :h_hora)
-            RETURNING horarioid, created_at, updated_at
-        """), {
-            'actoliturgicoid': data.get('actoliturgicoid'),
-            'h_fecha': h_fecha,
-            'h_hora': h_hora
-        })
-
-        db.session.commit()
-        new_id = result.fetchone()
-
-        # Obtener el horario creado completo
+        error = check_horizonte(h_fecha)
+        if error:
+            return jsonify({'error': error}), 400
+
+        h_capacidad, error = parse_capacidad(data.get('h_capacidad'))
+        if error:
+            return jsonify({'error': error}), 400
+        h_duracion, error = parse_duracion(data.get('h_duracion'), current_app.config.get('DISPONIBILIDAD_DURACION', 60))
+        if error:
+            return jsonify({'error': error}), 400
+
+        ensure_partitions([h_fecha])
+        # Horario + datos para la respuesta en una sola sentencia. Sin fila: el acto no
+        # existe o está borrado; con horarioid NULL: el acto ya tiene ese horario
         horario = db.session.execute(text("""
+            WITH a AS (
+                SELECT actoliturgicoid, act_nombre, act_titulo
+                FROM public.actoliturgico
+                WHERE actoliturgicoid = :actoliturgicoid AND deleted_at IS NULL
+            ), h AS (
+                INSERT INTO public.horario (actoliturgicoid, h_fecha, h_hora, h_capacidad, h_duracion)
+                SELECT actoliturgicoid, :h_fecha, :h_hora, :h_capacidad, :h_duracion FROM a
+                ON CONFLICT (actoliturgicoid, h_fecha, h_hora) WHERE deleted_at IS NULL DO NOTHING
+                RETURNING *
+            )
             SELECT
                 h.horarioid,
-                h.actoliturgicoid,
+                a.actoliturgicoid,
                 a.act_nombre,
                 a.act_titulo,
                 h.h_fecha,
                 h.h_hora,
-                a.parroquiaid,
+                h.parroquiaid,
                 p.par_nombre as parroquia_nombre,
                 h.created_at,
                 h.updated_at,
-                COALESCE(COUNT(r.reservaid), 0) as reservas_total
-            FROM public.horario h
-            LEFT JOIN public.actoliturgico a ON h.actoliturgicoid = a.actoliturgicoid
-            LEFT JOIN public.parroquia p ON a.parroquiaid = p.parroquiaid
-            LEFT JOIN public.reserva r ON h.horarioid = r.horarioid
-            WHERE h.horarioid = :id
-            GROUP BY h.horarioid, h.actoliturgicoid, a.act_nombre, a.act_titulo, h.h_fecha, h.h_hora, a.parroquiaid, p.par_nombre, h.created_at, h.updated_at
-        """), {'id': new_id.horarioid}).fetchone()
+                h.reservas_total,
+                h.reservas_activas,
+                h.h_capacidad,
+                h.h_duracion
+            FROM a
+            LEFT JOIN h ON TRUE
+            LEFT JOIN public.parroquia p ON h.parroquiaid = p.parroquiaid
+        """), {
+            'actoliturgicoid': data.get('actoliturgicoid'),
+            'h_fecha': h_fecha,
+            'h_hora': h_hora,
+            'h_capacidad': h_capacidad,
+            'h_duracion': h_duracion
+        }).fetchone()
+
+        if not horario:
+            db.session.rollback()
+            return jsonify({'error': 'Acto litúrgico no encontrado'}), 404
+        if horario.horarioid is None:
+            db.session.rollback()
+            return jsonify({'error': 'El acto ya tiene un horario con esa fecha y hora'}), 409
+
+        db.session.commit()
+        invalidate_calendar_days([h_fecha])
 
         return jsonify({
             'item': {
@@ -589,17 +774,481 @@ def create_horario():
                 'h_hora': horario.h_hora.strftime('%H:%M') if horario.h_hora else None,
                 'parroquiaid': horario.parroquiaid,
                 'parroquia_nombre': horario.parroquia_nombre,
-                'reservas_total': 0,  # Un horario nuevo no tiene reservas aún
+                'reservas_total': horario.reservas_total,
+                'reservas_activas': horario.reservas_activas,
+                'h_capacidad': horario.h_capacidad,
+                'cupos_disponibles': max(horario.h_capacidad - horario.reservas_activas, 0) if horario.h_capacidad is not None else None,
+                'h_duracion': horario.h_duracion,
                 'created_at': horario.created_at.isoformat() if horario.created_at else None,
                 'updated_at': horario.updated_at.isoformat() if horario.updated_at else None
             }
         }), 201
 
+    except IntegrityError as e:
+        db.session.rollback()
+        if is_overlap_error(e):
+            return jsonify({'error': MENSAJE_SOLAPE}), 409
+        print('Error create_horario', e)
+        return jsonify({'error': 'Error interno del servidor'}), 500
     except Exception as e:
         print('Error create_horario', e)
         db.session.rollback()
         return jsonify({'error': 'Error interno del servidor'}), 500
 
+@liturgical_bp.route('/horarios/<int:horario_id>', methods=['DELETE'])
+@jwt_required()
+def delete_horario(horario_id):
+    """Elimina un horario (borrado lógico; sus reservas las borra scripts/purge_deleted.py)"""
+    try:
+        fecha = db.session.execute(text("""
+            UPDATE public.horario SET deleted_at = NOW()
+            WHERE horarioid = :id AND deleted_at IS NULL
+            RETURNING h_fecha
+        """), {'id': horario_id}).scalar()
+        db.session.commit()
+
+        if not fecha:
+            return jsonify({'error': 'No encontrado'}), 404
+
+        invalidate_calendar_days([fecha])
+        return jsonify({'message': 'Eliminado correctamente'}), 200
+
+    except Exception as e:
+        print('Error delete_horario', e)
+        db.session.rollback()
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+@liturgical_bp.route('/horarios/bulk', methods=['POST'])
+@jwt_required()
+def bulk_horarios():
+    """Crea y/o actualiza horarios en lote, de forma atómica.
+
+    Body: {'items': [{'actoliturgicoid', 'h_fecha', 'h_hora', 'horarioid'?}, ...]}.
+    Los items con horarioid actualizan ese horario; el resto se crean. Si algún item es
+    inválido o choca con un horario existente no se guarda nada y se devuelven los
+    errores por índice.
+    """
+    try:
+        data = request.get_json() or {}
+        items = data.get('items')
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'items debe ser una lista no vacía'}), 400
+        max_items = current_app.config.get('HORARIOS_BULK_MAX', 1000)
+        if len(items) > max_items:
+            return jsonify({'error': f'Máximo {max_items} horarios por lote'}), 400
+
+        # 1. Validación de formato por item
+        errores = []
+        filas = []  # (indice, horarioid | None, actoliturgicoid, fecha, hora)
+        for i, item in enumerate(items):
+            if not isinstance(item, dict):
+                errores.append({'indice': i, 'error': 'Item inválido'})
+                continue
+            h_fecha = parse_date(item.get('h_fecha') or '')
+            h_hora = parse_time(item.get('h_hora') or '')
+            try:
+                acto_id = int(item.get('actoliturgicoid'))
+                horario_id = int(item['horarioid']) if item.get('horarioid') else None
+            except (TypeError, ValueError):
+                errores.append({'indice': i, 'error': 'actoliturgicoid/horarioid inválido'})
+                continue
+            if not h_fecha or not h_hora:
+                errores.append({'indice': i, 'error': 'Fecha y hora inválidas'})
+                continue
+            error = check_horizonte(h_fecha)
+            if error:
+                errores.append({'indice': i, 'error': error})
+                continue
+            filas.append((i, horario_id, acto_id, h_fecha, h_hora))
+
+        # 2. Validación contra la base, en una consulta por tipo
+        actos = {r.actoliturgicoid for r in db.session.execute(text(
+            'SELECT actoliturgicoid FROM public.actoliturgico WHERE actoliturgicoid = ANY(:ids) AND deleted_at IS NULL'
+        ), {'ids': list({f[2] for f in filas})})}
+        ids_update = [f[1] for f in filas if f[1]]
+        anteriores = {r.horarioid: r.h_fecha for r in db.session.execute(text(
+            'SELECT horarioid, h_fecha FROM public.horario WHERE horarioid = ANY(:ids) AND deleted_at IS NULL'
+        ), {'ids': ids_update})}
+        existentes = {}
+        if filas:
+            existentes = {(r.actoliturgicoid, r.h_fecha, r.h_hora): r.horarioid for r in db.session.execute(text("""
+                SELECT h.horarioid, h.actoliturgicoid, h.h_fecha, h.h_hora
+                FROM public.horario h
+                JOIN unnest(CAST(:actos AS INTEGER[]), CAST(:fechas AS DATE[]), CAST(:horas AS TIME[]))
+                     AS x(actoliturgicoid, h_fecha, h_hora)
+                  ON h.actoliturgicoid = x.actoliturgicoid AND h.h_fecha = x.h_fecha AND h.h_hora = x.h_hora
+                WHERE h.deleted_at IS NULL
+            """), {
+                'actos': [f[2] for f in filas],
+                'fechas': [f[3] for f in filas],
+                'horas': [f[4] for f in filas]
+            })}
+
+        vistos = {}
+        for i, horario_id, acto_id, h_fecha, h_hora in filas:
+            clave = (acto_id, h_fecha, h_hora)
+            if acto_id not in actos:
+                errores.append({'indice': i, 'error': f'El acto {acto_id} no existe'})
+            elif horario_id and horario_id not in anteriores:
+                errores.append({'indice': i, 'error': f'El horario {horario_id} no existe'})
+            elif clave in vistos:
+                errores.append({'indice': i, 'error': f'Repetido en el lote (índice {vistos[clave]})'})
+            elif clave in existentes and existentes[clave] != horario_id:
+                errores.append({'indice': i, 'error': f'Ya existe el horario {existentes[clave]} con esa fecha y hora'})
+            vistos.setdefault(clave, i)
+
+        if errores:
+            errores.sort(key=lambda e: e['indice'])
+            return jsonify({'error': 'Lote inválido, no se guardó ningún horario', 'errores': errores}), 400
+
+        # 3. Escritura: un INSERT y un UPDATE multi-fila
+        ensure_partitions([f[3] for f in filas])
+        nuevos = [f for f in filas if not f[1]]
+        cambios = [f for f in filas if f[1]]
+        ids_por_indice = {}
+        if nuevos:
+            creados = db.session.execute(text("""
+                INSERT INTO public.horario (actoliturgicoid, h_fecha, h_hora)
+                SELECT * FROM unnest(CAST(:actos AS INTEGER[]), CAST(:fechas AS DATE[]), CAST(:horas AS TIME[]))
+                ON CONFLICT (actoliturgicoid, h_fecha, h_hora) WHERE deleted_at IS NULL DO NOTHING
+                RETURNING horarioid, actoliturgicoid, h_fecha, h_hora
+            """), {
+                'actos': [f[2] for f in nuevos],
+                'fechas': [f[3] for f in nuevos],
+                'horas': [f[4] for f in nuevos]
+            }).fetchall()
+            por_clave = {(r.actoliturgicoid, r.h_fecha, r.h_hora): r.horarioid for r in creados}
+            for i, _, acto_id, h_fecha, h_hora in nuevos:
+                if (acto_id, h_fecha, h_hora) not in por_clave:
+                    # Otro usuario lo creó entre la validación y el INSERT
+                    db.session.rollback()
+                    return jsonify({
+                        'error': 'Lote inválido, no se guardó ningún horario',
+                        'errores': [{'indice': i, 'error': 'Ya existe un horario con esa fecha y hora'}]
+                    }), 409
+                ids_por_indice[i] = por_clave[(acto_id, h_fecha, h_hora)]
+        if cambios:
+            db.session.execute(text("""
+                UPDATE public.horario h
+                SET actoliturgicoid = x.actoliturgicoid, h_fecha = x.h_fecha, h_hora = x.h_hora
+                FROM unnest(CAST(:ids AS INTEGER[]), CAST(:anteriores AS DATE[]), CAST(:actos AS INTEGER[]),
+                            CAST(:fechas AS DATE[]), CAST(:horas AS TIME[]))
+                     AS x(horarioid, anterior, actoliturgicoid, h_fecha, h_hora)
+                WHERE h.horarioid = x.horarioid
+                  AND h.h_fecha = x.anterior
+            """), {
+                'ids': [f[1] for f in cambios],
+                'anteriores': [anteriores[f[1]] for f in cambios],
+                'actos': [f[2] for f in cambios],
+                'fechas': [f[3] for f in cambios],
+                'horas': [f[4] for f in cambios]
+            })
+            for f in cambios:
+                ids_por_indice[f[0]] = f[1]
+
+        db.session.commit()
+        invalidate_calendar_days({f[3] for f in filas} | set(anteriores.values()))
+
+        # 4. Resultado completo en una sola consulta
+        ids = [ids_por_indice[f[0]] for f in filas]
+        rows = {r.horarioid: r for r in db.session.execute(text("""
+            SELECT
+                h.horarioid,
+                h.actoliturgicoid,
+                a.act_nombre,
+                a.act_titulo,
+                h.h_fecha,
+                h.h_hora,
+                h.parroquiaid,
+                p.par_nombre as parroquia_nombre,
+                h.reservas_total,
+                h.reservas_activas,
+                h.h_capacidad,
+                h.created_at,
+                h.updated_at
+            FROM public.horario h
+            LEFT JOIN public.actoliturgico a ON h.actoliturgicoid = a.actoliturgicoid
+            LEFT JOIN public.parroquia p ON h.parroquiaid = p.parroquiaid
+            WHERE h.horarioid = ANY(:ids)
+        """), {'ids': ids})}
+
+        result = []
+        for horario_id in ids:
+            row = rows[horario_id]
+            result.append({
+                'horarioid': row.horarioid,
+                'actoliturgicoid': row.actoliturgicoid,
+                'acto_nombre': row.act_nombre,
+                'acto_titulo': row.act_titulo,
+                'h_fecha': row.h_fecha.isoformat() if row.h_fecha else None,
+                'h_hora': row.h_hora.strftime('%H:%M') if row.h_hora else None,
+                'parroquiaid': row.parroquiaid,
+                'parroquia_nombre': row.parroquia_nombre,
+                'reservas_total': row.reservas_total,
+                'reservas_activas': row.reservas_activas,
+                'h_capacidad': row.h_capacidad,
+                'cupos_disponibles': max(row.h_capacidad - row.reservas_activas, 0) if row.h_capacidad is not None else None,
+                'created_at': row.created_at.isoformat() if row.created_at else None,
+                'updated_at': row.updated_at.isoformat() if row.updated_at else None
+            })
+
+        return jsonify({'items': result, 'creados': len(nuevos), 'actualizados': len(cambios)}), 200
+    except IntegrityError as e:
+        db.session.rollback()
+        if is_overlap_error(e):
+            return jsonify({'error': f'Lote inválido, no se guardó ningún horario: {MENSAJE_SOLAPE.lower()}'}), 409
+        # Choque de fecha/hora entre horarios actualizados en el mismo lote
+        print('Error bulk_horarios', e)
+        return jsonify({'error': 'Lote inválido, hay horarios con la misma fecha y hora'}), 409
+    except Exception as e:
+        print('Error bulk_horarios', e)
+        db.session.rollback()
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+@liturgical_bp.route('/horarios/conflictos', methods=['GET'])
+@jwt_required()
+def list_conflictos_horario():
+    """Pares de horarios de una misma parroquia que se cruzan (opcionalmente entre `from` y `to`).
+
+    Un único self-join sobre el índice GiST (parroquiaid, h_rango); sirve para depurar la
+    base antes de crear la restricción horario_sin_solape.
+    """
+    try:
+        where = ['h1.parroquiaid IS NOT NULL', 'h1.deleted_at IS NULL']
+        params = {'limite': current_app.config.get('HORARIOS_CONFLICTOS_MAX', 1000)}
+
+        if request.args.get('from') or request.args.get('to'):
+            desde = parse_date(request.args['from']) if request.args.get('from') else None
+            hasta = parse_date(request.args['to']) if request.args.get('to') else None
+            if (request.args.get('from') and not desde) or (request.args.get('to') and not hasta):
+                return jsonify({'error': 'Formato de fecha inválido. Use YYYY-MM-DD'}), 400
+            where.append('h1.h_rango && tsrange(:inicio, :fin)')
+            params['inicio'] = datetime.combine(desde, datetime.min.time()) if desde else None
+            params['fin'] = datetime.combine(hasta + timedelta(days=1), datetime.min.time()) if hasta else None
+
+        parroquia_id = resolve_parroquia_filter(request.args.get('parroquiaid', type=int))
+        if parroquia_id:
+            where.append('h1.parroquiaid = :parroquiaid')
+            params['parroquiaid'] = parroquia_id
+
+        rows = db.session.execute(text(f"""
+            SELECT
+                h1.parroquiaid,
+                p.par_nombre as parroquia_nombre,
+                h1.horarioid as horarioid_a,
+                a1.act_titulo as acto_titulo_a,
+                lower(h1.h_rango) as inicio_a,
+                upper(h1.h_rango) as fin_a,
+                h2.horarioid as horarioid_b,
+                a2.act_titulo as acto_titulo_b,
+                lower(h2.h_rango) as inicio_b,
+                upper(h2.h_rango) as fin_b
+            FROM public.horario h1
+            JOIN public.horario h2
+              ON h2.parroquiaid = h1.parroquiaid
+             AND h2.h_rango && h1.h_rango
+             AND h2.horarioid > h1.horarioid
+             AND h2.deleted_at IS NULL
+            JOIN public.actoliturgico a1 ON a1.actoliturgicoid = h1.actoliturgicoid
+            JOIN public.actoliturgico a2 ON a2.actoliturgicoid = h2.actoliturgicoid
+            LEFT JOIN public.parroquia p ON p.parroquiaid = h1.parroquiaid
+            WHERE {' AND '.join(where)}
+            ORDER BY h1.parroquiaid, lower(h1.h_rango), h1.horarioid, h2.horarioid
+            LIMIT :limite
+        """), params).fetchall()
+
+        result = [{
+            'parroquiaid': r.parroquiaid,
+            'parroquia_nombre': r.parroquia_nombre,
+            'a': {
+                'horarioid': r.horarioid_a,
+                'acto_titulo': r.acto_titulo_a,
+                'inicio': r.inicio_a.isoformat(timespec='minutes') if r.inicio_a else None,
+                'fin': r.fin_a.isoformat(timespec='minutes') if r.fin_a else None
+            },
+            'b': {
+                'horarioid': r.horarioid_b,
+                'acto_titulo': r.acto_titulo_b,
+                'inicio': r.inicio_b.isoformat(timespec='minutes') if r.inicio_b else None,
+                'fin': r.fin_b.isoformat(timespec='minutes') if r.fin_b else None
+            }
+        } for r in rows]
+
+        return jsonify({'items': result, 'total': len(result), 'truncado': len(result) == params['limite']}), 200
+    except Exception as e:
+        print('Error list_conflictos_horario', e)
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+# =========================================================
+# RECURRENCIAS (reglas que generan horarios)
+# =========================================================
+
+def parse_recurrencia(data):
+    """Valida el cuerpo de una regla. Devuelve (campos, None) o (None, mensaje_error)"""
+    frecuencia = (data.get('frecuencia') or '').strip().lower()
+    if frecuencia not in FRECUENCIAS:
+        return None, 'frecuencia debe ser semanal o mensual'
+    try:
+        dia_semana = int(data.get('dia_semana'))
+        intervalo = int(data.get('intervalo') or 1)
+        semana_mes = int(data['semana_mes']) if data.get('semana_mes') not in (None, '') else None
+    except (TypeError, ValueError):
+        return None, 'dia_semana, semana_mes e intervalo deben ser números'
+    if not 0 <= dia_semana <= 6:
+        return None, 'dia_semana debe estar entre 0 (lunes) y 6 (domingo)'
+    if intervalo < 1:
+        return None, 'intervalo debe ser mayor o igual a 1'
+    if frecuencia == 'mensual' and semana_mes not in (-1, 1, 2, 3, 4, 5):
+        return None, 'semana_mes debe ser 1..5 o -1 (último) para frecuencia mensual'
+
+    h_hora = parse_time(data.get('h_hora') or '')
+    fecha_inicio = parse_date(data.get('fecha_inicio') or '')
+    if not h_hora or not fecha_inicio:
+        return None, 'h_hora (HH:MM) y fecha_inicio (YYYY-MM-DD) son requeridos'
+    fecha_fin = None
+    if data.get('fecha_fin'):
+        fecha_fin = parse_date(data.get('fecha_fin'))
+        if not fecha_fin or fecha_fin < fecha_inicio:
+            return None, 'fecha_fin inválida'
+
+    excepciones = []
+    for valor in data.get('excepciones') or []:
+        fecha = parse_date(valor)
+        if not fecha:
+            return None, f'Fecha de excepción inválida: {valor}'
+        excepciones.append(fecha)
+
+    omitir = [str(v).strip().lower() for v in data.get('omitir_liturgia') or []]
+    invalidos = [v for v in omitir if v not in TIEMPOS and v not in FIESTAS]
+    if invalidos:
+        return None, f"Tiempos o fiestas inválidos en omitir_liturgia: {', '.join(invalidos)}"
+
+    return {
+        'frecuencia': frecuencia,
+        'dia_semana': dia_semana,
+        'semana_mes': semana_mes if frecuencia == 'mensual' else None,
+        'intervalo': intervalo if frecuencia == 'semanal' else 1,
+        'h_hora': h_hora,
+        'fecha_inicio': fecha_inicio,
+        'fecha_fin': fecha_fin,
+        'excepciones': sorted(set(excepciones)),
+        'omitir_liturgia': sorted(set(omitir))
+    }, None
+
+def parse_horizonte(data):
+    """Rango [desde, hasta] a expandir: (desde, hasta, error | None). Por defecto hoy +
+    RECURRENCIA_HORIZONTE_DIAS; nunca más de RECURRENCIA_HORIZONTE_MAX_DIAS"""
+    desde = parse_date(data['desde']) if data.get('desde') else datetime.now().date()
+    if data.get('hasta'):
+        hasta = parse_date(data['hasta'])
+    else:
+        hasta = desde + timedelta(days=current_app.config.get('RECURRENCIA_HORIZONTE_DIAS', 365)) if desde else None
+    if not desde or not hasta or hasta < desde:
+        return None, None, 'Rango desde/hasta inválido'
+    max_dias = current_app.config.get('RECURRENCIA_HORIZONTE_MAX_DIAS', 800)
+    if (hasta - desde).days > max_dias:
+        return None, None, f'El rango no puede superar {max_dias} días'
+    return desde, hasta, None
+
+@liturgical_bp.route('/recurrencias', methods=['GET'])
+@jwt_required()
+def list_recurrencias():
+    """Lista las reglas de recurrencia (filtro opcional por parroquia y acto)"""
+    try:
+        q = HorarioRecurrencia.query.join(ActoLiturgico)
+        parroquia_id = resolve_parroquia_filter(request.args.get('parroquiaid', type=int))
+        if parroquia_id:
+            q = q.filter(ActoLiturgico.parroquiaid == parroquia_id)
+        acto_id = request.args.get('actoliturgicoid', type=int)
+        if acto_id:
+            q = q.filter(HorarioRecurrencia.actoliturgicoid == acto_id)
+        reglas = q.order_by(HorarioRecurrencia.recurrenciaid).all()
+        return jsonify({'items': [r.to_dict() for r in reglas]}), 200
+    except Exception as e:
+        print('Error list_recurrencias', e)
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+@liturgical_bp.route('/recurrencias', methods=['POST'])
+@jwt_required()
+def create_recurrencia():
+    """Crea una regla y genera sus horarios en el horizonte por defecto (o desde/hasta)"""
+    try:
+        data = request.get_json() or {}
+        # Actos borrados o de otra parroquia (usuario restringido) no existen para la regla
+        acto = ActoLiturgico.query.filter(
+            ActoLiturgico.actoliturgicoid == (data.get('actoliturgicoid') or 0),
+            ActoLiturgico.deleted_at.is_(None)
+        ).first()
+        parroquia_id = resolve_parroquia_filter()
+        if not acto or (parroquia_id and acto.parroquiaid != parroquia_id):
+            return jsonify({'error': 'Acto litúrgico no encontrado'}), 404
+
+        campos, error = parse_recurrencia(data)
+        if error:
+            return jsonify({'error': error}), 400
+        desde, hasta, error = parse_horizonte(data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        regla = HorarioRecurrencia(actoliturgicoid=acto.actoliturgicoid, **campos)
+        db.session.add(regla)
+        db.session.flush()
+
+        resultado = expand_recurrences(desde, hasta, recurrencia_ids=[regla.recurrenciaid])
+        db.session.commit()
+        invalidate_calendar_days(resultado.pop('fechas'))
+
+        return jsonify({'item': regla.to_dict(), 'expansion': resultado}), 201
+    except Exception as e:
+        print('Error create_recurrencia', e)
+        db.session.rollback()
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+@liturgical_bp.route('/recurrencias/<int:recurrencia_id>', methods=['DELETE'])
+@jwt_required()
+def delete_recurrencia(recurrencia_id):
+    """Elimina una regla. Los horarios ya generados (y sus reservas) se conservan"""
+    try:
+        regla = HorarioRecurrencia.query.get(recurrencia_id)
+        parroquia_id = resolve_parroquia_filter()
+        if not regla or (parroquia_id and regla.acto_liturgico.parroquiaid != parroquia_id):
+            return jsonify({'error': 'No encontrado'}), 404
+        db.session.delete(regla)
+        db.session.commit()
+        return jsonify({'message': 'Eliminado correctamente'}), 200
+    except Exception as e:
+        print('Error delete_recurrencia', e)
+        db.session.rollback()
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+@liturgical_bp.route('/recurrencias/expandir', methods=['POST'])
+@jwt_required()
+def expandir_recurrencias():
+    """Genera los horarios de todas las reglas activas (de la parroquia) en desde/hasta.
+
+    Es idempotente: los horarios que ya existen no se duplican.
+    """
+    try:
+        data = request.get_json() or {}
+        desde, hasta, error = parse_horizonte(data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        parroquia_id = resolve_parroquia_filter(data.get('parroquiaid'))
+        resultado = expand_recurrences(desde, hasta, parroquiaid=parroquia_id)
+        db.session.commit()
+        invalidate_calendar_days(resultado.pop('fechas'))
+
+        return jsonify({
+            'desde': desde.isoformat(),
+            'hasta': hasta.isoformat(),
+            **resultado
+        }), 200
+    except Exception as e:
+        print('Error expandir_recurrencias', e)
+        db.session.rollback()
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
 # =========================================================
 # RESERVAS
 # =========================================================
@@ -607,9 +1256,31 @@ def create_horario():
 @liturgical_bp.route('/reservas', methods=['GET'])
 @jwt_required()
 def list_reservas():
-    """Lista todas las reservas de actos litúrgicos"""
+    """Lista reservas con filtros y paginación por cursor (created_at, reservaid).
+
+    Filtros opcionales: parroquiaid, desde/hasta (fecha del horario), act_nombre,
+    pago_estado, personaid. `limit` (máx. 500) y `cursor` = next_cursor de la página anterior.
+    Con historico=1 se suman las reservas de años archivados (app/utils/archive.py).
+    """
     try:
-        items = db.session.execute(text("""
+        limit = min(max(request.args.get('limit', 100, type=int), 1), 500)
+        historico = parse_flag(request.args.get('historico'))
+        where_clauses, params, error = build_reservas_filters(request.args)
+        if error:
+            return jsonify({'error': error}), 400
+        params['limit'] = limit + 1
+
+        if request.args.get('cursor'):
+            cursor = decode_cursor(request.args.get('cursor'))
+            if not cursor:
+                return jsonify({'error': 'Cursor inválido'}), 400
+            # Comparación de fila: usa idx_reserva_keyset (created_at DESC, reservaid DESC)
+            where_clauses.append('(r.created_at, r.reservaid) < (:cursor_created_at, :cursor_id)')
+            params['cursor_created_at'], params['cursor_id'] = cursor
+
+        where_sql = ('WHERE ' + ' AND '.join(where_clauses)) if where_clauses else ''
+
+        sql = f"""
             SELECT
                 r.reservaid,
                 r.horarioid,
@@ -632,13 +1303,34 @@ def list_reservas():
                 COALESCE(pg.pago_estado, 'pendiente') as pago_estado,
                 COALESCE(pg.pago_estado, 'pendiente') as estado_texto
             FROM public.reserva r
-            LEFT JOIN public.horario h ON r.horarioid = h.horarioid
+            LEFT JOIN public.horario h ON r.horarioid = h.horarioid AND r.h_fecha = h.h_fecha
             LEFT JOIN public.actoliturgico a ON h.actoliturgicoid = a.actoliturgicoid
-            LEFT JOIN public.parroquia p ON a.parroquiaid = p.parroquiaid
+            LEFT JOIN public.parroquia p ON h.parroquiaid = p.parroquiaid
             LEFT JOIN public.persona per ON r.personaid = per.personaid
             LEFT JOIN public.pago pg ON r.pagoid = pg.pagoid
-            ORDER BY r.created_at DESC
-        """)).fetchall()
+            {where_sql}
+            ORDER BY r.created_at DESC, r.reservaid DESC
+            LIMIT :limit
+        """
+        if historico:
+            # Cada rama trae su página (la viva sigue usando idx_reserva_keyset) y se mezclan
+            sql = f"""
+                SELECT * FROM (
+                    ({sql})
+                    UNION ALL
+                    ({archived_reservas_sql(LISTADO_COLUMNAS, params)}
+                     ORDER BY x.created_at DESC, x.reservaid DESC
+                     LIMIT :limit)
+                ) libro
+                ORDER BY created_at DESC, reservaid DESC
+                LIMIT :limit
+            """
+
+        items = db.session.execute(text(sql), params).fetchall()
+
+        has_more = len(items) > limit
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1].created_at, items[-1].reservaid) if has_more else None
 
         result = []
         for row in items:
@@ -662,12 +1354,125 @@ def list_reservas():
                 'updated_at': row.updated_at.isoformat() if row.updated_at else None
             })
 
-        return jsonify({'items': result}), 200
+        return jsonify({'items': result, 'next_cursor': next_cursor, 'has_more': has_more}), 200
     except Exception as e:
         print('Error list_reservas', e)
         return jsonify({'error': 'Error interno del servidor'}), 500
 
-@liturgical_bp.route('/reservas', methods=['POST'])
+# Columnas de GET /reservas, en el orden del SELECT (UNION ALL con el archivo)
+LISTADO_COLUMNAS = [
+    'reservaid', 'horarioid', 'personaid', 'pagoid', 'res_persona_nombre', 'res_descripcion',
+    'created_at', 'updated_at', 'h_fecha', 'h_hora', 'act_nombre', 'act_titulo',
+    'parroquia_nombre', 'persona_nombre', 'pago_estado', 'estado_texto'
+]
+
+# Columnas del libro de reservas para contabilidad (orden del CSV)
+EXPORT_COLUMNAS = [
+    'reservaid', 'created_at', 'h_fecha', 'h_hora', 'parroquia_nombre', 'act_nombre',
+    'personaid', 'persona_nombre', 'res_descripcion', 'pagoid', 'pago_estado',
+    'pago_monto', 'pago_medio'
+]
+
+
+def _export_value(value):
+    if value is None:
+        return None
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, (int, float, str, bool)):
+        return value
+    return str(value)  # Decimal de pago_monto
+
+
+@liturgical_bp.route('/reservas/export', methods=['GET'])
+@jwt_required()
+def export_reservas():
+    """Exporta el libro de reservas completo en CSV o NDJSON, en streaming.
+
+    Acepta los mismos filtros que GET /reservas (también historico=1). Las filas se
+    leen de un cursor de servidor (yield_per) en bloques de RESERVAS_EXPORT_BATCH, así
+    la memoria del worker no crece con el tamaño de la exportación.
+    """
+    try:
+        formato = (request.args.get('format') or 'csv').lower()
+        if formato not in ('csv', 'ndjson'):
+            return jsonify({'error': 'Formato no soportado (csv o ndjson)'}), 400
+
+        # Filtros y alcance se resuelven aquí, con el contexto de la request aún activo
+        where_clauses, params, error = build_reservas_filters(request.args)
+        if error:
+            return jsonify({'error': error}), 400
+        where_sql = ('WHERE ' + ' AND '.join(where_clauses)) if where_clauses else ''
+        batch = current_app.config.get('RESERVAS_EXPORT_BATCH', 2000)
+        engine = db.engine
+
+        archivo_sql = ''
+        if parse_flag(request.args.get('historico')):
+            archivo_sql = f'UNION ALL {archived_reservas_sql(EXPORT_COLUMNAS, params)}'
+
+        sql = text(f"""
+            SELECT
+                r.reservaid,
+                r.created_at,
+                h.h_fecha,
+                h.h_hora,
+                p.par_nombre as parroquia_nombre,
+                a.act_nombre,
+                r.personaid,
+                COALESCE(
+                    per.per_nombres || ' ' || per.per_apellidos,
+                    r.res_persona_nombre
+                ) as persona_nombre,
+                r.res_descripcion,
+                r.pagoid,
+                COALESCE(pg.pago_estado, 'pendiente') as pago_estado,
+                pg.pago_monto,
+                pg.pago_medio
+            FROM public.reserva r
+            LEFT JOIN public.horario h ON r.horarioid = h.horarioid AND r.h_fecha = h.h_fecha
+            LEFT JOIN public.actoliturgico a ON h.actoliturgicoid = a.actoliturgicoid
+            LEFT JOIN public.parroquia p ON h.parroquiaid = p.parroquiaid
+            LEFT JOIN public.persona per ON r.personaid = per.personaid
+            LEFT JOIN public.pago pg ON r.pagoid = pg.pagoid
+            {where_sql}
+            {archivo_sql}
+            ORDER BY created_at, reservaid
+        """)
+
+        def generate():
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            if formato == 'csv':
+                writer.writerow(EXPORT_COLUMNAS)
+                yield buf.getvalue()
+
+            # Conexión propia: la sesión de la request ya se cerró cuando corre el generador.
+            # yield_per activa stream_results (cursor con nombre en psycopg2).
+            with engine.connect() as conn:
+                result = conn.execution_options(yield_per=batch).execute(sql, params)
+                for rows in result.partitions(batch):
+                    buf.seek(0)
+                    buf.truncate(0)
+                    for row in rows:
+                        valores = [_export_value(getattr(row, c)) for c in EXPORT_COLUMNAS]
+                        if formato == 'csv':
+                            writer.writerow(valores)
+                        else:
+                            buf.write(json.dumps(dict(zip(EXPORT_COLUMNAS, valores)), ensure_ascii=False))
+                            buf.write('\n')
+                    yield buf.getvalue()
+
+        mimetype = 'text/csv' if formato == 'csv' else 'application/x-ndjson'
+        filename = f"reservas_{datetime.now().strftime('%Y%m%d_%H%M')}.{formato}"
+        return Response(generate(), mimetype=f'{mimetype}; charset=utf-8', headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'X-Accel-Buffering': 'no'
+        })
+    except Exception as e:
+        print('Error export_reservas', e)
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+@liturgical_bp.route('/reservas', methods=['POST'])
 @jwt_required()
 def create_reserva():
     """Crea una nueva reserva para un horario"""
@@ -683,75 +1488,70 @@ def create_reserva():
         if any(v in [None, '', False] for v in required):
             return jsonify({'success': False, 'error': 'horarioid es requerido'}), 400
 
-        # Determinar si es persona registrada o no registrada
+        # Persona registrada: se busca por nombre dentro de la misma sentencia
         persona_nombre = data.get('persona_nombre', '').strip()
-        personaid = None
-
-        # Si hay persona_nombre, buscar si existe en la BD
+        persona_sql = 'NULL::integer'
         if persona_nombre:
-            persona_existente = db.session.execute(text("""
-                SELECT personaid FROM public.persona 
+            persona_sql = """(SELECT personaid FROM public.persona
                 WHERE CONCAT(per_nombres, ' ', per_apellidos) ILIKE :nombre
-                LIMIT 1
-            """), {'nombre': persona_nombre}).fetchone()
-            
-            if persona_existente:
-                personaid = persona_existente.personaid
-        
-        # No manejar res_estado aquí - se obtiene dinámicamente de tabla pago
+                LIMIT 1)"""
 
-        # Si hay datos de pago, crear pago primero y luego reserva con pagoid
-        pagoid = data.get('pagoid')
-        pago_data = None
+        # No manejar res_estado aquí - se obtiene dinámicamente de tabla pago
 
-        # Si vienen datos de pago en la request, crear el pago primero
+        # Si vienen datos de pago en la request, el pago se crea en la misma sentencia
+        # (CTE `pg`) y la reserva toma su pagoid; si no, se usa el pagoid recibido.
+        pago = None
         if any(key in data for key in ['pago_medio', 'pago_monto', 'pago_descripcion', 'pago_fecha']):
             try:
-                # Crear pago
-                from app.models import Pago
-                from datetime import datetime
-
-                pago = Pago(
-                    pago_medio=data.get('pago_medio'),
-                    pago_monto=float(data.get('pago_monto')),
-                    pago_estado=data.get('pago_estado', 'pagado'),
-                    pago_descripcion=data.get('pago_descripcion', ''),
-                    pago_fecha=datetime.fromisoformat(data.get('pago_fecha', datetime.now().isoformat()).replace('Z', '+00:00')),
-                    pago_confirmado=datetime.fromisoformat(data.get('pago_fecha', datetime.now().isoformat()).replace('Z', '+00:00')),
-                    pago_expira=datetime.fromisoformat(data.get('pago_fecha', datetime.now().isoformat()).replace('Z', '+00:00')) + timedelta(hours=24)  # Expira en 24 horas
-                )
-                db.session.add(pago)
-                db.session.flush()  # Para obtener el pagoid
-                pagoid = pago.pagoid
-                pago_data = pago
-
-                print(f"✅ [BACKEND] Pago creado con ID: {pagoid}")
-
+                pago_fecha = datetime.fromisoformat(data.get('pago_fecha', datetime.now().isoformat()).replace('Z', '+00:00'))
+                pago = {
+                    'pago_medio': data.get('pago_medio'),
+                    'pago_monto': float(data.get('pago_monto')),
+                    'pago_estado': data.get('pago_estado', 'pagado'),
+                    'pago_descripcion': data.get('pago_descripcion', ''),
+                    'pago_fecha': pago_fecha,
+                    'pago_expira': pago_fecha + timedelta(hours=24)  # Expira en 24 horas
+                }
             except Exception as e:
                 print(f"❌ [BACKEND] Error creando pago: {str(e)}")
-                db.session.rollback()
                 return jsonify({'error': 'Error creando pago'}), 500
 
-        result = db.session.execute(text("""
-            INSERT INTO public.reserva (horarioid, personaid, res_persona_nombre, res_descripcion, pagoid)
-            VALUES (:horarioid, :personaid, :res_persona_nombre, :res_descripcion, :pagoid)
-            RETURNING reservaid, created_at, updated_at
-        """), {
-            'horarioid': data.get('horarioid'),
-            'personaid': personaid,
-            'res_persona_nombre': persona_nombre if not personaid else None,
-            # Permitir que res_descripcion sea NULL si no se envía
-            'res_descripcion': (data.get('res_descripcion') if data.get('res_descripcion') is not None else None),
-            'pagoid': pagoid
-        })
-
-        db.session.commit()
-        new_id = result.fetchone()
-
-        print(f"✅ [BACKEND] Reserva creada con ID: {new_id.reservaid}")
-
-        # Obtener la reserva creada completa
-        reserva = db.session.execute(text("""
+        pago_cte = ''
+        pagoid_sql = ':pagoid'
+        pago_estado_sql = "COALESCE(pe.pago_estado, 'pendiente')"
+        pago_cols = ''
+        pago_join = ''
+        if pago:
+            pago_cte = """pg AS (
+                INSERT INTO public.pago (pago_medio, pago_monto, pago_estado, pago_descripcion,
+                                         pago_fecha, pago_confirmado, pago_expira)
+                VALUES (:pago_medio, :pago_monto, :pago_estado, :pago_descripcion,
+                        :pago_fecha, :pago_fecha, :pago_expira)
+                RETURNING *
+            ), """
+            pagoid_sql = '(SELECT pagoid FROM pg)'
+            pago_estado_sql = "COALESCE(pg.pago_estado, pe.pago_estado, 'pendiente')"
+            pago_cols = """,
+                pg.pago_medio,
+                pg.pago_monto,
+                pg.pago_estado as pg_estado,
+                pg.pago_descripcion,
+                pg.pago_fecha,
+                pg.pago_confirmado,
+                pg.created_at as pago_created_at"""
+            pago_join = 'LEFT JOIN pg ON r.pagoid = pg.pagoid'
+
+        # Pago, reserva y datos para la respuesta en una sola sentencia
+        reserva = db.session.execute(text(f"""
+            WITH {pago_cte}r AS (
+                INSERT INTO public.reserva (horarioid, h_fecha, personaid, res_persona_nombre, res_descripcion, pagoid)
+                SELECT hv.horarioid, hv.h_fecha, m.personaid,
+                       CASE WHEN m.personaid IS NULL THEN :res_persona_nombre END,
+                       :res_descripcion, {pagoid_sql}
+                FROM (SELECT {persona_sql} AS personaid) m
+                JOIN public.horario hv ON hv.horarioid = :horarioid AND hv.deleted_at IS NULL
+                RETURNING *
+            )
             SELECT
                 r.reservaid,
                 r.horarioid,
@@ -771,29 +1571,46 @@ def create_reserva():
                     r.res_persona_nombre
                 ) as persona_nombre,
                 -- Estado del pago: si pagoid es NULL → 'pendiente', sino pago_estado
-                COALESCE(pg.pago_estado, 'pendiente') as pago_estado,
-                COALESCE(pg.pago_estado, 'pendiente') as estado_texto
-            FROM public.reserva r
-            LEFT JOIN public.horario h ON r.horarioid = h.horarioid
+                {pago_estado_sql} as pago_estado,
+                {pago_estado_sql} as estado_texto{pago_cols}
+            FROM r
+            LEFT JOIN public.horario h ON r.horarioid = h.horarioid AND r.h_fecha = h.h_fecha
             LEFT JOIN public.actoliturgico a ON h.actoliturgicoid = a.actoliturgicoid
-            LEFT JOIN public.parroquia p ON a.parroquiaid = p.parroquiaid
+            LEFT JOIN public.parroquia p ON h.parroquiaid = p.parroquiaid
             LEFT JOIN public.persona per ON r.personaid = per.personaid
-            LEFT JOIN public.pago pg ON r.pagoid = pg.pagoid
-            WHERE r.reservaid = :id
-        """), {'id': new_id.reservaid}).fetchone()
+            LEFT JOIN public.pago pe ON r.pagoid = pe.pagoid
+            {pago_join}
+        """), {
+            'horarioid': data.get('horarioid'),
+            'nombre': persona_nombre,
+            'res_persona_nombre': persona_nombre,
+            # Permitir que res_descripcion sea NULL si no se envía
+            'res_descripcion': (data.get('res_descripcion') if data.get('res_descripcion') is not None else None),
+            'pagoid': data.get('pagoid'),
+            **(pago or {})
+        }).fetchone()
+
+        if not reserva:
+            db.session.rollback()
+            return jsonify({'success': False, 'error': 'Horario no encontrado'}), 404
+
+        db.session.commit()
+        invalidate_calendar_days([reserva.h_fecha])
+
+        print(f"✅ [BACKEND] Reserva creada con ID: {reserva.reservaid}")
 
         # Si también se creó un pago, incluir sus datos en la respuesta
         pago_info = None
-        if pago_data:
+        if pago:
             pago_info = {
-                'pagoid': pago_data.pagoid,
-                'pago_medio': pago_data.pago_medio,
-                'pago_monto': float(pago_data.pago_monto),
-                'pago_estado': pago_data.pago_estado,
-                'pago_descripcion': pago_data.pago_descripcion,
-                'pago_fecha': pago_data.pago_fecha.isoformat(),
-                'pago_confirmado': pago_data.pago_confirmado.isoformat() if pago_data.pago_confirmado else None,
-                'created_at': pago_data.created_at.isoformat()
+                'pagoid': reserva.pagoid,
+                'pago_medio': reserva.pago_medio,
+                'pago_monto': float(reserva.pago_monto),
+                'pago_estado': reserva.pg_estado,
+                'pago_descripcion': reserva.pago_descripcion,
+                'pago_fecha': reserva.pago_fecha.isoformat(),
+                'pago_confirmado': reserva.pago_confirmado.isoformat() if reserva.pago_confirmado else None,
+                'created_at': reserva.pago_created_at.isoformat()
             }
             print(f"✅ [BACKEND] Pago incluido en respuesta: {pago_info}")
 
@@ -819,61 +1636,270 @@ def create_reserva():
             'pago': pago_info
         }), 201
 
+    except IntegrityError as e:
+        db.session.rollback()
+        if is_capacity_error(e):
+            return jsonify({'success': False, 'error': 'No hay cupos disponibles para este horario'}), 409
+        print('Error create_reserva', e)
+        return jsonify({'error': 'Error interno del servidor'}), 500
     except Exception as e:
         print('Error create_reserva', e)
         db.session.rollback()
         return jsonify({'success': False, 'error': 'Error interno'}), 500
 
+def allocate_ids(tabla, columna, n):
+    """Toma n ids de la secuencia de identidad, para inserts multi-fila con orden conocido"""
+    return [r[0] for r in db.session.execute(text(
+        'SELECT nextval(pg_get_serial_sequence(:tabla, :columna)) FROM generate_series(1, :n)'
+    ), {'tabla': tabla, 'columna': columna, 'n': n})]
+
+def parse_fecha_pago(valor):
+    return datetime.fromisoformat((valor or datetime.now().isoformat()).replace('Z', '+00:00'))
+
+@liturgical_bp.route('/reservas/batch', methods=['POST'])
+@jwt_required()
+def create_reservas_batch():
+    """Reserva un mismo horario para un grupo (bautizos, primeras comuniones...).
+
+    Body: {'horarioid', 'reservas': [{'persona_nombre', 'res_descripcion'?, 'pago_medio'?,
+    'pago_monto'?, 'pago_estado'?, 'pago_descripcion'?, 'pago_fecha'?}, ...]}.
+    Los nombres se resuelven contra persona en una sola consulta (nombre normalizado, sin
+    tildes ni mayúsculas). Todo se guarda en una transacción: si un item es inválido no se
+    crea ninguna reserva.
+    """
+    try:
+        data = request.get_json() or {}
+        horario_id = data.get('horarioid')
+        reservas = data.get('reservas')
+        if not horario_id or not isinstance(reservas, list) or not reservas:
+            return jsonify({'error': 'horarioid y reservas (lista no vacía) son requeridos'}), 400
+        max_items = current_app.config.get('RESERVAS_BATCH_MAX', 500)
+        if len(reservas) > max_items:
+            return jsonify({'error': f'Máximo {max_items} reservas por lote'}), 400
+
+        horario = db.session.execute(text(
+            'SELECT horarioid, h_fecha FROM public.horario WHERE horarioid = :id AND deleted_at IS NULL'
+        ), {'id': horario_id}).fetchone()
+        if not horario:
+            return jsonify({'error': 'Horario no encontrado'}), 404
+
+        # 1. Validación por item (errores por índice)
+        errores = []
+        filas = []
+        for i, item in enumerate(reservas):
+            if not isinstance(item, dict):
+                errores.append({'indice': i, 'error': 'Item inválido'})
+                continue
+            nombre = (item.get('persona_nombre') or '').strip()
+            if not nombre:
+                errores.append({'indice': i, 'error': 'persona_nombre es requerido'})
+                continue
+            pago = None
+            if any(k in item for k in ('pago_medio', 'pago_monto', 'pago_descripcion', 'pago_fecha')):
+                try:
+                    monto = float(item.get('pago_monto'))
+                    fecha_pago = parse_fecha_pago(item.get('pago_fecha'))
+                except (TypeError, ValueError):
+                    errores.append({'indice': i, 'error': 'pago_monto o pago_fecha inválidos'})
+                    continue
+                if (monto < 0 or item.get('pago_medio') not in ('Yape o Plin', 'Tarjeta', 'Efectivo')
+                        or item.get('pago_estado', 'pagado') not in ('pendiente', 'pagado', 'vencido', 'fallido')):
+                    errores.append({'indice': i, 'error': 'Datos de pago inválidos'})
+                    continue
+                pago = {
+                    'medio': item.get('pago_medio'),
+                    'monto': monto,
+                    'estado': item.get('pago_estado', 'pagado'),
+                    'descripcion': item.get('pago_descripcion', ''),
+                    'fecha': fecha_pago
+                }
+            filas.append({
+                'indice': i,
+                'nombre': nombre,
+                'nombre_norm': normalize_text(nombre),
+                'descripcion': item.get('res_descripcion'),
+                'pago': pago
+            })
+        if errores:
+            return jsonify({'error': 'Lote inválido, no se creó ninguna reserva', 'errores': errores}), 400
+
+        # 2. Personas registradas: una consulta para todos los nombres (idx_persona_dedupe)
+        personas = {r.nombre_norm: r.personaid for r in db.session.execute(text("""
+            SELECT DISTINCT ON (nombre_norm) nombre_norm, personaid
+            FROM (
+                SELECT persona_nombre_norm(per_nombres, per_apellidos) AS nombre_norm, personaid
+                FROM public.persona
+                WHERE persona_nombre_norm(per_nombres, per_apellidos) = ANY(:nombres)
+            ) x
+            ORDER BY nombre_norm, personaid
+        """), {'nombres': list({f['nombre_norm'] for f in filas})})}
+
+        # 3. Pagos en un INSERT multi-fila (ids tomados antes para conservar el orden)
+        con_pago = [f for f in filas if f['pago']]
+        if con_pago:
+            pago_ids = allocate_ids('public.pago', 'pagoid', len(con_pago))
+            for f, pagoid in zip(con_pago, pago_ids):
+                f['pagoid'] = pagoid
+            db.session.execute(text("""
+                INSERT INTO public.pago (
+                    pagoid, pago_medio, pago_monto, pago_estado, pago_descripcion,
+                    pago_fecha, pago_confirmado, pago_expira
+                )
+                OVERRIDING SYSTEM VALUE
+                SELECT x.pagoid, x.medio, x.monto, x.estado, x.descripcion, x.fecha, x.fecha, x.fecha + INTERVAL '24 hours'
+                FROM unnest(
+                    CAST(:ids AS INTEGER[]), CAST(:medios AS VARCHAR[]), CAST(:montos AS NUMERIC[]),
+                    CAST(:estados AS VARCHAR[]), CAST(:descripciones AS TEXT[]), CAST(:fechas AS TIMESTAMP[])
+                ) AS x(pagoid, medio, monto, estado, descripcion, fecha)
+            """), {
+                'ids': pago_ids,
+                'medios': [f['pago']['medio'] for f in con_pago],
+                'montos': [f['pago']['monto'] for f in con_pago],
+                'estados': [f['pago']['estado'] for f in con_pago],
+                'descripciones': [f['pago']['descripcion'] for f in con_pago],
+                'fechas': [f['pago']['fecha'].replace(tzinfo=None) for f in con_pago]
+            })
+
+        # 4. Reservas en un INSERT multi-fila
+        reserva_ids = allocate_ids('public.reserva', 'reservaid', len(filas))
+        personaids = [personas.get(f['nombre_norm']) for f in filas]
+        db.session.execute(text("""
+            INSERT INTO public.reserva (reservaid, horarioid, h_fecha, personaid, res_persona_nombre, res_descripcion, pagoid)
+            OVERRIDING SYSTEM VALUE
+            SELECT x.reservaid, :horarioid, :h_fecha, x.personaid, x.nombre, x.descripcion, x.pagoid
+            FROM unnest(
+                CAST(:ids AS INTEGER[]), CAST(:personas AS INTEGER[]), CAST(:nombres AS VARCHAR[]),
+                CAST(:descripciones AS TEXT[]), CAST(:pagos AS INTEGER[])
+            ) AS x(reservaid, personaid, nombre, descripcion, pagoid)
+        """), {
+            'horarioid': horario.horarioid,
+            'h_fecha': horario.h_fecha,
+            'ids': reserva_ids,
+            'personas': personaids,
+            'nombres': [None if pid else f['nombre'] for f, pid in zip(filas, personaids)],
+            'descripciones': [f['descripcion'] for f in filas],
+            'pagos': [f.get('pagoid') for f in filas]
+        })
+
+        db.session.commit()
+        invalidate_calendar_days([horario.h_fecha])
+
+        # 5. Resultado completo en una sola consulta
+        rows = {r.reservaid: r for r in db.session.execute(text("""
+            SELECT
+                r.reservaid,
+                r.horarioid,
+                r.personaid,
+                r.pagoid,
+                r.res_persona_nombre,
+                r.res_descripcion,
+                r.created_at,
+                r.updated_at,
+                h.h_fecha,
+                h.h_hora,
+                a.act_nombre,
+                a.act_titulo,
+                p.par_nombre as parroquia_nombre,
+                COALESCE(
+                    per.per_nombres || ' ' || per.per_apellidos,
+                    r.res_persona_nombre
+                ) as persona_nombre,
+                COALESCE(pg.pago_estado, 'pendiente') as pago_estado,
+                pg.pago_medio,
+                pg.pago_monto
+            FROM public.reserva r
+            LEFT JOIN public.horario h ON r.horarioid = h.horarioid AND r.h_fecha = h.h_fecha
+            LEFT JOIN public.actoliturgico a ON h.actoliturgicoid = a.actoliturgicoid
+            LEFT JOIN public.parroquia p ON h.parroquiaid = p.parroquiaid
+            LEFT JOIN public.persona per ON r.personaid = per.personaid
+            LEFT JOIN public.pago pg ON r.pagoid = pg.pagoid
+            WHERE r.reservaid = ANY(:ids)
+        """), {'ids': reserva_ids})}
+
+        result = []
+        for reservaid in reserva_ids:
+            row = rows[reservaid]
+            result.append({
+                'reservaid': row.reservaid,
+                'id': row.reservaid,
+                'horarioid': row.horarioid,
+                'personaid': row.personaid,
+                'pagoid': row.pagoid,
+                'res_persona_nombre': row.res_persona_nombre,
+                'persona_nombre': row.persona_nombre,
+                'res_descripcion': row.res_descripcion,
+                'pago_estado': row.pago_estado,
+                'estado_texto': row.pago_estado.capitalize() if row.pago_estado else 'Pendiente',
+                'pago_medio': row.pago_medio,
+                'pago_monto': float(row.pago_monto) if row.pago_monto is not None else None,
+                'h_fecha': row.h_fecha.isoformat() if row.h_fecha else None,
+                'h_hora': row.h_hora.strftime('%H:%M') if row.h_hora else None,
+                'acto_nombre': row.act_nombre,
+                'acto_titulo': row.act_titulo,
+                'parroquia_nombre': row.parroquia_nombre,
+                'created_at': row.created_at.isoformat() if row.created_at else None,
+                'updated_at': row.updated_at.isoformat() if row.updated_at else None
+            })
+
+        return jsonify({
+            'items': result,
+            'resumen': {
+                'reservas': len(result),
+                'personas_registradas': sum(1 for pid in personaids if pid),
+                'pagos': len(con_pago)
+            }
+        }), 201
+    except IntegrityError as e:
+        db.session.rollback()
+        if is_capacity_error(e):
+            return jsonify({'error': 'No hay cupos disponibles para este horario'}), 409
+        print('Error create_reservas_batch', e)
+        return jsonify({'error': 'Error interno del servidor'}), 500
+    except Exception as e:
+        print('Error create_reservas_batch', e)
+        db.session.rollback()
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
 @liturgical_bp.route('/reservas/<int:reservaid>', methods=['PUT'])
 @jwt_required()
 def update_reserva(reservaid):
     """Actualiza una reserva"""
     try:
         data = request.get_json() or {}
+        if data.get('horarioid') in [None, '', False]:
+            return jsonify({'error': 'horarioid es requerido'}), 400
         
         # Determinar si es persona registrada o no registrada
         # IMPORTANTE: Ignorar personaid del frontend, siempre buscar por nombre
         persona_nombre = data.get('persona_nombre', '').strip()
-        personaid = None
-        
-        # Si hay persona_nombre, buscar si existe en la BD
+        persona_sql = 'NULL::integer'
         if persona_nombre:
-            persona_existente = db.session.execute(text("""
-                SELECT personaid FROM public.persona 
+            persona_sql = """(SELECT personaid FROM public.persona
                 WHERE CONCAT(per_nombres, ' ', per_apellidos) ILIKE :nombre
-                LIMIT 1
-            """), {'nombre': persona_nombre}).fetchone()
-            
-            if persona_existente:
-                personaid = persona_existente.personaid
-        
+                LIMIT 1)"""
+
         # No manejar res_estado aquí - se obtiene dinámicamente de tabla pago
-        
-        result = db.session.execute(text("""
-            UPDATE public.reserva
-            SET horarioid = :horarioid,
-                personaid = :personaid,
-                res_persona_nombre = :res_persona_nombre,
-                res_descripcion = :res_descripcion,
-                updated_at = NOW()
-            WHERE reservaid = :id
-            RETURNING reservaid
-        """), {
-            'id': reservaid,
-            'horarioid': data.get('horarioid'),
-            'personaid': personaid,
-            'res_persona_nombre': persona_nombre if not personaid else None,
-            'res_descripcion': (data.get('res_descripcion') or '').strip()
-        })
-        
-        updated = result.fetchone()
-        db.session.commit()
-        
-        if not updated:
-            return jsonify({'error': 'Reserva no encontrada'}), 404
-        
-        # Obtener la reserva actualizada completa
-        reserva = db.session.execute(text("""
+
+        # Actualización y respuesta en una sola sentencia. `anterior` lee el día del horario
+        # previo antes de la escritura (el calendario invalida el día anterior y el nuevo).
+        # Sólo se mueve a un horario vivo (h_fecha se copia de él): sin fila la reserva no
+        # existe; con reservaid NULL el horario no existe o está borrado.
+        reserva = db.session.execute(text(f"""
+            WITH anterior AS (
+                SELECT h_fecha FROM public.reserva WHERE reservaid = :id
+            ), r AS (
+                UPDATE public.reserva res
+                SET horarioid = hv.horarioid,
+                    h_fecha = hv.h_fecha,
+                    personaid = m.personaid,
+                    res_persona_nombre = CASE WHEN m.personaid IS NULL THEN :res_persona_nombre END,
+                    res_descripcion = :res_descripcion,
+                    updated_at = NOW()
+                FROM (SELECT {persona_sql} AS personaid) m
+                JOIN public.horario hv ON hv.horarioid = :horarioid AND hv.deleted_at IS NULL
+                WHERE res.reservaid = :id
+                RETURNING res.*
+            )
             SELECT
                 r.reservaid,
                 r.horarioid,
@@ -894,16 +1920,33 @@ def update_reserva(reservaid):
                 ) as persona_nombre,
                 -- Estado del pago: si pagoid es NULL → 'pendiente', sino pago_estado
                 COALESCE(pg.pago_estado, 'pendiente') as pago_estado,
-                COALESCE(pg.pago_estado, 'pendiente') as estado_texto
-            FROM public.reserva r
-            LEFT JOIN public.horario h ON r.horarioid = h.horarioid
+                COALESCE(pg.pago_estado, 'pendiente') as estado_texto,
+                anterior.h_fecha as fecha_anterior
+            FROM anterior
+            LEFT JOIN r ON TRUE
+            LEFT JOIN public.horario h ON r.horarioid = h.horarioid AND r.h_fecha = h.h_fecha
             LEFT JOIN public.actoliturgico a ON h.actoliturgicoid = a.actoliturgicoid
-            LEFT JOIN public.parroquia p ON a.parroquiaid = p.parroquiaid
+            LEFT JOIN public.parroquia p ON h.parroquiaid = p.parroquiaid
             LEFT JOIN public.persona per ON r.personaid = per.personaid
             LEFT JOIN public.pago pg ON r.pagoid = pg.pagoid
-            WHERE r.reservaid = :id
-        """), {'id': reservaid}).fetchone()
-        
+        """), {
+            'id': reservaid,
+            'horarioid': data.get('horarioid'),
+            'nombre': persona_nombre,
+            'res_persona_nombre': persona_nombre,
+            'res_descripcion': (data.get('res_descripcion') or '').strip()
+        }).fetchone()
+
+        if not reserva:
+            db.session.rollback()
+            return jsonify({'error': 'Reserva no encontrada'}), 404
+        if reserva.reservaid is None:
+            db.session.rollback()
+            return jsonify({'error': 'Horario no encontrado'}), 404
+
+        db.session.commit()
+        invalidate_calendar_days([reserva.fecha_anterior, reserva.h_fecha])
+
         return jsonify({
             'success': True,
             'item': {
@@ -927,6 +1970,12 @@ def update_reserva(reservaid):
             }
         }), 200
     
+    except IntegrityError as e:
+        db.session.rollback()
+        if is_capacity_error(e):
+            return jsonify({'error': 'No hay cupos disponibles para este horario'}), 409
+        print('Error update_reserva', e)
+        return jsonify({'error': 'Error interno del servidor'}), 500
     except Exception as e:
         print('Error update_reserva', e)
         db.session.rollback()
@@ -940,11 +1989,13 @@ def delete_reserva(reservaid):
         result = db.session.execute(text("""
             DELETE FROM public.reserva
             WHERE reservaid = :id
-            RETURNING reservaid
+            RETURNING reservaid, horarioid, h_fecha
         """), {'id': reservaid})
         
         deleted = result.fetchone()
         db.session.commit()
+        if deleted:
+            invalidate_calendar_days([deleted.h_fecha])
         
         if not deleted:
             return jsonify({'error': 'Reserva no encontrada'}), 404
@@ -963,93 +2014,272 @@ def delete_reserva(reservaid):
 @liturgical_bp.route('/calendario', methods=['GET'])
 @jwt_required()
 def get_calendario():
-    """Obtiene eventos para el calendario (últimos 30 días y próximos 60 días)"""
+    """Obtiene eventos para el calendario entre `from` y `to` (YYYY-MM-DD, inclusive).
+
+    Sin rango: últimos 30 días y próximos 60 días. Se sirve desde el cache por día.
+    """
     try:
-        items = db.session.execute(text("""
-            SELECT
-                h.h_fecha,
-                h.h_hora,
-                a.act_nombre,
-                a.act_titulo,
-                p.par_nombre as parroquia_nombre,
-                COUNT(r.reservaid) as reservas_count,
-                COUNT(CASE WHEN COALESCE(pg.pago_estado, 'pendiente') IN ('pendiente', 'pagado') THEN 1 END) as reservas_activas_count,
-                h.horarioid,
-                a.actoliturgicoid
-            FROM public.horario h
-            LEFT JOIN public.actoliturgico a ON h.actoliturgicoid = a.actoliturgicoid
-            LEFT JOIN public.parroquia p ON a.parroquiaid = p.parroquiaid
-            LEFT JOIN public.reserva r ON h.horarioid = r.horarioid
-            LEFT JOIN public.pago pg ON r.pagoid = pg.pagoid
-            WHERE h.h_fecha >= CURRENT_DATE - INTERVAL '30 days'
-              AND h.h_fecha < CURRENT_DATE + INTERVAL '60 days'
-              AND a.act_estado = TRUE
-            GROUP BY h.h_fecha, h.h_hora, a.act_nombre, a.act_titulo, p.par_nombre, h.horarioid, a.actoliturgicoid
-            ORDER BY h.h_fecha, h.h_hora
-        """)).fetchall()
+        hoy = datetime.now().date()
+        desde = parse_date(request.args['from']) if request.args.get('from') else hoy - timedelta(days=30)
+        hasta = parse_date(request.args['to']) if request.args.get('to') else hoy + timedelta(days=59)
+        if not desde or not hasta:
+            return jsonify({'error': 'Formato de fecha inválido. Use YYYY-MM-DD'}), 400
+        if hasta < desde:
+            return jsonify({'error': 'to debe ser mayor o igual que from'}), 400
+        max_dias = current_app.config.get('CALENDARIO_MAX_DIAS', 400)
+        if (hasta - desde).days + 1 > max_dias:
+            return jsonify({'error': f'El rango no puede superar {max_dias} días'}), 400
+
+        parroquia_id = resolve_parroquia_filter(request.args.get('parroquiaid', type=int))
+        result = get_calendar_events(parroquia_id, desde, hasta)
+
+        return jsonify({'items': result, 'from': desde.isoformat(), 'to': hasta.isoformat()}), 200
+    except Exception as e:
+        print('Error get_calendario', e)
+        return jsonify({'error': 'Error interno del servidor'}), 500
 
-        result = []
-        for row in items:
-            result.append({
-                'date': row.h_fecha.isoformat() if row.h_fecha else None,
-                'time': row.h_hora.strftime('%H:%M') if row.h_hora else None,
-                'type': row.act_nombre,
-                'title': row.act_titulo,
-                'location': row.parroquia_nombre,
-                'reservas_count': row.reservas_count,
-                'reservas_activas_count': row.reservas_activas_count,
-                'horarioid': row.horarioid,
-                'actoliturgicoid': row.actoliturgicoid
-            })
+@liturgical_bp.route('/anio-liturgico/<int:anio>', methods=['GET'])
+@jwt_required()
+def get_anio_liturgico(anio):
+    """Pascua, fiestas (móviles y fijas) y tramos de cada tiempo litúrgico del año civil"""
+    try:
+        if not ANIO_MIN <= anio <= ANIO_MAX:
+            return jsonify({'error': f'anio debe estar entre {ANIO_MIN} y {ANIO_MAX}'}), 400
+        resumen = liturgical_year(anio, current_app.config.get('LITURGIA_TRASLADAR_A_DOMINGO', True))
+        return jsonify({k: v for k, v in resumen.items() if k != 'dias'}), 200
+    except Exception as e:
+        print('Error get_anio_liturgico', e)
+        return jsonify({'error': 'Error interno del servidor'}), 500
 
-        return jsonify({'items': result}), 200
+@liturgical_bp.route('/anio-liturgico/dias', methods=['GET'])
+@jwt_required()
+def get_dias_liturgicos():
+    """Tiempo, semana, color y fiesta de cada día entre `from` y `to` (por defecto el mes actual)"""
+    try:
+        hoy = datetime.now().date()
+        desde = parse_date(request.args['from']) if request.args.get('from') else hoy.replace(day=1)
+        hasta = parse_date(request.args['to']) if request.args.get('to') else desde + timedelta(days=30)
+        if not desde or not hasta:
+            return jsonify({'error': 'Formato de fecha inválido. Use YYYY-MM-DD'}), 400
+        if hasta < desde:
+            return jsonify({'error': 'to debe ser mayor o igual que from'}), 400
+        if desde.year < ANIO_MIN or hasta.year > ANIO_MAX:
+            return jsonify({'error': f'from y to deben estar entre {ANIO_MIN} y {ANIO_MAX}'}), 400
+        max_dias = current_app.config.get('CALENDARIO_MAX_DIAS', 400)
+        if (hasta - desde).days + 1 > max_dias:
+            return jsonify({'error': f'El rango no puede superar {max_dias} días'}), 400
+
+        trasladar = current_app.config.get('LITURGIA_TRASLADAR_A_DOMINGO', True)
+        items = [
+            liturgical_year(d.year, trasladar)['dias'][d]
+            for d in (desde + timedelta(days=i) for i in range((hasta - desde).days + 1))
+        ]
+        return jsonify({'items': items, 'from': desde.isoformat(), 'to': hasta.isoformat()}), 200
     except Exception as e:
-        print('Error get_calendario', e)
+        print('Error get_dias_liturgicos', e)
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+@liturgical_bp.route('/reportes/ocupacion', methods=['GET'])
+@jwt_required()
+def get_reporte_ocupacion():
+    """Reservas por día de la semana × hora de los meses `from` a `to` (YYYY-MM; por defecto
+    los últimos 12), por parroquia y tipo de acto, en matrices densas de 7 × 24.
+
+    `metrica`: reservas (todas) o activas (pago pendiente o pagado).
+    """
+    try:
+        metrica = request.args.get('metrica', 'reservas')
+        if metrica not in ('reservas', 'activas'):
+            return jsonify({'error': 'metrica debe ser reservas o activas'}), 400
+        hoy = datetime.now().date()
+        hasta = parse_date(request.args['to'] + '-01') if request.args.get('to') else month_start(hoy)
+        desde = parse_date(request.args['from'] + '-01') if request.args.get('from') else (
+            month_start(hasta, -11) if hasta else None)
+        if not desde or not hasta:
+            return jsonify({'error': 'Formato de mes inválido. Use YYYY-MM'}), 400
+        if hasta < desde:
+            return jsonify({'error': 'to debe ser mayor o igual que from'}), 400
+        max_meses = current_app.config.get('OCUPACION_MAX_MESES', 24)
+        if (hasta.year - desde.year) * 12 + hasta.month - desde.month + 1 > max_meses:
+            return jsonify({'error': f'El rango no puede superar {max_meses} meses'}), 400
+
+        parroquia_id = resolve_parroquia_filter(request.args.get('parroquiaid', type=int))
+        por_mes = load_occupancy(parroquia_id, desde, hasta)
+        nombres = {p.parroquiaid: p.par_nombre for p in load_parroquias(parroquia_id)}
+        return jsonify({
+            'from': desde.strftime('%Y-%m'),
+            'to': hasta.strftime('%Y-%m'),
+            'metrica': metrica,
+            'dias': DIAS,
+            'horas': HORAS,
+            'series': occupancy_series(por_mes, metrica, nombres, parroquia_id)
+        }), 200
+    except Exception as e:
+        print('Error get_reporte_ocupacion', e)
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+@liturgical_bp.route('/parroquias/<int:parroquia_id>/calendar.ics', methods=['GET'])
+def get_calendario_ics(parroquia_id):
+    """Feed iCalendar de los horarios de la parroquia para suscribirse desde el teléfono.
+
+    Público (los calendarios no envían el token): sólo actos y horarios, nada de reservas.
+    Con If-None-Match igual al ETag responde 304 sin armar el calendario.
+    """
+    try:
+        parroquia = db.session.execute(text("""
+            SELECT parroquiaid, par_nombre, par_direccion FROM public.parroquia WHERE parroquiaid = :id
+        """), {'id': parroquia_id}).fetchone()
+        if not parroquia:
+            return jsonify({'error': 'Parroquia no encontrada'}), 404
+
+        desde, hasta = feed_window(
+            datetime.now().date(),
+            current_app.config.get('ICAL_MESES_ATRAS', 1),
+            current_app.config.get('ICAL_MESES_ADELANTE', 12))
+        huellas = month_fingerprints(parroquia_id, desde, hasta)
+        etag = feed_etag(parroquia, desde, hasta, huellas)
+        headers = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers=headers)
+
+        engine = db.engine
+        zona = current_app.config.get('ICAL_ZONA', 'America/Lima')
+        dominio = current_app.config.get('ICAL_DOMINIO', 'parroquia-system')
+        return Response(
+            iter_calendar(engine, parroquia, huellas, zona, dominio),
+            mimetype='text/calendar',
+            headers=dict(headers, **{'Content-Disposition': f'inline; filename="parroquia-{parroquia_id}.ics"'})
+        )
+    except Exception as e:
+        print('Error get_calendario_ics', e)
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+@liturgical_bp.route('/disponibilidad', methods=['GET'])
+@jwt_required()
+def get_disponibilidad():
+    """Huecos libres entre `from` y `to` (inclusive) de al menos `duracion` minutos.
+
+    Sin `duracion` se usa la del tipo de acto (`act_nombre`) o DISPONIBILIDAD_DURACION.
+    Sin parroquia (usuarios sin restricción) se consultan todas las parroquias.
+    """
+    try:
+        hoy = datetime.now().date()
+        desde = parse_date(request.args['from']) if request.args.get('from') else hoy
+        hasta = parse_date(request.args['to']) if request.args.get('to') else desde + timedelta(days=29)
+        if not desde or not hasta:
+            return jsonify({'error': 'Formato de fecha inválido. Use YYYY-MM-DD'}), 400
+        if hasta < desde:
+            return jsonify({'error': 'to debe ser mayor o igual que from'}), 400
+        max_dias = current_app.config.get('DISPONIBILIDAD_MAX_DIAS', 186)
+        if (hasta - desde).days + 1 > max_dias:
+            return jsonify({'error': f'El rango no puede superar {max_dias} días'}), 400
+
+        act_nombre = (request.args.get('act_nombre') or '').strip().lower()
+        defecto = current_app.config.get('DISPONIBILIDAD_DURACION_ACTO', {}).get(
+            act_nombre, current_app.config.get('DISPONIBILIDAD_DURACION', 60))
+        duracion, error = parse_duracion(request.args.get('duracion'), defecto)
+        if error:
+            return jsonify({'error': error}), 400
+
+        parroquia_id = resolve_parroquia_filter(request.args.get('parroquiaid', type=int))
+        parroquias = load_parroquias(parroquia_id)
+        if parroquia_id and not parroquias:
+            return jsonify({'error': 'Parroquia no encontrada'}), 404
+
+        jornada = parse_jornada(current_app.config.get('DISPONIBILIDAD_JORNADA', []))
+        items = find_availability(parroquias, desde, hasta, duracion, jornada)
+
+        return jsonify({
+            'items': items,
+            'from': desde.isoformat(),
+            'to': hasta.isoformat(),
+            'duracion': duracion
+        }), 200
+    except Exception as e:
+        print('Error get_disponibilidad', e)
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+@liturgical_bp.route('/search', methods=['GET'])
+@jwt_required()
+def search_liturgical():
+    """Búsqueda de texto en actos, reservas y personas, ordenada por relevancia.
+
+    `q` admite palabras (todas deben aparecer, sin importar tildes), "frase" y -excluir;
+    ej. `matrimonio perez marzo`. Filtros: tipos (acto,reserva,persona), parroquiaid,
+    desde/hasta (fecha del horario, sólo reservas). Paginación con page/per_page.
+    """
+    try:
+        consulta = (request.args.get('q') or '').strip()
+        if len(consulta) < 2:
+            return jsonify({'error': 'q debe tener al menos 2 caracteres'}), 400
+
+        tipos = [t.strip() for t in (request.args.get('tipos') or '').split(',') if t.strip()]
+        tipos = tipos or list(BUSQUEDA_TIPOS)
+        invalidos = [t for t in tipos if t not in BUSQUEDA_TIPOS]
+        if invalidos:
+            return jsonify({'error': f"Tipos inválidos: {', '.join(invalidos)}"}), 400
+
+        desde = parse_date(request.args['desde']) if request.args.get('desde') else None
+        hasta = parse_date(request.args['hasta']) if request.args.get('hasta') else None
+        if (request.args.get('desde') and not desde) or (request.args.get('hasta') and not hasta):
+            return jsonify({'error': 'Formato de fecha inválido. Use YYYY-MM-DD'}), 400
+
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+        parroquia_id = resolve_parroquia_filter(request.args.get('parroquiaid', type=int))
+
+        rows = search(consulta, tipos=tipos, parroquiaid=parroquia_id, desde=desde, hasta=hasta,
+                      limit=per_page, offset=(page - 1) * per_page)
+
+        items = []
+        for r in rows[:per_page]:
+            items.append({
+                'tipo': r.tipo,
+                'id': r.id,
+                'titulo': r.titulo,
+                'detalle': r.detalle,
+                'parroquiaid': r.parroquiaid,
+                'fecha': r.fecha.isoformat() if r.fecha else None,
+                'hora': r.hora.strftime('%H:%M') if r.hora else None,
+                'relevancia': round(float(r.rango), 4),
+                'fragmento': r.fragmento
+            })
+        return jsonify({
+            'items': items,
+            'page': page,
+            'per_page': per_page,
+            'has_more': len(rows) > per_page
+        }), 200
+    except Exception as e:
+        print('Error search_liturgical', e)
         return jsonify({'error': 'Error interno del servidor'}), 500
 
 @liturgical_bp.route('/horarios/fecha/<date_str>', methods=['GET'])
 @jwt_required()
 def get_horarios_by_date(date_str):
-    """Obtiene horarios para una fecha específica"""
+    """Agenda del día: horarios con asistentes y resumen de pagos por parroquia.
+
+    Se lee de agenda_dia (precalculada, app/utils/agenda.py): con parroquia es una
+    lectura por clave primaria.
+    """
     try:
         fecha = parse_date(date_str)
         if not fecha:
             return jsonify({'error': 'Fecha inválida'}), 400
 
-        items = db.session.execute(text("""
-            SELECT
-                h.horarioid,
-                h.h_fecha,
-                h.h_hora,
-                a.act_nombre,
-                a.act_titulo,
-                p.par_nombre as parroquia_nombre,
-                COUNT(r.reservaid) as reservas_total,
-                COUNT(CASE WHEN COALESCE(pg.pago_estado, 'pendiente') IN ('pendiente', 'pagado') THEN 1 END) as reservas_activas
-            FROM public.horario h
-            LEFT JOIN public.actoliturgico a ON h.actoliturgicoid = a.actoliturgicoid
-            LEFT JOIN public.parroquia p ON a.parroquiaid = p.parroquiaid
-            LEFT JOIN public.reserva r ON h.horarioid = r.horarioid
-            LEFT JOIN public.pago pg ON r.pagoid = pg.pagoid
-            WHERE h.h_fecha = :fecha
-            GROUP BY h.horarioid, h.actoliturgicoid, a.act_nombre, a.act_titulo, p.par_nombre
-            ORDER BY h.h_hora
-        """), {'fecha': fecha}).fetchall()
+        parroquia_id = resolve_parroquia_filter(request.args.get('parroquiaid', type=int))
+        agendas = get_day_agenda(fecha, parroquia_id)
 
         result = []
-        for row in items:
-            result.append({
-                'horarioid': row.horarioid,
-                'h_fecha': row.h_fecha.isoformat() if row.h_fecha else None,
-                'h_hora': row.h_hora.strftime('%H:%M') if row.h_hora else None,
-                'act_nombre': row.act_nombre,
-                'act_titulo': row.act_titulo,
-                'parroquia_nombre': row.parroquia_nombre,
-                'reservas_total': row.reservas_total,
-                'reservas_activas': row.reservas_activas
-            })
-
-        return jsonify({'items': result}), 200
+        resumenes = []
+        for agenda in agendas:
+            nombre = agenda.resumen.get('parroquia_nombre')
+            for horario in agenda.horarios:
+                result.append(dict(horario, parroquia_nombre=nombre))
+            resumenes.append(dict(agenda.resumen, parroquiaid=agenda.parroquiaid))
+        result.sort(key=lambda h: (h['h_hora'], h['horarioid']))
+
+        return jsonify({'items': result, 'resumen': resumenes}), 200
     except Exception as e:
         print('Error get_horarios_by_date', e)
         return jsonify({'error': 'Error interno del servidor'}), 500
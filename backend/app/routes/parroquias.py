@@ -1,7 +1,11 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
 from app import db
-from app.models import Parroquia
+from datetime import datetime
+from app.models import Parroquia, ParroquiaJornada
+from app.utils.geocoding import geocode_address, NullProvider
+from app.utils.spatial import nearest_parroquias, invalidate_parroquias_index
+from app.utils.calendar_cache import invalidate_calendar
 
 parroquias_bp = Blueprint('parroquias', __name__)
 
@@ -11,6 +15,35 @@ def list_parroquias():
     rows = Parroquia.query.all()
     return jsonify({'parroquias': [r.to_dict() for r in rows]})
 
+@parroquias_bp.get('/near')
+@jwt_required()
+def near_parroquias():
+    """Parroquias más cercanas a un punto (lat/lon) o a una dirección, desde el índice en memoria"""
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    k = request.args.get('k', 5, type=int)
+    direccion = (request.args.get('direccion') or '').strip()
+
+    if (lat is None or lon is None) and direccion:
+        # Dirección libre: sólo se busca en geocode_cache (NullProvider), sin consultar al
+        # proveedor dentro del request
+        try:
+            coords = geocode_address(direccion, NullProvider())
+        except Exception as e:
+            print('Error near_parroquias (geocoding)', e)
+            coords = None
+        if not coords:
+            return jsonify({'error': 'Dirección no encontrada en el cache de geocodificación; envíe lat y lon'}), 404
+        lat, lon = coords
+
+    if lat is None or lon is None:
+        return jsonify({'error': 'lat y lon (o direccion) son requeridos'}), 400
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return jsonify({'error': 'Coordenadas inválidas'}), 400
+    k = max(1, min(k, 50))
+
+    return jsonify({'lat': lat, 'lon': lon, 'parroquias': nearest_parroquias(lat, lon, k)})
+
 @parroquias_bp.post('')
 @jwt_required()
 def create_parroquia():
@@ -20,10 +53,14 @@ def create_parroquia():
         par_direccion=data.get('par_direccion','').strip(),
         distritoid=data.get('distritoid'),
         par_telefono1=data.get('par_telefono1','').strip(),
-        par_telefono2=data.get('par_telefono2')
+        par_telefono2=data.get('par_telefono2'),
+        par_latitud=data.get('par_latitud'),
+        par_longitud=data.get('par_longitud')
     )
+    # Sin coordenadas queda pendiente para scripts/geocode_parroquias.py (fuera del request)
     db.session.add(p)
     db.session.commit()
+    invalidate_parroquias_index()
     return jsonify({'parroquia': p.to_dict()}), 201
 
 @parroquias_bp.put('/<int:parroquiaid>')
@@ -33,10 +70,19 @@ def update_parroquia(parroquiaid):
     if not p:
         return jsonify({'error':'No encontrado'}), 404
     data = request.get_json() or {}
+    direccion_anterior = (p.par_direccion, p.distritoid)
     for k in ['par_nombre','par_direccion','par_telefono1','par_telefono2']:
         if k in data: setattr(p, k, data[k])
     if 'distritoid' in data: p.distritoid = data['distritoid']
+    if (p.par_direccion, p.distritoid) != direccion_anterior:
+        # La dirección cambió: las coordenadas anteriores ya no son válidas y la parroquia
+        # queda pendiente para scripts/geocode_parroquias.py
+        p.par_latitud = p.par_longitud = None
+    for k in ['par_latitud','par_longitud']:
+        if k in data: setattr(p, k, data[k])
     db.session.commit()
+    invalidate_parroquias_index()
+    invalidate_calendar()  # el nombre de la parroquia aparece en los eventos
     return jsonify({'parroquia': p.to_dict()})
 
 @parroquias_bp.delete('/<int:parroquiaid>')
@@ -47,4 +93,37 @@ def delete_parroquia(parroquiaid):
         return jsonify({'error':'No encontrado'}), 404
     db.session.delete(p)
     db.session.commit()
+    invalidate_parroquias_index()
+    invalidate_calendar()
     return jsonify({'success': True})
+
+@parroquias_bp.get('/<int:parroquiaid>/jornada')
+@jwt_required()
+def get_jornada(parroquiaid):
+    """Jornada de atención usada por /api/liturgical/disponibilidad (vacía = jornada por defecto)"""
+    rows = ParroquiaJornada.query.filter_by(parroquiaid=parroquiaid) \
+        .order_by(ParroquiaJornada.dia_semana, ParroquiaJornada.hora_inicio).all()
+    return jsonify({'jornada': [r.to_dict() for r in rows]})
+
+@parroquias_bp.put('/<int:parroquiaid>/jornada')
+@jwt_required()
+def update_jornada(parroquiaid):
+    """Reemplaza la jornada: {"jornada": [{"dia_semana": 0, "hora_inicio": "08:00", "hora_fin": "13:00"}, ...]}"""
+    if not Parroquia.query.get(parroquiaid):
+        return jsonify({'error':'No encontrado'}), 404
+    data = request.get_json() or {}
+    filas = []
+    for v in data.get('jornada') or []:
+        try:
+            dia = int(v.get('dia_semana'))
+            ini = datetime.strptime(v.get('hora_inicio'), '%H:%M').time()
+            fin = datetime.strptime(v.get('hora_fin'), '%H:%M').time()
+        except (TypeError, ValueError, AttributeError):
+            return jsonify({'error':'Cada ventana requiere dia_semana (0-6), hora_inicio y hora_fin (HH:MM)'}), 400
+        if not 0 <= dia <= 6 or fin <= ini:
+            return jsonify({'error':'dia_semana debe estar entre 0 y 6 y hora_fin ser mayor que hora_inicio'}), 400
+        filas.append(ParroquiaJornada(parroquiaid=parroquiaid, dia_semana=dia, hora_inicio=ini, hora_fin=fin))
+    ParroquiaJornada.query.filter_by(parroquiaid=parroquiaid).delete()
+    db.session.add_all(filas)
+    db.session.commit()
+    return jsonify({'jornada': [r.to_dict() for r in filas]})
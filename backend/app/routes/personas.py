@@ -1,14 +1,24 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
 from app import db
-from app.models import Persona
+from sqlalchemy import text
+from app.models import Persona, PersonaMergeCandidato
+from app.utils.persona_import import import_personas_csv
+from app.utils.persona_dedupe import apply_merges
+from app.utils.scope import resolve_parroquia_filter, invalidate_parish_scope
+from datetime import datetime
+import io
 
 personas_bp = Blueprint('personas', __name__)
 
 @personas_bp.get('')
 @jwt_required()
 def list_personas():
-    rows = Persona.query.all()
+    q = Persona.query
+    parroquiaid = resolve_parroquia_filter(request.args.get('parroquiaid', type=int))
+    if parroquiaid:
+        q = q.filter(Persona.parroquiaid == parroquiaid)  # idx_persona_parroquia
+    rows = q.all()
     return jsonify({'personas': [r.to_dict() for r in rows]})
 
 @personas_bp.post('')
@@ -28,6 +38,122 @@ def create_persona():
     db.session.commit()
     return jsonify({'persona': p.to_dict()}), 201
 
+@personas_bp.post('/import')
+@jwt_required()
+def import_personas():
+    """Importación masiva de personas desde CSV (multipart 'archivo' o cuerpo text/csv).
+
+    Columnas: per_nombres, per_apellidos, fecha_nacimiento, parroquiaid, per_domicilio, per_telefono.
+    `parroquiaid` puede enviarse como parámetro para todo el archivo.
+    """
+    parroquiaid = request.args.get('parroquiaid', type=int) or request.form.get('parroquiaid', type=int)
+    archivo = request.files.get('archivo')
+    if archivo:
+        stream = io.TextIOWrapper(archivo.stream, encoding='utf-8-sig', newline='')
+    elif request.mimetype == 'text/csv':
+        stream = io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline='')
+    else:
+        return jsonify({'error': 'Debe enviar un archivo CSV'}), 400
+
+    try:
+        result = import_personas_csv(stream, parroquiaid_defecto=parroquiaid)
+        db.session.commit()
+        return jsonify(result), 200
+    except UnicodeDecodeError:
+        db.session.rollback()
+        return jsonify({'error': 'El archivo debe estar codificado en UTF-8'}), 400
+    except Exception as e:
+        print('Error import_personas', e)
+        db.session.rollback()
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+# =========================================================
+# DUPLICADOS (candidatos generados por scripts/dedupe_personas.py)
+# =========================================================
+
+@personas_bp.get('/duplicados')
+@jwt_required()
+def list_duplicados():
+    """Lista pares candidatos a fusión con los datos de ambas personas"""
+    estado = request.args.get('estado', 'pendiente')
+    parroquiaid = resolve_parroquia_filter(request.args.get('parroquiaid', type=int))
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 50, type=int), 1), 200)
+
+    params = {'estado': estado, 'limit': per_page, 'offset': (page - 1) * per_page}
+    where = 'c.estado = :estado'
+    if parroquiaid:
+        where += ' AND c.parroquiaid = :parroquiaid'
+        params['parroquiaid'] = parroquiaid
+
+    rows = db.session.execute(text(f"""
+        SELECT
+            c.candidatoid, c.personaid_a, c.personaid_b, c.parroquiaid, c.puntaje,
+            c.clave_bloque, c.estado, c.created_at,
+            a.per_nombres AS a_nombres, a.per_apellidos AS a_apellidos, a.fecha_nacimiento AS a_fecha,
+            b.per_nombres AS b_nombres, b.per_apellidos AS b_apellidos, b.fecha_nacimiento AS b_fecha
+        FROM public.persona_merge_candidato c
+        LEFT JOIN public.persona a ON a.personaid = c.personaid_a
+        LEFT JOIN public.persona b ON b.personaid = c.personaid_b
+        WHERE {where}
+        ORDER BY c.puntaje DESC, c.candidatoid
+        LIMIT :limit OFFSET :offset
+    """), params).fetchall()
+
+    items = []
+    for r in rows:
+        items.append({
+            'candidatoid': r.candidatoid,
+            'parroquiaid': r.parroquiaid,
+            'puntaje': float(r.puntaje),
+            'clave_bloque': r.clave_bloque,
+            'estado': r.estado,
+            'created_at': r.created_at.isoformat() if r.created_at else None,
+            'persona_a': {
+                'personaid': r.personaid_a,
+                'per_nombres': r.a_nombres,
+                'per_apellidos': r.a_apellidos,
+                'fecha_nacimiento': r.a_fecha.isoformat() if r.a_fecha else None
+            },
+            'persona_b': {
+                'personaid': r.personaid_b,
+                'per_nombres': r.b_nombres,
+                'per_apellidos': r.b_apellidos,
+                'fecha_nacimiento': r.b_fecha.isoformat() if r.b_fecha else None
+            }
+        })
+    return jsonify({'items': items, 'page': page, 'per_page': per_page})
+
+@personas_bp.post('/duplicados/aplicar')
+@jwt_required()
+def aplicar_duplicados():
+    """Fusiona los candidatos indicados: {'candidatoids': [..]}"""
+    data = request.get_json() or {}
+    ids = [int(i) for i in (data.get('candidatoids') or []) if str(i).isdigit()]
+    if not ids:
+        return jsonify({'error': 'candidatoids es requerido'}), 400
+    try:
+        result = apply_merges(ids)
+        db.session.commit()
+        return jsonify(result), 200
+    except Exception as e:
+        print('Error aplicar_duplicados', e)
+        db.session.rollback()
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+@personas_bp.post('/duplicados/<int:candidatoid>/descartar')
+@jwt_required()
+def descartar_duplicado(candidatoid):
+    c = PersonaMergeCandidato.query.get(candidatoid)
+    if not c:
+        return jsonify({'error':'No encontrado'}), 404
+    if c.estado != 'pendiente':
+        return jsonify({'error': f'El candidato ya está {c.estado}'}), 409
+    c.estado = 'descartado'
+    c.resuelto_at = datetime.utcnow()
+    db.session.commit()
+    return jsonify({'candidato': c.to_dict()})
+
 @personas_bp.put('/<int:personaid>')
 @jwt_required()
 def update_persona(personaid):
@@ -40,6 +166,7 @@ def update_persona(personaid):
     if 'fecha_nacimiento' in data: p.fecha_nacimiento = data['fecha_nacimiento']
     if 'parroquiaid' in data: p.parroquiaid = data['parroquiaid']
     db.session.commit()
+    if p.userid: invalidate_parish_scope(p.userid)
     return jsonify({'persona': p.to_dict()})
 
 @personas_bp.delete('/<int:personaid>')
@@ -48,6 +175,8 @@ def delete_persona(personaid):
     p = Persona.query.get(personaid)
     if not p:
         return jsonify({'error':'No encontrado'}), 404
+    userid = p.userid
     db.session.delete(p)
     db.session.commit()
+    if userid: invalidate_parish_scope(userid)
     return jsonify({'success': True})
@@ -3,6 +3,7 @@ from flask_jwt_extended import jwt_required
 from app import db
 from app.models import Role, User
 from app.constants import PERMISOS
+from app.utils.scope import invalidate_role_scope
 
 roles_bp = Blueprint('roles', __name__)
 
@@ -123,6 +124,8 @@ def update_role(role_id):
             role.is_active = (data.get('status') == 'Activo')
 
         db.session.commit()
+        # Permisos o estado pueden cambiar el alcance por parroquia de sus usuarios
+        invalidate_role_scope({role.name})
         return jsonify({'message': 'Rol actualizado', 'role': role.to_dict()}), 200
     except Exception as e:
         print(f"Error actualizando rol: {e}")
@@ -137,8 +140,10 @@ def delete_role(role_id):
         if not role:
             return jsonify({'error': 'Rol no encontrado'}), 404
 
+        nombre = role.name
         db.session.delete(role)
         db.session.commit()
+        invalidate_role_scope({nombre})
         return jsonify({'message': 'Rol eliminado'}), 200
     except Exception as e:
         print(f"Error eliminando rol: {e}")
@@ -160,6 +165,7 @@ def update_role_status(role_id):
 
         role.is_active = (status == 'Activo')
         db.session.commit()
+        invalidate_role_scope({role.name})
         return jsonify({'message': 'Estado actualizado', 'role': role.to_dict()}), 200
     except Exception as e:
         print(f"Error actualizando estado de rol: {e}")
@@ -8,6 +8,7 @@ from app.models import User, Role, UserPreferences, Persona
 from datetime import datetime
 from app.constants import PERMISOS
 from app.utils.security import is_valid_email, is_strong_password
+from app.utils.scope import invalidate_parish_scope
 
 users_bp = Blueprint('users', __name__)
 
@@ -248,6 +249,7 @@ def update_user(user_id):
             user.set_password(data['password'])
         
         db.session.commit()
+        invalidate_parish_scope(user.id)  # rol o parroquia pudieron cambiar
         
         print(f"✅ Usuario actualizado: {user.email}")
         persona_row = Persona.query.filter_by(userid=user.id).first()
@@ -0,0 +1,54 @@
+"""Agenda del día precalculada por (fecha, parroquia) en la tabla agenda_dia.
+
+Cada fila guarda los horarios del día ya armados (acto, cupos, asistentes con el estado
+de su pago) y un resumen de pagos, así abrir la agenda es una lectura por clave primaria.
+El job scripts/warm_agenda.py la calcula cada noche para los próximos AGENDA_DIAS_ADELANTE
+días; los triggers de horario, reserva, pago, persona, acto y parroquia borran los días
+que cambian y la siguiente lectura los recalcula (agenda_refrescar en database_full.sql).
+"""
+from sqlalchemy import text
+from app import db
+
+
+def _leer(fecha, parroquiaid):
+    params = {'fecha': fecha}
+    parroquia_sql = ''
+    if parroquiaid:
+        parroquia_sql = 'AND parroquiaid = :parroquiaid'
+        params['parroquiaid'] = parroquiaid
+    return db.session.execute(text(f"""
+        SELECT parroquiaid, horarios, resumen, calculado_at
+        FROM public.agenda_dia
+        WHERE fecha = :fecha {parroquia_sql}
+        ORDER BY parroquiaid
+    """), params).fetchall()
+
+
+def refresh_agenda(desde, hasta, parroquiaid=None, solo_faltantes=False):
+    """Recalcula y guarda la agenda del rango (todas las parroquias o una); devuelve las filas escritas"""
+    return db.session.execute(
+        text('SELECT agenda_refrescar(:desde, :hasta, :parroquiaid, :solo_faltantes)'),
+        {'desde': desde, 'hasta': hasta, 'parroquiaid': parroquiaid, 'solo_faltantes': solo_faltantes}
+    ).scalar()
+
+
+def get_day_agenda(fecha, parroquiaid=None):
+    """[(parroquiaid, horarios, resumen, calculado_at)] del día, calculando lo que falte.
+
+    Con parroquia (el caso habitual) es una lectura por PK y sólo si la fila no está se
+    calcula. Sin parroquia primero se completan las que falten (invalidadas por escrituras).
+    """
+    if parroquiaid:
+        filas = _leer(fecha, parroquiaid)
+        if filas:
+            return filas
+    if refresh_agenda(fecha, fecha, parroquiaid, solo_faltantes=True):
+        db.session.commit()
+    return _leer(fecha, parroquiaid)
+
+
+def prune_agenda(antes_de):
+    """Borra la agenda de los días anteriores a `antes_de` (se recalcula si se vuelve a pedir)"""
+    return db.session.execute(
+        text('DELETE FROM public.agenda_dia WHERE fecha < :antes'), {'antes': antes_de}
+    ).rowcount
@@ -0,0 +1,166 @@
+"""Archivo de años cerrados: horarios y reservas anteriores a la ventana de retención.
+
+Las tablas vivas conservan el año en curso y los ARCHIVO_RETENCION_ANIOS anteriores. Lo más
+viejo se mueve por lotes a archivo_bloque: una fila por tipo ('horario' / 'reserva'),
+parroquia y mes, con las filas en un array JSONB que TOAST guarda comprimido (lz4 si el
+servidor lo soporta). Cada fila archivada es una foto desnormalizada (acto, parroquia,
+persona y estado del pago al momento de archivar): no depende de que el acto o el pago
+sigan existiendo.
+
+Lectura: GET /reservas y /reservas/export con historico=1 suman las reservas archivadas
+(archived_reservas_sql); los bloques se descartan por parroquia y rango de fechas antes
+de expandir el JSONB. Para SQL directo está la vista reserva_archivada.
+"""
+import time
+from datetime import date
+
+from sqlalchemy import text
+from app import db
+
+# Columnas de una reserva archivada, con su tipo para jsonb_to_recordset
+RESERVA_ARCHIVADA = [
+    ('reservaid', 'INTEGER'),
+    ('horarioid', 'INTEGER'),
+    ('h_fecha', 'DATE'),
+    ('h_hora', 'TIME'),
+    ('actoliturgicoid', 'INTEGER'),
+    ('act_nombre', 'VARCHAR'),
+    ('act_titulo', 'VARCHAR'),
+    ('parroquiaid', 'INTEGER'),
+    ('parroquia_nombre', 'VARCHAR'),
+    ('personaid', 'INTEGER'),
+    ('persona_nombre', 'TEXT'),
+    ('res_persona_nombre', 'VARCHAR'),
+    ('res_descripcion', 'TEXT'),
+    ('pagoid', 'INTEGER'),
+    ('pago_estado', 'VARCHAR'),
+    ('pago_monto', 'NUMERIC'),
+    ('pago_medio', 'VARCHAR'),
+    ('created_at', 'TIMESTAMP'),
+    ('updated_at', 'TIMESTAMP'),
+]
+RESERVA_ARCHIVADA_COLUMNAS = [c for c, _ in RESERVA_ARCHIVADA]
+
+# Alias que usan las consultas de reservas y no existen tal cual en el archivo
+_ALIAS = {'estado_texto': 'x.pago_estado'}
+
+_ARCHIVAR_LOTE = """
+    WITH lote AS (
+        SELECT horarioid, h_fecha
+        FROM public.horario
+        WHERE h_fecha < :corte AND deleted_at IS NULL
+        ORDER BY h_fecha, horarioid
+        LIMIT :lote
+        FOR UPDATE
+    ), hs AS (
+        SELECT h.horarioid, h.h_fecha, h.h_hora, h.h_duracion, h.h_capacidad,
+               h.reservas_total, h.reservas_activas, h.actoliturgicoid, a.act_nombre, a.act_titulo,
+               h.parroquiaid, p.par_nombre AS parroquia_nombre, h.created_at, h.updated_at
+        FROM lote l
+        JOIN public.horario h ON h.horarioid = l.horarioid AND h.h_fecha = l.h_fecha
+        LEFT JOIN public.actoliturgico a ON a.actoliturgicoid = h.actoliturgicoid
+        LEFT JOIN public.parroquia p ON p.parroquiaid = h.parroquiaid
+    ), rs AS (
+        SELECT r.reservaid, r.horarioid, hs.h_fecha, hs.h_hora, hs.actoliturgicoid, hs.act_nombre,
+               hs.act_titulo, hs.parroquiaid, hs.parroquia_nombre, r.personaid,
+               COALESCE(per.per_nombres || ' ' || per.per_apellidos, r.res_persona_nombre) AS persona_nombre,
+               r.res_persona_nombre, r.res_descripcion, r.pagoid,
+               COALESCE(pg.pago_estado, 'pendiente') AS pago_estado, pg.pago_monto, pg.pago_medio,
+               r.created_at, r.updated_at
+        FROM hs
+        JOIN public.reserva r ON r.horarioid = hs.horarioid AND r.h_fecha = hs.h_fecha
+        LEFT JOIN public.persona per ON per.personaid = r.personaid
+        LEFT JOIN public.pago pg ON pg.pagoid = r.pagoid
+    ), bloques AS (
+        INSERT INTO public.archivo_bloque (tipo, parroquiaid, desde, hasta, filas, datos)
+        SELECT 'horario', parroquiaid, MIN(h_fecha), MAX(h_fecha), COUNT(*),
+               jsonb_agg(to_jsonb(hs) ORDER BY h_fecha, horarioid)
+        FROM hs
+        GROUP BY parroquiaid, date_trunc('month', h_fecha)
+        UNION ALL
+        SELECT 'reserva', parroquiaid, MIN(h_fecha), MAX(h_fecha), COUNT(*),
+               jsonb_agg(to_jsonb(rs) ORDER BY h_fecha, reservaid)
+        FROM rs
+        GROUP BY parroquiaid, date_trunc('month', h_fecha)
+        RETURNING tipo, filas
+    ), borrados AS (
+        -- Las reservas se borran por el ON DELETE CASCADE de la FK
+        DELETE FROM public.horario h
+        USING lote l
+        WHERE h.horarioid = l.horarioid AND h.h_fecha = l.h_fecha
+        RETURNING h.horarioid
+    )
+    SELECT
+        (SELECT COUNT(*) FROM borrados) AS horarios,
+        (SELECT COALESCE(SUM(filas), 0) FROM bloques WHERE tipo = 'reserva') AS reservas,
+        (SELECT COUNT(*) FROM bloques) AS bloques
+"""
+
+
+def retention_cutoff(anios, hoy=None):
+    """Primer día que se conserva en las tablas vivas: 1 de enero de hace `anios` años"""
+    hoy = hoy or date.today()
+    return date(hoy.year - anios, 1, 1)
+
+
+def archive_closed_years(corte, lote=1000, pausa=0.0):
+    """Mueve al archivo los horarios (y sus reservas) anteriores a `corte`, de a `lote` horarios.
+
+    Un commit por lote: cada transacción bloquea sólo los horarios del lote. Los horarios
+    con borrado lógico se dejan al purgador. Devuelve {'horarios', 'reservas', 'bloques'}.
+    """
+    total = {'horarios': 0, 'reservas': 0, 'bloques': 0}
+    while True:
+        fila = db.session.execute(text(_ARCHIVAR_LOTE), {'corte': corte, 'lote': lote}).fetchone()
+        db.session.commit()
+        for clave in total:
+            total[clave] += getattr(fila, clave)
+        if fila.horarios < lote:
+            return total
+        time.sleep(pausa)
+
+
+def archived_reservas_where(params):
+    """Filtros de build_reservas_filters (ya resueltos en params) sobre el archivo.
+
+    b.* descarta bloques enteros (parroquia, rango de fechas) antes de expandirlos.
+    """
+    where = ["b.tipo = 'reserva'"]
+    if 'parroquiaid' in params:
+        where.append('b.parroquiaid = :parroquiaid')
+    if 'desde' in params:
+        where += ['b.hasta >= :desde', 'x.h_fecha >= :desde']
+    if 'hasta' in params:
+        where += ['b.desde <= :hasta', 'x.h_fecha <= :hasta']
+    if 'act_nombre' in params:
+        where.append('x.act_nombre = :act_nombre')
+    if 'pago_estado' in params:
+        where.append('x.pago_estado = :pago_estado')
+    if 'personaid' in params:
+        where.append('x.personaid = :personaid')
+    if 'cursor_created_at' in params:
+        where.append('(x.created_at, x.reservaid) < (:cursor_created_at, :cursor_id)')
+    return where
+
+
+def archived_reservas_sql(columnas, params):
+    """SELECT de reservas archivadas con las `columnas` dadas (mismo orden, para UNION ALL)"""
+    select = ', '.join(f'{_ALIAS[c]} AS {c}' if c in _ALIAS else f'x.{c}' for c in columnas)
+    registro = ', '.join(f'{c} {tipo}' for c, tipo in RESERVA_ARCHIVADA)
+    return f"""
+        SELECT {select}
+        FROM public.archivo_bloque b
+        CROSS JOIN LATERAL jsonb_to_recordset(b.datos) AS x({registro})
+        WHERE {' AND '.join(archived_reservas_where(params))}
+    """
+
+
+def archive_summary():
+    """[(tipo, anio, bloques, filas, bytes)] del archivo, por año"""
+    return db.session.execute(text("""
+        SELECT tipo, EXTRACT(YEAR FROM desde)::INTEGER AS anio, COUNT(*) AS bloques,
+               SUM(filas) AS filas, SUM(pg_column_size(datos)) AS bytes
+        FROM public.archivo_bloque
+        GROUP BY tipo, anio
+        ORDER BY anio, tipo
+    """)).fetchall()
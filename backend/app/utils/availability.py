@@ -0,0 +1,137 @@
+"""Huecos libres en la agenda de las parroquias (disponibilidad para matrimonios, bautizos...).
+
+Cada horario ocupa h_rango = [h_fecha + h_hora, + h_duracion minutos), columna generada
+con índice GiST (parroquiaid, h_rango): los ocupados de un rango se leen con un único
+index scan usando el operador &&, sin recorrer la agenda día por día. El filtro redundante
+por h_fecha (un día antes: un acto nocturno puede cruzar la medianoche) poda las particiones.
+
+Los huecos se calculan en memoria: por parroquia los intervalos ocupados se ordenan y
+fusionan, y a cada ventana de la jornada (parroquia_jornada o DISPONIBILIDAD_JORNADA)
+se le restan los que la cruzan, ubicados con búsqueda binaria.
+"""
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+from app import db
+
+
+def parse_jornada(ventanas):
+    """[('08:00', '13:00'), ...] -> [(time, time), ...]"""
+    return [
+        (datetime.strptime(ini, '%H:%M').time(), datetime.strptime(fin, '%H:%M').time())
+        for ini, fin in ventanas
+    ]
+
+
+def load_parroquias(parroquiaid=None):
+    """[(parroquiaid, par_nombre)] de una parroquia o de todas"""
+    params = {}
+    where = ''
+    if parroquiaid:
+        where = 'WHERE parroquiaid = :parroquiaid'
+        params['parroquiaid'] = parroquiaid
+    return db.session.execute(text(f"""
+        SELECT parroquiaid, par_nombre FROM public.parroquia {where} ORDER BY parroquiaid
+    """), params).fetchall()
+
+
+def load_jornadas(parroquia_ids):
+    """{parroquiaid: {dia_semana: [(hora_inicio, hora_fin)]}} de las parroquias configuradas"""
+    rows = db.session.execute(text("""
+        SELECT parroquiaid, dia_semana, hora_inicio, hora_fin
+        FROM public.parroquia_jornada
+        WHERE parroquiaid = ANY(:ids)
+        ORDER BY parroquiaid, dia_semana, hora_inicio
+    """), {'ids': list(parroquia_ids)})
+    jornadas = defaultdict(lambda: defaultdict(list))
+    for r in rows:
+        jornadas[r.parroquiaid][r.dia_semana].append((r.hora_inicio, r.hora_fin))
+    return jornadas
+
+
+def merge_intervals(intervalos):
+    """Fusiona intervalos (inicio, fin) ordenados por inicio que se tocan o se solapan"""
+    fusionados = []
+    for ini, fin in intervalos:
+        if fusionados and ini <= fusionados[-1][1]:
+            if fin > fusionados[-1][1]:
+                fusionados[-1] = (fusionados[-1][0], fin)
+        else:
+            fusionados.append((ini, fin))
+    return fusionados
+
+
+def load_ocupados(parroquia_ids, inicio, fin):
+    """{parroquiaid: [(inicio, fin)] fusionados} de horarios de actos activos que cruzan [inicio, fin)"""
+    rows = db.session.execute(text("""
+        SELECT h.parroquiaid, lower(h.h_rango) AS inicio, upper(h.h_rango) AS fin
+        FROM public.horario h
+        JOIN public.actoliturgico a ON a.actoliturgicoid = h.actoliturgicoid
+        WHERE h.parroquiaid = ANY(:ids)
+          AND h.h_rango && tsrange(:inicio, :fin)
+          AND h.h_fecha BETWEEN CAST(:inicio AS DATE) - 1 AND CAST(:fin AS DATE)
+          AND h.deleted_at IS NULL
+          AND a.act_estado = TRUE
+        ORDER BY h.parroquiaid, lower(h.h_rango)
+    """), {'ids': list(parroquia_ids), 'inicio': inicio, 'fin': fin})
+    por_parroquia = defaultdict(list)
+    for r in rows:
+        por_parroquia[r.parroquiaid].append((r.inicio, r.fin))
+    return {pid: merge_intervals(intervalos) for pid, intervalos in por_parroquia.items()}
+
+
+def free_slots(ventanas, ocupados, finales, duracion):
+    """Huecos de al menos `duracion` dentro de las ventanas.
+
+    `ocupados` está fusionado (inicios y fines crecientes) y `finales` son sus fines,
+    así el primer ocupado que cruza cada ventana se ubica con bisect.
+    """
+    for v_ini, v_fin in ventanas:
+        i = bisect_right(finales, v_ini)
+        cursor = v_ini
+        while i < len(ocupados) and ocupados[i][0] < v_fin:
+            o_ini, o_fin = ocupados[i]
+            if o_ini - cursor >= duracion:
+                yield cursor, o_ini
+            cursor = max(cursor, o_fin)
+            i += 1
+        if v_fin - cursor >= duracion:
+            yield cursor, v_fin
+
+
+def find_availability(parroquias, desde, hasta, duracion_min, jornada_defecto):
+    """Huecos libres de las parroquias entre desde y hasta (inclusive).
+
+    `parroquias` es [(parroquiaid, par_nombre)]; `jornada_defecto` aplica a las parroquias
+    sin filas en parroquia_jornada. Devuelve una lista ordenada por parroquia, fecha e inicio.
+    """
+    ids = [p.parroquiaid for p in parroquias]
+    if not ids:
+        return []
+    inicio = datetime.combine(desde, datetime.min.time())
+    fin = datetime.combine(hasta + timedelta(days=1), datetime.min.time())
+    jornadas = load_jornadas(ids)
+    ocupados = load_ocupados(ids, inicio, fin)
+    duracion = timedelta(minutes=duracion_min)
+    dias = [desde + timedelta(days=i) for i in range((hasta - desde).days + 1)]
+
+    items = []
+    for parroquia in parroquias:
+        occ = ocupados.get(parroquia.parroquiaid, [])
+        finales = [f for _, f in occ]
+        semana = jornadas.get(parroquia.parroquiaid)
+        for dia in dias:
+            horas = semana.get(dia.weekday(), []) if semana is not None else jornada_defecto
+            ventanas = [(datetime.combine(dia, ini), datetime.combine(dia, fin)) for ini, fin in horas]
+            for h_ini, h_fin in free_slots(ventanas, occ, finales, duracion):
+                items.append({
+                    'parroquiaid': parroquia.parroquiaid,
+                    'parroquia_nombre': parroquia.par_nombre,
+                    'fecha': dia.isoformat(),
+                    'inicio': h_ini.strftime('%H:%M'),
+                    'fin': h_fin.strftime('%H:%M'),
+                    'minutos': int((h_fin - h_ini).total_seconds() // 60)
+                })
+    return items
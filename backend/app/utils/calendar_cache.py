@@ -0,0 +1,124 @@
+"""Cache por día de los eventos del calendario litúrgico.
+
+El calendario se arma con un join de horario/acto/parroquia (los contadores de reservas
+ya vienen en horario, mantenidos por triggers). En lugar de recalcular toda la ventana
+en cada llamada, el resultado se guarda por bloque (parroquia, día): al navegar de mes
+sólo se consultan los días que faltan, en una única consulta por rango.
+
+Las escrituras de horarios, actos y reservas invalidan los días que tocan. Como el cache
+es por worker, cada bloque vence además a los CALENDARIO_CACHE_TTL segundos para ver
+los cambios hechos desde otros workers.
+"""
+import threading
+import time
+from datetime import timedelta
+
+from flask import current_app
+from sqlalchemy import text
+from app import db
+
+MAX_BLOQUES = 20000
+TODAS = 0  # clave de parroquia para usuarios sin restricción y sin filtro
+
+_lock = threading.Lock()
+_bloques = {}  # (parroquiaid | TODAS, fecha) -> (expira_monotonic, [eventos])
+
+
+def _query_eventos(parroquiaid, desde, hasta):
+    params = {'desde': desde, 'hasta': hasta}
+    parroquia_sql = ''
+    if parroquiaid:
+        parroquia_sql = 'AND h.parroquiaid = :parroquiaid'
+        params['parroquiaid'] = parroquiaid
+
+    return db.session.execute(text(f"""
+        SELECT
+            h.h_fecha,
+            h.h_hora,
+            a.act_nombre,
+            a.act_titulo,
+            p.par_nombre as parroquia_nombre,
+            h.reservas_total as reservas_count,
+            h.reservas_activas as reservas_activas_count,
+            h.horarioid,
+            a.actoliturgicoid
+        FROM public.horario h
+        JOIN public.actoliturgico a ON h.actoliturgicoid = a.actoliturgicoid
+        LEFT JOIN public.parroquia p ON h.parroquiaid = p.parroquiaid
+        WHERE h.h_fecha BETWEEN :desde AND :hasta
+          AND h.deleted_at IS NULL
+          AND a.act_estado = TRUE
+          {parroquia_sql}
+        ORDER BY h.h_fecha, h.h_hora
+    """), params).fetchall()
+
+
+def _to_evento(row):
+    return {
+        'date': row.h_fecha.isoformat() if row.h_fecha else None,
+        'time': row.h_hora.strftime('%H:%M') if row.h_hora else None,
+        'type': row.act_nombre,
+        'title': row.act_titulo,
+        'location': row.parroquia_nombre,
+        'reservas_count': row.reservas_count,
+        'reservas_activas_count': row.reservas_activas_count,
+        'horarioid': row.horarioid,
+        'actoliturgicoid': row.actoliturgicoid
+    }
+
+
+def get_calendar_events(parroquiaid, desde, hasta):
+    """Eventos del calendario entre desde y hasta (inclusive), usando el cache por día"""
+    ttl = current_app.config.get('CALENDARIO_CACHE_TTL', 120)
+    scope = parroquiaid or TODAS
+    dias = [desde + timedelta(days=i) for i in range((hasta - desde).days + 1)]
+
+    ahora = time.monotonic()
+    encontrados = {}
+    with _lock:
+        for dia in dias:
+            hit = _bloques.get((scope, dia))
+            if hit and hit[0] > ahora:
+                encontrados[dia] = hit[1]
+
+    faltantes = [d for d in dias if d not in encontrados]
+    if faltantes:
+        # Una sola consulta que cubre todos los días faltantes
+        por_dia = {d: [] for d in faltantes}
+        for row in _query_eventos(parroquiaid, faltantes[0], faltantes[-1]):
+            if row.h_fecha in por_dia:
+                por_dia[row.h_fecha].append(_to_evento(row))
+
+        expira = time.monotonic() + ttl
+        with _lock:
+            if len(_bloques) + len(por_dia) > MAX_BLOQUES:
+                for k in [k for k, v in _bloques.items() if v[0] <= ahora]:
+                    del _bloques[k]
+                if len(_bloques) + len(por_dia) > MAX_BLOQUES:
+                    _bloques.clear()
+            for dia, eventos in por_dia.items():
+                _bloques[(scope, dia)] = (expira, eventos)
+        encontrados.update(por_dia)
+
+    result = []
+    for dia in dias:
+        result.extend(encontrados[dia])
+    return result
+
+
+def invalidate_calendar_days(fechas):
+    """Olvida los bloques de esos días para todas las parroquias"""
+    fechas = {f for f in fechas if f}
+    if not fechas:
+        return
+    with _lock:
+        for k in [k for k in _bloques if k[1] in fechas]:
+            del _bloques[k]
+
+
+def invalidate_calendar():
+    """Olvida todo el cache del calendario"""
+    with _lock:
+        _bloques.clear()
+
+
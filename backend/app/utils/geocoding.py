@@ -0,0 +1,197 @@
+"""Geocodificación de parroquias en backend con cache persistente.
+
+Las páginas ya no consultan Nominatim: las coordenadas se guardan en
+`parroquia.par_latitud/par_longitud` y se devuelven en /api/parroquias.
+Cada dirección se resuelve una sola vez; el resultado queda en la tabla `geocode_cache`
+con la dirección normalizada como clave. "No encontrado" también se guarda, pero vence
+a los GEOCODER_CACHE_NEGATIVO_DIAS días y entonces se vuelve a consultar.
+
+Las rutas de escritura de parroquias no geocodifican: la parroquia queda sin coordenadas
+y scripts/geocode_parroquias.py (geocode_pending) la completa fuera del request.
+"""
+import json
+import re
+import threading
+import time
+import unicodedata
+import urllib.parse
+import urllib.request
+from datetime import datetime, timedelta
+
+from flask import current_app
+from app import db
+from app.models import Parroquia, Distrito, GeocodeCache
+
+
+def normalize_address(direccion):
+    """Normaliza una dirección para usarla como clave de cache"""
+    texto = unicodedata.normalize('NFKD', direccion or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r'[^a-z0-9]+', ' ', texto.lower())
+    return ' '.join(texto.split())
+
+
+# =========================================================
+# PROVEEDORES
+# =========================================================
+
+class NominatimProvider:
+    """Proveedor OpenStreetMap Nominatim (máx. 1 consulta por segundo)"""
+    name = 'nominatim'
+    url = 'https://nominatim.openstreetmap.org/search'
+    min_interval = 1.0
+
+    def __init__(self, user_agent, timeout=5):
+        self.user_agent = user_agent
+        self.timeout = timeout
+        self._last_call = 0.0
+        self._lock = threading.Lock()  # los hilos del worker comparten el límite de 1 req/s
+
+    def geocode(self, query):
+        params = urllib.parse.urlencode({'format': 'json', 'q': query, 'limit': 1})
+        req = urllib.request.Request(f'{self.url}?{params}', headers={'User-Agent': self.user_agent})
+        with self._lock:
+            espera = self.min_interval - (time.monotonic() - self._last_call)
+            if espera > 0:
+                time.sleep(espera)
+            try:
+                with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                    data = json.loads(resp.read().decode('utf-8'))
+            finally:
+                self._last_call = time.monotonic()
+        if data:
+            return float(data[0]['lat']), float(data[0]['lon'])
+        return None
+
+
+class StaticProvider:
+    """Proveedor local en memoria (pruebas / entornos sin red).
+
+    `coordenadas` es un dict {direccion: (lat, lon)}; las claves se normalizan.
+    """
+    name = 'static'
+
+    def __init__(self, coordenadas=None):
+        self.coordenadas = {normalize_address(k): v for k, v in (coordenadas or {}).items()}
+        self.calls = 0
+
+    def geocode(self, query):
+        self.calls += 1
+        return self.coordenadas.get(normalize_address(query))
+
+
+class NullProvider:
+    """Proveedor que nunca resuelve: sólo se usa lo que ya esté en cache"""
+    name = 'ninguno'
+
+    def geocode(self, query):
+        return None
+
+
+_provider_lock = threading.Lock()
+_providers = {}  # (nombre, user_agent, timeout) -> proveedor compartido por el worker
+
+
+def get_provider():
+    """Proveedor configurado en GEOCODER_PROVIDER, uno solo por worker (así el límite de
+    consultas por segundo vale entre requests)"""
+    nombre = current_app.config.get('GEOCODER_PROVIDER', 'nominatim')
+    if nombre != 'nominatim':
+        return NullProvider()
+    user_agent = current_app.config.get('GEOCODER_USER_AGENT', 'parroquia-system')
+    timeout = current_app.config.get('GEOCODER_TIMEOUT', 5)
+    with _provider_lock:
+        clave = (nombre, user_agent, timeout)
+        if clave not in _providers:
+            _providers[clave] = NominatimProvider(user_agent=user_agent, timeout=timeout)
+        return _providers[clave]
+
+
+# =========================================================
+# GEOCODIFICACIÓN CON CACHE
+# =========================================================
+
+def build_query(parroquia):
+    """Arma la consulta igual que lo hacía el frontend: dirección, distrito, región"""
+    region = current_app.config.get('GEOCODER_REGION', '')
+    distrito = Distrito.query.get(parroquia.distritoid) if parroquia.distritoid else None
+    partes = [parroquia.par_direccion, distrito.dis_nombre if distrito else '', region]
+    return ', '.join(p for p in partes if p)
+
+
+def _negativo_vencido(entry):
+    dias = current_app.config.get('GEOCODER_CACHE_NEGATIVO_DIAS', 30)
+    return entry.created_at is None or entry.created_at < datetime.utcnow() - timedelta(days=dias)
+
+
+def geocode_address(query, provider=None, force=False):
+    """Devuelve (lat, lon) o None consultando primero `geocode_cache`.
+
+    Se llama al proveedor si la dirección normalizada no está en cache, si el "no
+    encontrado" guardado venció o con force=True; el resultado se guarda en la sesión
+    actual (el commit lo hace quien llama).
+    """
+    clave = normalize_address(query)
+    if not clave:
+        return None
+
+    entry = GeocodeCache.query.get(clave)
+    if entry and not force:
+        if entry.latitud is not None:
+            return entry.latitud, entry.longitud
+        if not _negativo_vencido(entry):
+            return None
+
+    provider = provider or get_provider()
+    coords = provider.geocode(query)
+    if coords is None and isinstance(provider, NullProvider):
+        # Sin proveedor real no guardamos cache negativo: se reintentará luego
+        return None
+
+    if not entry:
+        entry = GeocodeCache(direccion_norm=clave)
+        db.session.add(entry)
+    entry.latitud = coords[0] if coords else None
+    entry.longitud = coords[1] if coords else None
+    entry.proveedor = provider.name
+    entry.created_at = datetime.utcnow()
+    return coords
+
+
+def geocode_parroquia(parroquia, provider=None, force=False):
+    """Asigna par_latitud/par_longitud a la parroquia. Devuelve True si quedó geocodificada.
+
+    force=True vuelve a consultar al proveedor aunque la parroquia o el cache ya tengan
+    resultado.
+    """
+    if not force and parroquia.par_latitud is not None and parroquia.par_longitud is not None:
+        return True
+    coords = geocode_address(build_query(parroquia), provider, force=force)
+    if not coords:
+        return False
+    parroquia.par_latitud, parroquia.par_longitud = coords
+    return True
+
+
+def geocode_pending(provider=None, limit=None):
+    """Geocodifica las parroquias sin coordenadas. Devuelve (geocodificadas, pendientes)"""
+    provider = provider or get_provider()
+    q = Parroquia.query.filter(
+        db.or_(Parroquia.par_latitud.is_(None), Parroquia.par_longitud.is_(None))
+    ).order_by(Parroquia.parroquiaid)
+    if limit:
+        q = q.limit(limit)
+
+    ok, pendientes = 0, 0
+    for parroquia in q.all():
+        try:
+            if geocode_parroquia(parroquia, provider):
+                ok += 1
+            else:
+                pendientes += 1
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            pendientes += 1
+            print(f"⚠️ No se pudo geocodificar parroquia {parroquia.parroquiaid}: {e}")
+    return ok, pendientes
@@ -0,0 +1,183 @@
+"""Feed iCalendar (RFC 5545) de los horarios de una parroquia.
+
+Los calendarios de los teléfonos consultan la suscripción cada pocos minutos. Cada
+consulta lee sólo la huella de cada mes de la ventana (cantidad de horarios y último
+updated_at de horarios y actos, con el índice por parroquia y fecha): el ETag sale de
+esas huellas y, si coincide con If-None-Match, se responde 304 sin armar nada.
+
+El texto de cada mes (sus VEVENT) se guarda en un cache por worker junto con su huella;
+cuando algo cambia sólo se vuelven a consultar y armar los meses cuya huella cambió.
+"""
+import hashlib
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+from app import db
+from app.utils.partitions import month_start
+
+MAX_MESES = 20000
+
+_lock = threading.Lock()
+_meses = {}  # (parroquiaid, mes) -> (huella, texto)
+
+
+def feed_window(hoy, meses_atras, meses_adelante):
+    """(desde, hasta) de meses completos: el texto de cada mes no depende del día"""
+    return month_start(hoy, -meses_atras), month_start(hoy, meses_adelante + 1) - timedelta(days=1)
+
+
+def month_fingerprints(parroquiaid, desde, hasta):
+    """[(mes, horarios, cambio)] de la ventana, sólo meses con horarios"""
+    return db.session.execute(text("""
+        SELECT
+            date_trunc('month', h.h_fecha)::DATE AS mes,
+            COUNT(*) AS horarios,
+            MAX(GREATEST(h.updated_at, a.updated_at)) AS cambio
+        FROM public.horario h
+        JOIN public.actoliturgico a ON a.actoliturgicoid = h.actoliturgicoid
+        WHERE h.parroquiaid = :parroquiaid
+          AND h.h_fecha BETWEEN :desde AND :hasta
+          AND h.deleted_at IS NULL
+          AND a.deleted_at IS NULL
+          AND a.act_estado = TRUE
+        GROUP BY 1
+        ORDER BY 1
+    """), {'parroquiaid': parroquiaid, 'desde': desde, 'hasta': hasta}).fetchall()
+
+
+def _huella(row):
+    return f'{row.horarios}:{row.cambio.isoformat() if row.cambio else ""}'
+
+
+def _huella_mes(parroquia, row):
+    # El texto del mes lleva también nombre y dirección de la parroquia (LOCATION)
+    return (_huella(row), parroquia.par_nombre, parroquia.par_direccion)
+
+
+def feed_etag(parroquia, desde, hasta, huellas):
+    """ETag del feed: parroquia, ventana y huella de cada mes"""
+    h = hashlib.sha1()
+    h.update(f'{parroquia.parroquiaid}|{parroquia.par_nombre}|{parroquia.par_direccion}|{desde}|{hasta}'.encode('utf-8'))
+    for row in huellas:
+        h.update(f'|{row.mes}={_huella(row)}'.encode('utf-8'))
+    return h.hexdigest()
+
+
+def escape_text(valor):
+    """Escapa un valor TEXT de iCalendar"""
+    return (str(valor or '')
+            .replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def fold_line(linea):
+    """Corta líneas de más de 75 octetos (continuación con un espacio), sin partir caracteres UTF-8"""
+    partes = []
+    actual = ''
+    for c in linea:
+        limite = 75 if not partes else 74
+        if len((actual + c).encode('utf-8')) > limite:
+            partes.append(actual)
+            actual = c
+        else:
+            actual += c
+    partes.append(actual)
+    return '\r\n '.join(partes) + '\r\n'
+
+
+def calendar_header(parroquia, zona):
+    lineas = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Parroquia System//Horarios//ES',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape_text(parroquia.par_nombre)}',
+        f'X-WR-TIMEZONE:{zona}',
+    ]
+    return ''.join(fold_line(linea) for linea in lineas)
+
+
+def calendar_footer():
+    return 'END:VCALENDAR\r\n'
+
+
+def _vevent(row, parroquia, dominio):
+    inicio = datetime.combine(row.h_fecha, row.h_hora)
+    fin = inicio + timedelta(minutes=row.h_duracion)
+    cambio = max(filter(None, (row.h_updated_at, row.a_updated_at)), default=inicio)
+    # Hora local "flotante" (sin TZID): el horario se guarda en hora de la parroquia
+    lineas = [
+        'BEGIN:VEVENT',
+        f'UID:horario-{row.horarioid}@{dominio}',
+        f'DTSTAMP:{cambio:%Y%m%dT%H%M%S}Z',
+        f'LAST-MODIFIED:{cambio:%Y%m%dT%H%M%S}Z',
+        f'DTSTART:{inicio:%Y%m%dT%H%M%S}',
+        f'DTEND:{fin:%Y%m%dT%H%M%S}',
+        f'SUMMARY:{escape_text(row.act_titulo)}',
+        f'CATEGORIES:{escape_text(row.act_nombre)}',
+        f'LOCATION:{escape_text(parroquia.par_nombre + ", " + parroquia.par_direccion)}',
+    ]
+    if row.act_descripcion:
+        lineas.append(f'DESCRIPTION:{escape_text(row.act_descripcion)}')
+    lineas.append('END:VEVENT')
+    return ''.join(fold_line(linea) for linea in lineas)
+
+
+def _render_meses(conn, parroquia, meses, dominio):
+    """{mes: texto} de los meses pedidos, con una sola consulta"""
+    textos = {mes: [] for mes in meses}
+    rows = conn.execute(text("""
+        SELECT h.horarioid, h.h_fecha, h.h_hora, h.h_duracion, h.updated_at AS h_updated_at,
+               a.act_nombre, a.act_titulo, a.act_descripcion, a.updated_at AS a_updated_at
+        FROM public.horario h
+        JOIN public.actoliturgico a ON a.actoliturgicoid = h.actoliturgicoid
+        WHERE h.parroquiaid = :parroquiaid
+          AND h.h_fecha >= :desde AND h.h_fecha < :hasta
+          AND date_trunc('month', h.h_fecha)::DATE = ANY(:meses)
+          AND h.deleted_at IS NULL
+          AND a.deleted_at IS NULL
+          AND a.act_estado = TRUE
+        ORDER BY h.h_fecha, h.h_hora, h.horarioid
+    """), {
+        'parroquiaid': parroquia.parroquiaid,
+        'desde': min(meses),
+        'hasta': month_start(max(meses), 1),
+        'meses': list(meses)
+    })
+    for row in rows:
+        textos[row.h_fecha.replace(day=1)].append(_vevent(row, parroquia, dominio))
+    return {mes: ''.join(partes) for mes, partes in textos.items()}
+
+
+def iter_calendar(engine, parroquia, huellas, zona, dominio):
+    """Genera el VCALENDAR por mes: los meses sin cambios salen del cache, el resto se arma.
+
+    `huellas` son las de month_fingerprints (ya leídas para el ETag). Los meses fuera de
+    la ventana quedan fuera aunque el cache los tenga. Usa su propia conexión: corre
+    dentro de la respuesta en streaming, cuando la sesión de la request ya se cerró.
+    """
+    yield calendar_header(parroquia, zona)
+
+    textos = {}
+    with _lock:
+        for row in huellas:
+            hit = _meses.get((parroquia.parroquiaid, row.mes))
+            if hit and hit[0] == _huella_mes(parroquia, row):
+                textos[row.mes] = hit[1]
+
+    faltantes = [row for row in huellas if row.mes not in textos]
+    if faltantes:
+        with engine.connect() as conn:
+            nuevos = _render_meses(conn, parroquia, [row.mes for row in faltantes], dominio)
+        with _lock:
+            if len(_meses) + len(nuevos) > MAX_MESES:
+                _meses.clear()
+            for row in faltantes:
+                _meses[(parroquia.parroquiaid, row.mes)] = (_huella_mes(parroquia, row), nuevos[row.mes])
+        textos.update(nuevos)
+
+    for row in huellas:
+        yield textos[row.mes]
+    yield calendar_footer()
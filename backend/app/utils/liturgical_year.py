@@ -0,0 +1,275 @@
+"""Año litúrgico (rito romano): fiestas móviles, solemnidades y tiempos de cada día.
+
+La Pascua se calcula con el cómputo gregoriano (algoritmo anónimo de Meeus/Jones/Butcher)
+y de ella salen Ceniza, Semana Santa, Ascensión, Pentecostés, Corpus, etc.; Adviento se
+cuenta hacia atrás desde Navidad. liturgical_year() arma una vez por año civil un dict
+{fecha: día} con el tiempo, semana, color y fiesta de cada día y lo memoriza: clasificar
+miles de fechas (reglas de recurrencia, calendario) es una búsqueda en un dict.
+
+Con `trasladar` (LITURGIA_TRASLADAR_A_DOMINGO) Epifanía, Ascensión y Corpus Christi se
+celebran el domingo, como en los países que las trasladan. Sólo se aplican los traslados
+de San José, la Anunciación y la Inmaculada; si otras dos fiestas coinciden queda la de
+mayor rango.
+"""
+from datetime import date, timedelta
+from functools import lru_cache
+
+# Años admitidos por la API: desde el primer año completo del calendario gregoriano hasta
+# el límite habitual de las tablas de Pascua
+ANIO_MIN, ANIO_MAX = 1583, 4099
+
+# Tiempos litúrgicos: clave -> (nombre, color)
+TIEMPOS = {
+    'adviento': ('Adviento', 'morado'),
+    'navidad': ('Navidad', 'blanco'),
+    'ordinario': ('Tiempo Ordinario', 'verde'),
+    'cuaresma': ('Cuaresma', 'morado'),
+    'triduo': ('Triduo Pascual', 'rojo'),
+    'pascua': ('Pascua', 'blanco'),
+}
+
+# Fiestas: clave -> (nombre, rango, color). Rango: 1 solemnidad mayor (Triduo, Pascua,
+# Navidad...), 2 solemnidad, 3 fiesta, 4 memoria o conmemoración
+FIESTAS = {
+    'santa_maria_madre_de_dios': ('Santa María, Madre de Dios', 2, 'blanco'),
+    'epifania': ('Epifanía del Señor', 1, 'blanco'),
+    'bautismo_del_senor': ('Bautismo del Señor', 3, 'blanco'),
+    'miercoles_de_ceniza': ('Miércoles de Ceniza', 1, 'morado'),
+    'san_jose': ('San José, Esposo de la Virgen María', 2, 'blanco'),
+    'anunciacion': ('Anunciación del Señor', 2, 'blanco'),
+    'domingo_de_ramos': ('Domingo de Ramos', 1, 'rojo'),
+    'jueves_santo': ('Jueves Santo', 1, 'blanco'),
+    'viernes_santo': ('Viernes Santo', 1, 'rojo'),
+    'sabado_santo': ('Sábado Santo', 1, 'blanco'),
+    'pascua': ('Domingo de Resurrección', 1, 'blanco'),
+    'divina_misericordia': ('Domingo de la Divina Misericordia', 1, 'blanco'),
+    'ascension': ('Ascensión del Señor', 1, 'blanco'),
+    'pentecostes': ('Pentecostés', 1, 'rojo'),
+    'santisima_trinidad': ('Santísima Trinidad', 2, 'blanco'),
+    'corpus_christi': ('Corpus Christi', 2, 'blanco'),
+    'sagrado_corazon': ('Sagrado Corazón de Jesús', 2, 'blanco'),
+    'inmaculado_corazon': ('Inmaculado Corazón de María', 4, 'blanco'),
+    'natividad_san_juan_bautista': ('Natividad de San Juan Bautista', 2, 'blanco'),
+    'san_pedro_y_san_pablo': ('San Pedro y San Pablo', 2, 'rojo'),
+    'asuncion': ('Asunción de la Virgen María', 2, 'blanco'),
+    'todos_los_santos': ('Todos los Santos', 2, 'blanco'),
+    'fieles_difuntos': ('Conmemoración de los Fieles Difuntos', 4, 'morado'),
+    'cristo_rey': ('Jesucristo, Rey del Universo', 2, 'blanco'),
+    'adviento_1': ('I Domingo de Adviento', 1, 'morado'),
+    'adviento_2': ('II Domingo de Adviento', 1, 'morado'),
+    'adviento_3': ('III Domingo de Adviento (Gaudete)', 1, 'rosado'),
+    'adviento_4': ('IV Domingo de Adviento', 1, 'morado'),
+    'inmaculada_concepcion': ('Inmaculada Concepción', 2, 'blanco'),
+    'navidad': ('Natividad del Señor', 1, 'blanco'),
+    'sagrada_familia': ('Sagrada Familia', 3, 'blanco'),
+}
+
+_FIJAS = {
+    (1, 1): 'santa_maria_madre_de_dios',
+    (6, 24): 'natividad_san_juan_bautista',
+    (6, 29): 'san_pedro_y_san_pablo',
+    (8, 15): 'asuncion',
+    (11, 1): 'todos_los_santos',
+    (11, 2): 'fieles_difuntos',
+    (12, 25): 'navidad',
+}
+
+
+def easter_date(anio):
+    """Domingo de Pascua (calendario gregoriano)"""
+    a = anio % 19
+    b, c = divmod(anio, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes, dia = divmod(h + l - 7 * m + 114, 31)
+    return date(anio, mes, dia + 1)
+
+
+def advent_start(anio):
+    """I Domingo de Adviento: cuarto domingo antes de Navidad"""
+    navidad = date(anio, 12, 25)
+    return navidad - timedelta(days=navidad.weekday() + 1 + 21)
+
+
+def _domingo_siguiente(fecha):
+    """Primer domingo estrictamente posterior a `fecha`"""
+    return fecha + timedelta(days=7 - (fecha.weekday() + 1) % 7)
+
+
+def sunday_cycle(anio_liturgico):
+    """Ciclo dominical A/B/C del año litúrgico que termina en `anio_liturgico`"""
+    return 'CAB'[anio_liturgico % 3]
+
+
+def epiphany_and_baptism(anio, trasladar):
+    """(Epifanía, Bautismo del Señor): 6 de enero o el domingo entre el 2 y el 8 si se
+    traslada; el Bautismo es el domingo siguiente, o el lunes si la Epifanía cae el 7 u 8"""
+    if trasladar:
+        epifania = _domingo_siguiente(date(anio, 1, 1))
+        return epifania, epifania + timedelta(days=1 if epifania.day >= 7 else 7)
+    epifania = date(anio, 1, 6)
+    return epifania, _domingo_siguiente(epifania)
+
+
+def _fiestas(anio, trasladar):
+    """{fecha: clave} de las fiestas del año civil"""
+    pascua = easter_date(anio)
+    adviento = advent_start(anio)
+    moviles = {
+        'miercoles_de_ceniza': pascua - timedelta(days=46),
+        'domingo_de_ramos': pascua - timedelta(days=7),
+        'jueves_santo': pascua - timedelta(days=3),
+        'viernes_santo': pascua - timedelta(days=2),
+        'sabado_santo': pascua - timedelta(days=1),
+        'pascua': pascua,
+        'divina_misericordia': pascua + timedelta(days=7),
+        'ascension': pascua + timedelta(days=42 if trasladar else 39),
+        'pentecostes': pascua + timedelta(days=49),
+        'santisima_trinidad': pascua + timedelta(days=56),
+        'corpus_christi': pascua + timedelta(days=63 if trasladar else 60),
+        'sagrado_corazon': pascua + timedelta(days=68),
+        'inmaculado_corazon': pascua + timedelta(days=69),
+        'cristo_rey': adviento - timedelta(days=7),
+        'adviento_1': adviento,
+        'adviento_2': adviento + timedelta(days=7),
+        'adviento_3': adviento + timedelta(days=14),
+        'adviento_4': adviento + timedelta(days=21),
+    }
+
+    moviles['epifania'], moviles['bautismo_del_senor'] = epiphany_and_baptism(anio, trasladar)
+
+    # Sagrada Familia: domingo de la octava de Navidad, o el 30 si Navidad cae en domingo
+    navidad = date(anio, 12, 25)
+    moviles['sagrada_familia'] = date(anio, 12, 30) if navidad.weekday() == 6 else _domingo_siguiente(navidad)
+
+    # San José: en Semana Santa pasa al sábado anterior al Domingo de Ramos; un domingo
+    # de Cuaresma, al lunes
+    san_jose = date(anio, 3, 19)
+    if moviles['domingo_de_ramos'] <= san_jose <= pascua:
+        san_jose = moviles['domingo_de_ramos'] - timedelta(days=1)
+    elif san_jose.weekday() == 6:
+        san_jose += timedelta(days=1)
+    moviles['san_jose'] = san_jose
+
+    # Anunciación: en Semana Santa u octava de Pascua pasa al lunes después de la Divina
+    # Misericordia; un domingo de Cuaresma, al lunes
+    anunciacion = date(anio, 3, 25)
+    if moviles['domingo_de_ramos'] <= anunciacion <= moviles['divina_misericordia']:
+        anunciacion = moviles['divina_misericordia'] + timedelta(days=1)
+    elif anunciacion.weekday() == 6:
+        anunciacion += timedelta(days=1)
+    moviles['anunciacion'] = anunciacion
+
+    # Inmaculada: si cae en el II Domingo de Adviento pasa al lunes
+    inmaculada = date(anio, 12, 8)
+    moviles['inmaculada_concepcion'] = inmaculada + timedelta(days=1) if inmaculada.weekday() == 6 else inmaculada
+
+    fiestas = {}
+    candidatas = [(date(anio, mes, dia), clave) for (mes, dia), clave in _FIJAS.items()]
+    candidatas += [(fecha, clave) for clave, fecha in moviles.items() if fecha.year == anio]
+    for fecha, clave in candidatas:
+        actual = fiestas.get(fecha)
+        if actual is None or FIESTAS[clave][1] < FIESTAS[actual][1]:
+            fiestas[fecha] = clave
+    return fiestas
+
+
+@lru_cache(maxsize=64)
+def liturgical_year(anio, trasladar=True):
+    """Resumen del año civil `anio` y {fecha: día} de todos sus días (memorizado por año).
+
+    Cada día: tiempo, nombre del tiempo, semana (None en Navidad y Triduo), color,
+    fiesta (clave o None), ciclo dominical y ciclo ferial (I/II).
+    """
+    pascua = easter_date(anio)
+    ceniza = pascua - timedelta(days=46)
+    cuaresma_1 = pascua - timedelta(days=42)
+    jueves_santo = pascua - timedelta(days=3)
+    pentecostes = pascua + timedelta(days=49)
+    adviento = advent_start(anio)
+    fiestas = _fiestas(anio, trasladar)
+    bautismo = epiphany_and_baptism(anio, trasladar)[1]
+    # Las semanas del Tiempo Ordinario empiezan el domingo del Bautismo (o el anterior, si
+    # se celebra en lunes): el domingo siguiente es el II Domingo
+    domingo_bautismo = bautismo - timedelta(days=(bautismo.weekday() + 1) % 7)
+
+    dias = {}
+    primero = date(anio, 1, 1)
+    # Por cantidad de días: avanzar más allá del 31/12/9999 desborda date
+    for n in range((date(anio, 12, 31) - primero).days + 1):
+        fecha = primero + timedelta(days=n)
+        # La Navidad termina con el Bautismo del Señor (inclusive)
+        if fecha <= bautismo or fecha >= date(anio, 12, 25):
+            tiempo, semana = 'navidad', None
+        elif fecha < ceniza:
+            tiempo, semana = 'ordinario', (fecha - domingo_bautismo).days // 7 + 1
+        elif fecha < jueves_santo:
+            # Ceniza hasta el sábado siguiente: semana 0
+            tiempo = 'cuaresma'
+            semana = (fecha - cuaresma_1).days // 7 + 1 if fecha >= cuaresma_1 else 0
+        elif fecha < pascua:
+            tiempo, semana = 'triduo', None
+        elif fecha <= pentecostes:
+            tiempo, semana = 'pascua', min((fecha - pascua).days // 7 + 1, 7)
+        elif fecha < adviento:
+            # Las semanas del Tiempo Ordinario después de Pentecostés se cuentan hacia atrás
+            # desde la 34 (la de Cristo Rey)
+            tiempo, semana = 'ordinario', 34 - ((adviento - fecha).days - 1) // 7
+        else:
+            tiempo, semana = 'adviento', (fecha - adviento).days // 7 + 1
+
+        fiesta = fiestas.get(fecha)
+        anio_liturgico = anio + 1 if fecha >= adviento else anio
+        dias[fecha] = {
+            'fecha': fecha.isoformat(),
+            'tiempo': tiempo,
+            'tiempo_nombre': TIEMPOS[tiempo][0],
+            'semana': semana,
+            'color': FIESTAS[fiesta][2] if fiesta else TIEMPOS[tiempo][1],
+            'fiesta': fiesta,
+            'fiesta_nombre': FIESTAS[fiesta][0] if fiesta else None,
+            'rango': FIESTAS[fiesta][1] if fiesta else None,
+            'domingo': fecha.weekday() == 6,
+            'ciclo_dominical': sunday_cycle(anio_liturgico),
+            'ciclo_ferial': 'I' if anio_liturgico % 2 else 'II',
+        }
+
+    return {
+        'anio': anio,
+        'pascua': pascua.isoformat(),
+        'fiestas': [
+            {'clave': clave, 'nombre': FIESTAS[clave][0], 'fecha': f.isoformat(), 'rango': FIESTAS[clave][1]}
+            for f, clave in sorted(fiestas.items())
+        ],
+        'tiempos': _season_ranges(dias),
+        'dias': dias,
+    }
+
+
+def _season_ranges(dias):
+    """[{tiempo, desde, hasta}] con los tramos consecutivos de cada tiempo en el año"""
+    tramos = []
+    for fecha in sorted(dias):
+        tiempo = dias[fecha]['tiempo']
+        if tramos and tramos[-1]['tiempo'] == tiempo:
+            tramos[-1]['hasta'] = fecha.isoformat()
+        else:
+            tramos.append({'tiempo': tiempo, 'nombre': TIEMPOS[tiempo][0],
+                           'desde': fecha.isoformat(), 'hasta': fecha.isoformat()})
+    return tramos
+
+
+def classify_date(fecha, trasladar=True):
+    """Día litúrgico de `fecha` (dict de liturgical_year; no modificar)"""
+    return liturgical_year(fecha.year, trasladar)['dias'][fecha]
+
+
+def matches_any(fecha, claves, trasladar=True):
+    """True si el tiempo o la fiesta de `fecha` está en `claves`"""
+    dia = classify_date(fecha, trasladar)
+    return dia['tiempo'] in claves or dia['fiesta'] in claves
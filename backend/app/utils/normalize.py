@@ -0,0 +1,47 @@
+import re
+
+# Debe coincidir con la función SQL persona_nombre_norm() de scripts/database_full.sql
+# (translate + minúsculas + todo lo que no sea [a-z0-9] pasa a un solo espacio)
+ACENTOS_ORIGEN = 'áàäâãéèëêíìïîóòöôõúùüûñç'
+ACENTOS_DESTINO = 'aaaaaeeeeiiiiooooouuuunc'
+_TABLA_ACENTOS = str.maketrans(ACENTOS_ORIGEN, ACENTOS_DESTINO)
+_NO_ALFANUM = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_text(texto):
+    """Minúsculas, sin tildes y con espacios simples"""
+    texto = (texto or '').lower().translate(_TABLA_ACENTOS)
+    return _NO_ALFANUM.sub(' ', texto).strip()
+
+
+def normalize_person_name(nombres, apellidos):
+    """Clave de nombre usada para deduplicar personas (igual que persona_nombre_norm en SQL)"""
+    return normalize_text(f"{nombres or ''} {apellidos or ''}")
+
+
+# Reglas fonéticas del español (orden importante). Se aplican sobre texto ya normalizado.
+_REGLAS_FONETICAS = [
+    (re.compile(r'[^a-z]'), ''),
+    (re.compile(r'ch'), 'X'),           # ch se conserva como sonido propio
+    (re.compile(r'h'), ''),             # h muda
+    (re.compile(r'qu(?=[ei])'), 'k'),
+    (re.compile(r'gu(?=[ei])'), 'G'),   # guerra, guiso -> g fuerte (mayúscula = ya resuelto)
+    (re.compile(r'g(?=[ei])'), 'J'),    # gente, gil -> j
+    (re.compile(r'j'), 'J'),
+    (re.compile(r'c(?=[ei])'), 's'),
+    (re.compile(r'[cq]'), 'k'),
+    (re.compile(r'z'), 's'),
+    (re.compile(r'x'), 'ks'),
+    (re.compile(r'll'), 'y'),
+    (re.compile(r'[vw]'), 'b'),
+    (re.compile(r'y(?=[^aeiou]|$)'), 'i'),
+    (re.compile(r'(.)\1+'), r'\1'),     # letras repetidas
+]
+
+
+def spanish_phonetic(palabra):
+    """Código fonético simple para español: Gonzales/González, Baldez/Valdés, Jiménez/Giménez"""
+    codigo = normalize_text(palabra).replace(' ', '')
+    for patron, reemplazo in _REGLAS_FONETICAS:
+        codigo = patron.sub(reemplazo, codigo)
+    return codigo.upper()
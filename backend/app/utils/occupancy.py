@@ -0,0 +1,173 @@
+"""Mapa de ocupación: reservas por día de la semana × hora, por tipo de acto y parroquia.
+
+Una sola consulta GROUPING SETS por rango de meses calcula a la vez las celdas por acto,
+las celdas de todos los actos y los totales (por acto y de la parroquia), agrupando
+además por mes. Cada mes se guarda en un cache por worker con clave (parroquia, mes);
+al pedir otro rango sólo se consultan los meses que faltan o vencieron
+(OCUPACION_CACHE_TTL) y los meses se suman en memoria (son conteos).
+
+La respuesta es densa: matrices de 7 filas (0 = lunes) × 24 columnas (hora de inicio
+del horario), listas para un heatmap.
+"""
+import threading
+import time
+from collections import defaultdict
+
+from flask import current_app
+from sqlalchemy import text
+from app import db
+from app.utils.partitions import month_start
+
+DIAS = ['lunes', 'martes', 'miércoles', 'jueves', 'viernes', 'sábado', 'domingo']
+HORAS = list(range(24))
+MAX_MESES = 20000
+TODAS = 0  # clave de parroquia para usuarios sin restricción y sin filtro
+
+_lock = threading.Lock()
+_meses = {}  # (parroquiaid | TODAS, mes) -> (expira_monotonic, {parroquiaid: conteos})
+
+
+def _query_meses(parroquiaid, desde, hasta):
+    """Filas GROUPING SETS de los meses [desde, hasta) (desde y hasta son primeros de mes)"""
+    params = {'desde': desde, 'hasta': hasta}
+    parroquia_sql = ''
+    if parroquiaid:
+        parroquia_sql = 'AND h.parroquiaid = :parroquiaid'
+        params['parroquiaid'] = parroquiaid
+
+    # El rango va sobre r.h_fecha y h.h_fecha: poda particiones de ambas tablas y permite
+    # partir de idx_reserva_fecha o de idx_horario_vivos_parroquia_fecha
+    return db.session.execute(text(f"""
+        SELECT
+            mes, parroquiaid, act_nombre, dia, hora,
+            GROUPING(act_nombre) AS todos_actos,
+            GROUPING(dia, hora) AS todas_celdas,
+            COUNT(*) AS reservas,
+            COUNT(*) FILTER (WHERE activa) AS activas
+        FROM (
+            SELECT
+                date_trunc('month', r.h_fecha)::DATE AS mes,
+                h.parroquiaid,
+                a.act_nombre,
+                EXTRACT(ISODOW FROM r.h_fecha)::INTEGER - 1 AS dia,
+                EXTRACT(HOUR FROM h.h_hora)::INTEGER AS hora,
+                COALESCE(pg.pago_estado, 'pendiente') IN ('pendiente', 'pagado') AS activa
+            FROM public.reserva r
+            JOIN public.horario h ON h.horarioid = r.horarioid AND h.h_fecha = r.h_fecha
+            JOIN public.actoliturgico a ON a.actoliturgicoid = h.actoliturgicoid
+            LEFT JOIN public.pago pg ON pg.pagoid = r.pagoid
+            WHERE r.h_fecha >= :desde AND r.h_fecha < :hasta
+              AND h.h_fecha >= :desde AND h.h_fecha < :hasta
+              AND h.deleted_at IS NULL
+              AND h.parroquiaid IS NOT NULL
+              {parroquia_sql}
+        ) x
+        GROUP BY GROUPING SETS (
+            (mes, parroquiaid, act_nombre, dia, hora),
+            (mes, parroquiaid, dia, hora),
+            (mes, parroquiaid, act_nombre),
+            (mes, parroquiaid)
+        )
+    """), params).fetchall()
+
+
+def _conteos_vacios():
+    return {'celdas': {}, 'totales': {}}
+
+
+def _cargar_meses(parroquiaid, meses):
+    """{mes: {parroquiaid: {'celdas': {(acto|None, dia, hora): (reservas, activas)},
+    'totales': {acto|None: (reservas, activas)}}}} de los meses pedidos, en una consulta"""
+    por_mes = {mes: defaultdict(_conteos_vacios) for mes in meses}
+    for row in _query_meses(parroquiaid, min(meses), month_start(max(meses), 1)):
+        if row.mes not in por_mes:
+            continue
+        acto = None if row.todos_actos else row.act_nombre
+        conteos = por_mes[row.mes][row.parroquiaid]
+        if row.todas_celdas:
+            conteos['totales'][acto] = (row.reservas, row.activas)
+        else:
+            conteos['celdas'][(acto, row.dia, row.hora)] = (row.reservas, row.activas)
+    return {mes: dict(datos) for mes, datos in por_mes.items()}
+
+
+def _meses_del_rango(desde, hasta):
+    meses = []
+    mes = month_start(desde)
+    while mes <= hasta:
+        meses.append(mes)
+        mes = month_start(mes, 1)
+    return meses
+
+
+def load_occupancy(parroquiaid, desde, hasta):
+    """{mes: {parroquiaid: conteos}} de los meses de desde a hasta, usando el cache por mes"""
+    ttl = current_app.config.get('OCUPACION_CACHE_TTL', 900)
+    scope = parroquiaid or TODAS
+    meses = _meses_del_rango(desde, hasta)
+
+    ahora = time.monotonic()
+    encontrados = {}
+    with _lock:
+        for mes in meses:
+            hit = _meses.get((scope, mes))
+            if hit and hit[0] > ahora:
+                encontrados[mes] = hit[1]
+
+    faltantes = [m for m in meses if m not in encontrados]
+    if faltantes:
+        nuevos = _cargar_meses(parroquiaid, faltantes)
+        expira = time.monotonic() + ttl
+        with _lock:
+            if len(_meses) + len(nuevos) > MAX_MESES:
+                for k in [k for k, v in _meses.items() if v[0] <= ahora]:
+                    del _meses[k]
+                if len(_meses) + len(nuevos) > MAX_MESES:
+                    _meses.clear()
+            for mes, datos in nuevos.items():
+                _meses[(scope, mes)] = (expira, datos)
+        encontrados.update(nuevos)
+    return encontrados
+
+
+def _matriz_vacia():
+    return [[0] * len(HORAS) for _ in DIAS]
+
+
+def occupancy_series(por_mes, metrica, nombres, parroquiaid=None):
+    """Suma los meses y arma series densas: por parroquia (todos los actos y cada acto) y,
+    con más de una parroquia, el total de todas (parroquiaid None). La parroquia pedida
+    sale aunque no tenga reservas (matriz en cero)"""
+    indice = 0 if metrica == 'reservas' else 1
+    matrices = defaultdict(_matriz_vacia)  # (parroquiaid | None, acto | None) -> 7x24
+    totales = defaultdict(int)
+    for datos in por_mes.values():
+        for pid, conteos in datos.items():
+            for (acto, dia, hora), valores in conteos['celdas'].items():
+                matrices[(pid, acto)][dia][hora] += valores[indice]
+            for acto, valores in conteos['totales'].items():
+                totales[(pid, acto)] += valores[indice]
+
+    parroquias = sorted({p for p, _ in totales} | ({parroquiaid} if parroquiaid else set()))
+    if len(parroquias) > 1:
+        for (_, acto), matriz in list(matrices.items()):
+            destino = matrices[(None, acto)]
+            for dia, fila in enumerate(matriz):
+                for hora, valor in enumerate(fila):
+                    destino[dia][hora] += valor
+        for (_, acto), valor in list(totales.items()):
+            totales[(None, acto)] += valor
+        parroquias = [None] + parroquias
+
+    series = []
+    for pid in parroquias:
+        actos = sorted(a for p, a in totales if p == pid and a is not None)
+        for acto in [None] + actos:
+            series.append({
+                'parroquiaid': pid,
+                'parroquia_nombre': nombres.get(pid) if pid else 'Todas',
+                'act_nombre': acto,
+                'total': totales.get((pid, acto), 0),
+                'matriz': matrices[(pid, acto)]
+            })
+    return series
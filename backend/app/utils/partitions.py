@@ -0,0 +1,98 @@
+"""Particiones mensuales de horario y reserva por h_fecha.
+
+scripts/partition_horario_reserva.py convierte ambas tablas (una vez) y el cron
+scripts/crear_particiones.py mantiene PARTICIONES_MESES_ADELANTE meses creados. Un horario
+más lejano (un matrimonio reservado con años de anticipación, una recurrencia con horizonte
+largo) necesita su partición antes del INSERT: ensure_partitions la crea en la misma
+transacción. Con tablas sin particionar crear_particiones() no hace nada.
+
+Las fechas pasan por max_horario_date() (hoy + HORARIO_HORIZONTE_MAX_DIAS): una fecha
+mal escrita (9999-01-01) crearía decenas de miles de particiones en un solo request.
+crear_particiones() tiene además su propio tope de 10 años.
+
+scanned_partitions() lee el plan de una consulta (EXPLAIN, sin ejecutarla) y devuelve las
+particiones que recorre: sirve para comprobar que la poda por h_fecha funciona.
+"""
+import json
+import re
+from datetime import date, timedelta
+
+from flask import current_app
+from sqlalchemy import text
+from app import db
+
+TABLAS_PARTICIONADAS = ('horario', 'reserva')
+# horario_p2026_01, reserva_historico... (horario_recurrencia no es una partición)
+PARTICION_RE = re.compile(r'^(horario|reserva)_(p\d{4}_\d{2}|historico)$')
+
+
+def max_horario_date():
+    """Fecha más lejana aceptada para un horario: hoy + HORARIO_HORIZONTE_MAX_DIAS"""
+    return date.today() + timedelta(days=current_app.config.get('HORARIO_HORIZONTE_MAX_DIAS', 1825))
+
+
+def ensure_partitions(fechas):
+    """Crea las particiones que falten hasta la fecha más lejana (llamar antes de escribir).
+
+    ValueError si alguna fecha pasa max_horario_date(): las rutas lo validan antes (400).
+    """
+    fechas = [f for f in fechas if f]
+    if fechas:
+        if max(fechas) > max_horario_date():
+            raise ValueError(f'Fecha fuera del horizonte de horarios: {max(fechas).isoformat()}')
+        db.session.execute(text('SELECT crear_particiones(:hasta)'), {'hasta': max(fechas)})
+
+
+def is_partitioned():
+    """True si horario ya es una tabla particionada"""
+    return db.session.execute(text(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = 'public.horario'::regclass"
+    )).scalar()
+
+
+def list_partitions(tabla):
+    """[(particion, limites)] de una tabla particionada, en orden de creación"""
+    return db.session.execute(text("""
+        SELECT c.relname AS particion, pg_get_expr(c.relpartbound, c.oid) AS limites
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = CAST(:tabla AS regclass)
+        ORDER BY c.oid
+    """), {'tabla': f'public.{tabla}'}).fetchall()
+
+
+def _relaciones(nodo):
+    if 'Relation Name' in nodo:
+        yield nodo['Relation Name']
+    for hijo in nodo.get('Plans', []):
+        yield from _relaciones(hijo)
+
+
+def scanned_partitions(sql, params=None):
+    """{tabla: [particiones]} que recorre el plan de `sql` (horario_*, reserva_*)"""
+    plan = db.session.execute(text(f'EXPLAIN (FORMAT JSON) {sql}'), params or {}).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    escaneadas = {tabla: set() for tabla in TABLAS_PARTICIONADAS}
+    for relacion in _relaciones(plan[0]['Plan']):
+        m = PARTICION_RE.match(relacion)
+        if m:
+            escaneadas[m.group(1)].add(relacion)
+    return {tabla: sorted(nombres) for tabla, nombres in escaneadas.items()}
+
+
+def month_start(fecha, meses=0):
+    """Primer día del mes de `fecha` desplazado `meses` meses"""
+    total = fecha.year * 12 + fecha.month - 1 + meses
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def expected_partitions(desde, hasta):
+    """Particiones mensuales de horario y reserva que cubren [desde, hasta]"""
+    nombres = set()
+    mes = month_start(desde)
+    while mes <= hasta:
+        for tabla in TABLAS_PARTICIONADAS:
+            nombres.add(f'{tabla}_p{mes:%Y_%m}')
+        mes = month_start(mes, 1)
+    return nombres
@@ -0,0 +1,205 @@
+"""Detección y fusión de personas duplicadas.
+
+Para no comparar todos contra todos, cada persona se asigna a bloques por claves:
+  - tokens fonéticos del nombre completo, ordenados (apellidos invertidos caen juntos)
+  - primer nombre + primer apellido fonéticos, ordenados (segundo apellido omitido)
+cada una combinada con año de nacimiento y parroquia. Sólo se comparan pares dentro
+de un mismo bloque, así el costo es casi lineal en el número de personas.
+
+El job corre fuera de la request (scripts/dedupe_personas.py) parroquia por parroquia
+y deja los pares en `persona_merge_candidato` para revisión.
+"""
+from collections import defaultdict
+from datetime import datetime
+from difflib import SequenceMatcher
+from itertools import combinations
+
+from flask import current_app
+from sqlalchemy import text
+from app import db
+from app.utils.normalize import normalize_text, spanish_phonetic
+
+
+def blocking_keys(nombres, apellidos, fecha_nacimiento, parroquiaid):
+    """Claves de bloque de una persona"""
+    tokens_nom = [spanish_phonetic(t) for t in normalize_text(nombres).split()]
+    tokens_ape = [spanish_phonetic(t) for t in normalize_text(apellidos).split()]
+    anio = fecha_nacimiento.year if fecha_nacimiento else 0
+    sufijo = f'{anio}|{parroquiaid}'
+
+    keys = set()
+    todos = sorted(t for t in tokens_nom + tokens_ape if t)
+    if todos:
+        keys.add('F:' + ' '.join(todos) + '|' + sufijo)
+    if tokens_nom and tokens_ape:
+        keys.add('P:' + ' '.join(sorted([tokens_nom[0], tokens_ape[0]])) + '|' + sufijo)
+    return keys
+
+
+def similarity(a, b):
+    """Puntaje 0..1 entre dos personas del mismo bloque"""
+    tokens_a = normalize_text(f"{a.per_nombres} {a.per_apellidos}").split()
+    tokens_b = normalize_text(f"{b.per_nombres} {b.per_apellidos}").split()
+    texto = SequenceMatcher(None, ' '.join(sorted(tokens_a)), ' '.join(sorted(tokens_b))).ratio()
+    fonetico = SequenceMatcher(
+        None,
+        ' '.join(sorted(spanish_phonetic(t) for t in tokens_a)),
+        ' '.join(sorted(spanish_phonetic(t) for t in tokens_b))
+    ).ratio()
+    score = max(texto, fonetico)
+    if a.fecha_nacimiento == b.fecha_nacimiento:
+        score = min(1.0, score + 0.1)
+    return round(score, 3)
+
+
+def find_candidates(personas):
+    """Pares candidatos [(id_a, id_b, puntaje, clave)] dentro de un conjunto de personas"""
+    umbral = current_app.config.get('PERSONA_DEDUPE_UMBRAL', 0.85)
+    max_bloque = current_app.config.get('PERSONA_DEDUPE_MAX_BLOQUE', 50)
+
+    bloques = defaultdict(list)
+    for p in personas:
+        for key in blocking_keys(p.per_nombres, p.per_apellidos, p.fecha_nacimiento, p.parroquiaid):
+            bloques[key].append(p)
+
+    pares = {}
+    for key, miembros in bloques.items():
+        if len(miembros) < 2:
+            continue
+        if len(miembros) > max_bloque:
+            # Bloque demasiado común (p.ej. "Juan Pérez" + año): no se compara completo
+            print(f"⚠️ Bloque {key} con {len(miembros)} personas, se omite")
+            continue
+        for a, b in combinations(sorted(miembros, key=lambda p: p.personaid), 2):
+            if (a.personaid, b.personaid) in pares:
+                continue
+            score = similarity(a, b)
+            if score >= umbral:
+                pares[(a.personaid, b.personaid)] = (score, key)
+
+    return [(a, b, score, key) for (a, b), (score, key) in pares.items()]
+
+
+def detect_duplicates(parroquiaid=None):
+    """Corre la detección parroquia por parroquia (commit por parroquia).
+
+    Devuelve el número de candidatos nuevos registrados.
+    """
+    if parroquiaid:
+        parroquias = [parroquiaid]
+    else:
+        parroquias = [r.parroquiaid for r in db.session.execute(
+            text('SELECT parroquiaid FROM public.parroquia ORDER BY parroquiaid'))]
+
+    nuevos = 0
+    for pid in parroquias:
+        personas = db.session.execute(text("""
+            SELECT personaid, per_nombres, per_apellidos, fecha_nacimiento, parroquiaid
+            FROM public.persona
+            WHERE parroquiaid = :pid
+        """), {'pid': pid}).fetchall()
+
+        candidatos = find_candidates(personas)
+        if candidatos:
+            result = db.session.execute(text("""
+                INSERT INTO public.persona_merge_candidato
+                    (personaid_a, personaid_b, parroquiaid, puntaje, clave_bloque)
+                VALUES (:a, :b, :pid, :puntaje, :clave)
+                ON CONFLICT (personaid_a, personaid_b) DO NOTHING
+            """), [
+                {'a': a, 'b': b, 'pid': pid, 'puntaje': score, 'clave': key[:255]}
+                for a, b, score, key in candidatos
+            ])
+            nuevos += max(result.rowcount, 0)
+        db.session.commit()
+        print(f"🔎 Parroquia {pid}: {len(personas)} personas, {len(candidatos)} pares candidatos")
+    return nuevos
+
+
+def _resolve_targets(pares):
+    """Cada duplicado apunta a la persona final que se conserva (fusiones encadenadas)"""
+    destino = {}
+
+    def final(pid):
+        while pid in destino:
+            pid = destino[pid]
+        return pid
+
+    for keep, drop in pares:
+        keep, drop = final(keep), final(drop)
+        if keep == drop:
+            continue
+        if drop < keep:
+            keep, drop = drop, keep
+        destino[drop] = keep
+    return {drop: final(drop) for drop in destino}
+
+
+def apply_merges(candidato_ids):
+    """Aplica fusiones pendientes: re-apunta reservas en bloque y elimina los duplicados.
+
+    Devuelve {'aplicados': [...], 'personas_eliminadas': n, 'reservas_actualizadas': n}.
+    El commit lo hace quien llama.
+    """
+    filas = db.session.execute(text("""
+        SELECT candidatoid, personaid_a, personaid_b
+        FROM public.persona_merge_candidato
+        WHERE candidatoid = ANY(:ids) AND estado = 'pendiente'
+        FOR UPDATE
+    """), {'ids': list(candidato_ids)}).fetchall()
+    if not filas:
+        return {'aplicados': [], 'personas_eliminadas': 0, 'reservas_actualizadas': 0}
+
+    mapa = _resolve_targets([(f.personaid_a, f.personaid_b) for f in filas])
+    drops = list(mapa.keys())
+    keeps = [mapa[d] for d in drops]
+    params = {'drops': drops, 'keeps': keeps}
+
+    reservas = db.session.execute(text("""
+        UPDATE public.reserva r
+        SET personaid = m.keep_id
+        FROM unnest(CAST(:drops AS INTEGER[]), CAST(:keeps AS INTEGER[])) AS m(drop_id, keep_id)
+        WHERE r.personaid = m.drop_id
+    """), params).rowcount
+    db.session.execute(text("""
+        UPDATE public.liturgical_reservation lr
+        SET personaid = m.keep_id
+        FROM unnest(CAST(:drops AS INTEGER[]), CAST(:keeps AS INTEGER[])) AS m(drop_id, keep_id)
+        WHERE lr.personaid = m.drop_id
+    """), params)
+
+    # Si el duplicado tenía usuario y la persona conservada no, se traslada el vínculo
+    usuarios = db.session.execute(text("""
+        SELECT m.keep_id, d.userid
+        FROM unnest(CAST(:drops AS INTEGER[]), CAST(:keeps AS INTEGER[])) AS m(drop_id, keep_id)
+        JOIN public.persona d ON d.personaid = m.drop_id
+        JOIN public.persona k ON k.personaid = m.keep_id
+        WHERE d.userid IS NOT NULL AND k.userid IS NULL
+    """), params).fetchall()
+    eliminadas = db.session.execute(text("""
+        DELETE FROM public.persona WHERE personaid = ANY(:drops)
+    """), params).rowcount
+    vistos = set()
+    for u in usuarios:
+        if u.keep_id in vistos:
+            continue
+        vistos.add(u.keep_id)
+        db.session.execute(text('UPDATE public.persona SET userid = :userid WHERE personaid = :id'),
+                           {'userid': u.userid, 'id': u.keep_id})
+
+    ahora = datetime.utcnow()
+    aplicados = [f.candidatoid for f in filas]
+    db.session.execute(text("""
+        UPDATE public.persona_merge_candidato
+        SET estado = 'aplicado', resuelto_at = :ahora
+        WHERE candidatoid = ANY(:ids)
+    """), {'ids': aplicados, 'ahora': ahora})
+    # Otros pares pendientes que mencionan personas eliminadas ya no son válidos
+    db.session.execute(text("""
+        UPDATE public.persona_merge_candidato
+        SET estado = 'descartado', resuelto_at = :ahora
+        WHERE estado = 'pendiente'
+          AND (personaid_a = ANY(:drops) OR personaid_b = ANY(:drops))
+    """), {'drops': drops, 'ahora': ahora})
+
+    return {'aplicados': aplicados, 'personas_eliminadas': eliminadas, 'reservas_actualizadas': reservas}
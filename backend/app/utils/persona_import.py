@@ -0,0 +1,186 @@
+"""Importación masiva de personas (padrones parroquiales) desde CSV.
+
+Flujo:
+  1. El CSV se lee en streaming y se valida por bloques (PERSONA_IMPORT_CHUNK filas).
+  2. Las filas válidas se cargan con COPY a una tabla temporal de staging.
+  3. Un único INSERT ... SELECT fusiona el staging con `persona`, deduplicando por
+     nombre normalizado + fecha de nacimiento + parroquia (índice idx_persona_dedupe).
+  4. Se devuelve el resultado de cada fila del archivo.
+
+Todo ocurre en una sola transacción; el commit lo hace quien llama.
+"""
+import csv
+import io
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import text
+from app import db
+from app.utils.normalize import normalize_person_name
+
+COLUMNAS = ['per_nombres', 'per_apellidos', 'per_domicilio', 'per_telefono', 'fecha_nacimiento', 'parroquiaid']
+REQUERIDAS = ['per_nombres', 'per_apellidos', 'fecha_nacimiento']
+FORMATOS_FECHA = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y')
+
+# Resultados posibles por fila
+CREADA = 'creada'
+EXISTENTE = 'existente'                     # ya estaba registrada en persona
+DUPLICADA_ARCHIVO = 'duplicada_en_archivo'  # repetida dentro del mismo CSV
+ERROR = 'error'
+
+
+def parse_fecha(valor):
+    for fmt in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(valor, fmt).date()
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def validate_row(row, parroquias_validas, parroquiaid_defecto=None):
+    """Valida una fila del CSV. Devuelve (fila_limpia, None) o (None, mensaje_error)"""
+    datos = {k: (row.get(k) or '').strip() for k in COLUMNAS}
+    faltantes = [k for k in REQUERIDAS if not datos[k]]
+    if faltantes:
+        return None, f"Campos requeridos vacíos: {', '.join(faltantes)}"
+
+    fecha = parse_fecha(datos['fecha_nacimiento'])
+    if not fecha:
+        return None, 'fecha_nacimiento inválida'
+
+    parroquiaid = datos['parroquiaid'] or parroquiaid_defecto
+    try:
+        parroquiaid = int(parroquiaid)
+    except (TypeError, ValueError):
+        return None, 'parroquiaid requerido'
+    if parroquiaid not in parroquias_validas:
+        return None, f'La parroquia {parroquiaid} no existe'
+
+    return {
+        'per_nombres': datos['per_nombres'],
+        'per_apellidos': datos['per_apellidos'],
+        'per_domicilio': datos['per_domicilio'] or None,
+        'per_telefono': datos['per_telefono'] or None,
+        'fecha_nacimiento': fecha,
+        'parroquiaid': parroquiaid,
+        'nombre_norm': normalize_person_name(datos['per_nombres'], datos['per_apellidos'])
+    }, None
+
+
+def _copy_chunk(cursor, chunk):
+    """Carga un bloque de filas válidas al staging con COPY"""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for fila, d in chunk:
+        writer.writerow([
+            fila, d['per_nombres'], d['per_apellidos'], d['per_domicilio'], d['per_telefono'],
+            d['fecha_nacimiento'].isoformat(), d['parroquiaid'], d['nombre_norm']
+        ])
+    buf.seek(0)
+    cursor.copy_expert("""
+        COPY persona_import_stage
+            (fila, per_nombres, per_apellidos, per_domicilio, per_telefono, fecha_nacimiento, parroquiaid, nombre_norm)
+        FROM STDIN WITH (FORMAT csv)
+    """, buf)
+
+
+def import_personas_csv(stream, parroquiaid_defecto=None):
+    """Importa personas desde un stream de texto CSV (con cabecera).
+
+    Devuelve {'resumen': {...}, 'filas': [{'fila', 'estado', 'personaid', 'error'}]}
+    """
+    chunk_size = current_app.config.get('PERSONA_IMPORT_CHUNK', 5000)
+
+    # Serializa importaciones concurrentes para que la deduplicación sea consistente
+    db.session.execute(text("SELECT pg_advisory_xact_lock(hashtext('persona_import'))"))
+    db.session.execute(text("""
+        CREATE TEMP TABLE persona_import_stage (
+          fila             INTEGER PRIMARY KEY,
+          per_nombres      VARCHAR NOT NULL,
+          per_apellidos    VARCHAR NOT NULL,
+          per_domicilio    VARCHAR,
+          per_telefono     VARCHAR,
+          fecha_nacimiento DATE NOT NULL,
+          parroquiaid      INTEGER NOT NULL,
+          nombre_norm      TEXT NOT NULL
+        ) ON COMMIT DROP
+    """))
+    parroquias_validas = {
+        r.parroquiaid for r in db.session.execute(text('SELECT parroquiaid FROM public.parroquia'))
+    }
+
+    cursor = db.session.connection().connection.cursor()
+    reader = csv.DictReader(stream)
+    if reader.fieldnames:
+        reader.fieldnames = [(f or '').strip().lower() for f in reader.fieldnames]
+
+    errores = {}
+    chunk = []
+    total = 0
+    for fila, row in enumerate(reader, start=2):  # fila 1 = cabecera
+        total += 1
+        limpio, error = validate_row(row, parroquias_validas, parroquiaid_defecto)
+        if error:
+            errores[fila] = error
+            continue
+        chunk.append((fila, limpio))
+        if len(chunk) >= chunk_size:
+            _copy_chunk(cursor, chunk)
+            chunk = []
+    if chunk:
+        _copy_chunk(cursor, chunk)
+
+    db.session.execute(text('ANALYZE persona_import_stage'))
+
+    # Fusión en un solo statement: primera aparición de cada clave que no exista ya
+    insertadas = db.session.execute(text("""
+        WITH candidatas AS (
+            SELECT DISTINCT ON (nombre_norm, fecha_nacimiento, parroquiaid) *
+            FROM persona_import_stage
+            ORDER BY nombre_norm, fecha_nacimiento, parroquiaid, fila
+        )
+        INSERT INTO public.persona (per_nombres, per_apellidos, per_domicilio, per_telefono, fecha_nacimiento, parroquiaid)
+        SELECT c.per_nombres, c.per_apellidos, c.per_domicilio, c.per_telefono, c.fecha_nacimiento, c.parroquiaid
+        FROM candidatas c
+        WHERE NOT EXISTS (
+            SELECT 1 FROM public.persona p
+            WHERE persona_nombre_norm(p.per_nombres, p.per_apellidos) = c.nombre_norm
+              AND p.fecha_nacimiento = c.fecha_nacimiento
+              AND p.parroquiaid = c.parroquiaid
+        )
+        ORDER BY c.fila
+        RETURNING personaid
+    """)).fetchall()
+    nuevas = {r.personaid for r in insertadas}
+
+    # Resultado por fila: a qué persona quedó asociada y si es la primera de su clave
+    resultado = db.session.execute(text("""
+        SELECT
+            s.fila,
+            m.personaid,
+            s.fila = MIN(s.fila) OVER (PARTITION BY s.nombre_norm, s.fecha_nacimiento, s.parroquiaid) AS primera
+        FROM persona_import_stage s
+        CROSS JOIN LATERAL (
+            SELECT p.personaid FROM public.persona p
+            WHERE persona_nombre_norm(p.per_nombres, p.per_apellidos) = s.nombre_norm
+              AND p.fecha_nacimiento = s.fecha_nacimiento
+              AND p.parroquiaid = s.parroquiaid
+            ORDER BY p.personaid
+            LIMIT 1
+        ) m
+    """)).fetchall()
+
+    filas = [{'fila': f, 'estado': ERROR, 'personaid': None, 'error': e} for f, e in errores.items()]
+    for r in resultado:
+        if r.personaid in nuevas:
+            estado = CREADA if r.primera else DUPLICADA_ARCHIVO
+        else:
+            estado = EXISTENTE
+        filas.append({'fila': r.fila, 'estado': estado, 'personaid': r.personaid, 'error': None})
+    filas.sort(key=lambda f: f['fila'])
+
+    resumen = {'total': total, CREADA: 0, EXISTENTE: 0, DUPLICADA_ARCHIVO: 0, ERROR: 0}
+    for f in filas:
+        resumen[f['estado']] += 1
+    return {'resumen': resumen, 'filas': filas}
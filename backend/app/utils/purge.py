@@ -0,0 +1,75 @@
+"""Purga por lotes de actos y horarios con borrado lógico (deleted_at).
+
+delete_acto / delete_horario sólo marcan deleted_at y responden al instante. Aquí se borra
+lo marcado en orden reservas → horarios → actos, de a `lote` filas y con un commit por lote,
+así ninguna transacción retiene bloqueos sobre miles de reservas (los triggers de contadores
+y los FK trabajan sobre lotes acotados). Las filas se ubican por (id, h_fecha): con las tablas
+particionadas cada borrado va directo a la partición de su mes. Las colas usan los índices parciales
+idx_horario_borrados / idx_actoliturgico_borrados.
+"""
+import time
+
+from sqlalchemy import text
+from app import db
+
+
+def _borrar_por_lotes(sql, lote, pausa):
+    total = 0
+    while True:
+        borrados = db.session.execute(text(sql), {'lote': lote}).rowcount
+        db.session.commit()
+        total += borrados
+        if borrados < lote:
+            return total
+        time.sleep(pausa)
+
+
+def purge_deleted(lote=1000, pausa=0.0):
+    """Borra lo marcado con deleted_at. Devuelve {'horarios_marcados', 'reservas', 'horarios', 'actos'}."""
+    # Horarios creados después de borrar su acto: se marcan para que sigan el mismo camino
+    marcados = db.session.execute(text("""
+        UPDATE public.horario h
+        SET deleted_at = a.deleted_at
+        FROM public.actoliturgico a
+        WHERE a.actoliturgicoid = h.actoliturgicoid
+          AND a.deleted_at IS NOT NULL
+          AND h.deleted_at IS NULL
+    """)).rowcount
+    db.session.commit()
+
+    reservas = _borrar_por_lotes("""
+        DELETE FROM public.reserva
+        WHERE (reservaid, h_fecha) IN (
+            SELECT r.reservaid, r.h_fecha
+            FROM public.horario h
+            JOIN public.reserva r ON r.horarioid = h.horarioid AND r.h_fecha = h.h_fecha
+            WHERE h.deleted_at IS NOT NULL
+            LIMIT :lote
+        )
+    """, lote, pausa)
+
+    horarios = _borrar_por_lotes("""
+        DELETE FROM public.horario
+        WHERE (horarioid, h_fecha) IN (
+            SELECT h.horarioid, h.h_fecha
+            FROM public.horario h
+            WHERE h.deleted_at IS NOT NULL
+              AND NOT EXISTS (
+                  SELECT 1 FROM public.reserva r WHERE r.horarioid = h.horarioid AND r.h_fecha = h.h_fecha
+              )
+            LIMIT :lote
+        )
+    """, lote, pausa)
+
+    actos = _borrar_por_lotes("""
+        DELETE FROM public.actoliturgico
+        WHERE actoliturgicoid IN (
+            SELECT a.actoliturgicoid
+            FROM public.actoliturgico a
+            WHERE a.deleted_at IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM public.horario h WHERE h.actoliturgicoid = a.actoliturgicoid)
+            LIMIT :lote
+        )
+    """, lote, pausa)
+
+    return {'horarios_marcados': marcados, 'reservas': reservas, 'horarios': horarios, 'actos': actos}
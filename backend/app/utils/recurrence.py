@@ -0,0 +1,125 @@
+"""Motor de recurrencias: expande reglas de `horario_recurrencia` en filas de `horario`.
+
+Frecuencias:
+  - semanal: cada `intervalo` semanas en `dia_semana`, contando desde la semana de fecha_inicio
+  - mensual: el n-ésimo `dia_semana` del mes (`semana_mes` 1..5, o -1 = último)
+Las fechas de `excepciones` se omiten, igual que los días cuyo tiempo o fiesta litúrgica
+está en `omitir_liturgia` (p. ej. ['triduo'] o ['viernes_santo', 'navidad']): la
+clasificación sale del año litúrgico memorizado (app/utils/liturgical_year.py).
+
+Todas las fechas de todas las reglas se insertan con un único INSERT ... SELECT FROM unnest
+con ON CONFLICT DO NOTHING, que cubre tanto el índice único (actoliturgicoid, h_fecha, h_hora)
+como la restricción de exclusión horario_sin_solape (o la de cada partición mensual, que
+ensure_partitions crea antes si falta): expandir dos veces el mismo horizonte no
+duplica horarios, y las ocurrencias que se cruzan con otro horario de la parroquia (creado a
+mano o por otra regla) se omiten.
+"""
+import calendar
+from datetime import timedelta
+
+from flask import current_app
+from sqlalchemy import text
+from app import db
+from app.utils.liturgical_year import matches_any
+from app.utils.partitions import ensure_partitions, max_horario_date
+
+FRECUENCIAS = ('semanal', 'mensual')
+
+
+def _nth_weekday(anio, mes, dia_semana, n):
+    """Fecha del n-ésimo dia_semana del mes (n=-1: último) o None si no existe"""
+    semanas = calendar.Calendar().monthdatescalendar(anio, mes)
+    dias = [d for semana in semanas for d in semana if d.month == mes and d.weekday() == dia_semana]
+    if n == -1:
+        return dias[-1]
+    return dias[n - 1] if n <= len(dias) else None
+
+
+def expand_rule(regla, desde, hasta, trasladar=True):
+    """Fechas (ordenadas) que genera una regla dentro de [desde, hasta]"""
+    inicio = max(desde, regla.fecha_inicio)
+    fin = min(hasta, regla.fecha_fin) if regla.fecha_fin else hasta
+    if fin < inicio:
+        return []
+    excepciones = set(regla.excepciones or [])
+    fechas = []
+
+    if regla.frecuencia == 'semanal':
+        paso = 7 * (regla.intervalo or 1)
+        # Primera ocurrencia de la regla (desde fecha_inicio) y salto al rango pedido
+        primera = regla.fecha_inicio + timedelta(days=(regla.dia_semana - regla.fecha_inicio.weekday()) % 7)
+        if primera < inicio:
+            saltos = -(-(inicio - primera).days // paso)
+            primera += timedelta(days=saltos * paso)
+        fecha = primera
+        while fecha <= fin:
+            if fecha not in excepciones:
+                fechas.append(fecha)
+            fecha += timedelta(days=paso)
+
+    elif regla.frecuencia == 'mensual':
+        anio, mes = inicio.year, inicio.month
+        while (anio, mes) <= (fin.year, fin.month):
+            fecha = _nth_weekday(anio, mes, regla.dia_semana, regla.semana_mes)
+            if fecha and inicio <= fecha <= fin and fecha not in excepciones:
+                fechas.append(fecha)
+            anio, mes = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+
+    omitir = set(regla.omitir_liturgia or [])
+    if omitir:
+        fechas = [f for f in fechas if not matches_any(f, omitir, trasladar)]
+    return fechas
+
+
+def load_rules(parroquiaid=None, recurrencia_ids=None):
+    """Reglas activas de actos activos y no borrados (opcionalmente de una parroquia o ids concretos)"""
+    where = ['r.activo', 'a.act_estado = TRUE', 'a.deleted_at IS NULL']
+    params = {}
+    if parroquiaid:
+        where.append('a.parroquiaid = :parroquiaid')
+        params['parroquiaid'] = parroquiaid
+    if recurrencia_ids:
+        where.append('r.recurrenciaid = ANY(:ids)')
+        params['ids'] = list(recurrencia_ids)
+    return db.session.execute(text(f"""
+        SELECT r.recurrenciaid, r.actoliturgicoid, r.frecuencia, r.dia_semana, r.semana_mes,
+               r.intervalo, r.h_hora, r.fecha_inicio, r.fecha_fin, r.excepciones, r.omitir_liturgia
+        FROM public.horario_recurrencia r
+        JOIN public.actoliturgico a ON a.actoliturgicoid = r.actoliturgicoid
+        WHERE {' AND '.join(where)}
+    """), params).fetchall()
+
+
+def expand_recurrences(desde, hasta, parroquiaid=None, recurrencia_ids=None):
+    """Genera los horarios de las reglas en [desde, hasta].
+
+    Devuelve {'reglas': n, 'generados': n, 'creados': n, 'fechas': set(fechas creadas)}.
+    El commit lo hace quien llama. `hasta` se recorta a max_horario_date(): las fechas
+    posteriores salen en expansiones de días siguientes.
+    """
+    hasta = min(hasta, max_horario_date())
+    reglas = load_rules(parroquiaid, recurrencia_ids)
+    trasladar = current_app.config.get('LITURGIA_TRASLADAR_A_DOMINGO', True)
+    actos, fechas, horas = [], [], []
+    for regla in reglas:
+        for fecha in expand_rule(regla, desde, hasta, trasladar):
+            actos.append(regla.actoliturgicoid)
+            fechas.append(fecha)
+            horas.append(regla.h_hora)
+
+    creados = []
+    if actos:
+        ensure_partitions(fechas)
+        creados = db.session.execute(text("""
+            INSERT INTO public.horario (actoliturgicoid, h_fecha, h_hora)
+            SELECT * FROM unnest(CAST(:actos AS INTEGER[]), CAST(:fechas AS DATE[]), CAST(:horas AS TIME[]))
+            ON CONFLICT DO NOTHING
+            RETURNING h_fecha
+        """), {'actos': actos, 'fechas': fechas, 'horas': horas}).fetchall()
+
+    return {
+        'reglas': len(reglas),
+        'generados': len(actos),
+        'creados': len(creados),
+        'fechas': {r.h_fecha for r in creados}
+    }
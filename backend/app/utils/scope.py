@@ -0,0 +1,94 @@
+"""Alcance por parroquia del usuario autenticado.
+
+Cada usuario ve sólo los datos de su parroquia (`persona.parroquiaid` de su persona).
+Los roles activos con permiso 'seguridad' y las cuentas sin persona asociada ven toda la
+diócesis.
+
+La parroquia se resuelve una vez por token (jti) y se guarda en un cache pequeño en
+memoria hasta que el token expira, así las listas no agregan una consulta extra.
+"""
+import threading
+import time
+
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from sqlalchemy import text
+from app import db
+
+PERMISO_GLOBAL = 'seguridad'
+MAX_ENTRADAS = 5000
+
+_lock = threading.Lock()
+_cache = {}  # jti -> (expira_epoch, user_id, parroquiaid | None)
+
+SIN_RESTRICCION = None
+
+
+def _lookup_scope(user_id):
+    row = db.session.execute(text("""
+        SELECT per.parroquiaid, r.permissions
+        FROM public.users u
+        LEFT JOIN public.persona per ON per.userid = u.id
+        LEFT JOIN public.roles r ON r.name = u.role AND r.is_active
+        WHERE u.id = :id
+    """), {'id': user_id}).fetchone()
+    if not row or row.parroquiaid is None:
+        return SIN_RESTRICCION
+    if PERMISO_GLOBAL in (row.permissions or []):
+        return SIN_RESTRICCION
+    return row.parroquiaid
+
+
+def get_parish_scope():
+    """parroquiaid al que está restringido el usuario actual, o None si ve todo"""
+    claims = get_jwt()
+    jti = claims.get('jti')
+    ahora = time.time()
+    with _lock:
+        hit = _cache.get(jti)
+        if hit and hit[0] > ahora:
+            return hit[2]
+
+    user_id = int(get_jwt_identity())
+    scope = _lookup_scope(user_id)
+    with _lock:
+        if len(_cache) >= MAX_ENTRADAS:
+            for k in [k for k, v in _cache.items() if v[0] <= ahora]:
+                del _cache[k]
+            if len(_cache) >= MAX_ENTRADAS:
+                _cache.clear()
+        _cache[jti] = (claims.get('exp', ahora + 300), user_id, scope)
+    return scope
+
+
+def resolve_parroquia_filter(requested=None):
+    """Parroquia a filtrar combinando el parámetro pedido con el alcance del usuario.
+
+    Un usuario restringido siempre queda en su parroquia, pida lo que pida.
+    """
+    scope = get_parish_scope()
+    if scope is SIN_RESTRICCION:
+        return requested
+    return scope
+
+
+def invalidate_parish_scope(user_id=None):
+    """Olvida el alcance cacheado (de un usuario o de todos) tras cambiar persona/rol"""
+    with _lock:
+        if user_id is None:
+            _cache.clear()
+            return
+        for k in [k for k, v in _cache.items() if v[1] == user_id]:
+            del _cache[k]
+
+
+def invalidate_role_scope(role_names):
+    """Olvida el alcance cacheado de los usuarios de esos roles (cambio de permisos,
+    estado o nombre del rol)"""
+    user_ids = {row.id for row in db.session.execute(
+        text('SELECT id FROM public.users WHERE role = ANY(:roles)'), {'roles': list(role_names)}
+    )}
+    if not user_ids:
+        return
+    with _lock:
+        for k in [k for k, v in _cache.items() if v[1] in user_ids]:
+            del _cache[k]
@@ -0,0 +1,98 @@
+"""Búsqueda de texto sobre actos, reservas y personas (GET /api/liturgical/search).
+
+Cada tabla guarda su documento tsvector (act_busqueda, res_busqueda, per_busqueda) con la
+configuración es_unaccent (español, sin tildes), mantenido por triggers e indexado con GIN
+(database_full.sql, sección 10). La consulta es una sola sentencia: una rama por tipo que
+usa su índice, UNION ALL, orden por relevancia y la página con LIMIT/OFFSET. El fragmento
+resaltado (ts_headline, lo más caro) se calcula sólo para las filas de la página.
+
+Los horarios no tienen texto propio: aparecen a través de sus reservas (fecha y hora del
+horario, mes y año en el documento) y de su acto.
+"""
+from sqlalchemy import text
+from app import db
+
+TIPOS = ('acto', 'reserva', 'persona')
+
+# tipo -> (SELECT, columna de parroquia, columna de fecha). Normalización 32 de ts_rank_cd
+# (rango / (rango + 1)): puntajes comparables entre tipos
+_RAMAS = {
+    'acto': ("""
+        SELECT 'acto' AS tipo, a.actoliturgicoid AS id, a.act_titulo AS titulo, a.act_nombre AS detalle,
+               a.parroquiaid, NULL::DATE AS fecha, NULL::TIME AS hora,
+               concat_ws(' ', a.act_titulo, a.act_descripcion) AS texto,
+               ts_rank_cd(a.act_busqueda, q.consulta, 32) AS rango
+        FROM public.actoliturgico a, q
+        WHERE a.act_busqueda @@ q.consulta
+          AND a.deleted_at IS NULL
+          {filtros}
+    """, 'a.parroquiaid', None),
+    'reserva': ("""
+        SELECT 'reserva', r.reservaid,
+               COALESCE(per.per_nombres || ' ' || per.per_apellidos, r.res_persona_nombre),
+               a.act_titulo, h.parroquiaid, r.h_fecha, h.h_hora, r.res_descripcion,
+               ts_rank_cd(r.res_busqueda, q.consulta, 32)
+        FROM public.reserva r
+        CROSS JOIN q
+        JOIN public.horario h ON h.horarioid = r.horarioid AND h.h_fecha = r.h_fecha
+        JOIN public.actoliturgico a ON a.actoliturgicoid = h.actoliturgicoid
+        LEFT JOIN public.persona per ON per.personaid = r.personaid
+        WHERE r.res_busqueda @@ q.consulta
+          AND h.deleted_at IS NULL
+          AND a.deleted_at IS NULL
+          {filtros}
+    """, 'h.parroquiaid', 'r.h_fecha'),
+    'persona': ("""
+        SELECT 'persona', per.personaid, per.per_nombres || ' ' || per.per_apellidos, NULL,
+               per.parroquiaid, NULL::DATE, NULL::TIME, per.per_nombres || ' ' || per.per_apellidos,
+               ts_rank_cd(per.per_busqueda, q.consulta, 32)
+        FROM public.persona per, q
+        WHERE per.per_busqueda @@ q.consulta
+          {filtros}
+    """, 'per.parroquiaid', None),
+}
+
+
+def _rama(tipo, params):
+    sql, col_parroquia, col_fecha = _RAMAS[tipo]
+    filtros = []
+    if 'parroquiaid' in params:
+        filtros.append(f'AND {col_parroquia} = :parroquiaid')
+    if col_fecha and 'desde' in params:
+        filtros.append(f'AND {col_fecha} >= :desde')
+    if col_fecha and 'hasta' in params:
+        filtros.append(f'AND {col_fecha} <= :hasta')
+    return sql.format(filtros=' '.join(filtros))
+
+
+def search(consulta, tipos=TIPOS, parroquiaid=None, desde=None, hasta=None, limit=20, offset=0):
+    """Resultados ordenados por relevancia (más `limit` + 1 para saber si hay otra página).
+
+    `consulta` usa la sintaxis de websearch_to_tsquery: palabras (todas deben aparecer),
+    "frase exacta", `or` y -excluir. desde/hasta filtran las reservas por fecha del horario.
+    """
+    params = {'q': consulta, 'limit': limit + 1, 'offset': offset}
+    if parroquiaid:
+        params['parroquiaid'] = parroquiaid
+    if desde:
+        params['desde'] = desde
+    if hasta:
+        params['hasta'] = hasta
+    ramas = '\nUNION ALL\n'.join(_rama(t, params) for t in TIPOS if t in tipos)
+
+    return db.session.execute(text(f"""
+        WITH q AS (
+            SELECT websearch_to_tsquery('public.es_unaccent', :q) AS consulta
+        )
+        SELECT
+            hits.tipo, hits.id, hits.titulo, hits.detalle, hits.parroquiaid,
+            hits.fecha, hits.hora, hits.rango,
+            ts_headline('public.es_unaccent', COALESCE(hits.texto, ''), q.consulta,
+                        'StartSel=«, StopSel=», MaxWords=25, MinWords=8') AS fragmento
+        FROM (
+            SELECT * FROM ({ramas}) todas
+            ORDER BY rango DESC, tipo, id
+            LIMIT :limit OFFSET :offset
+        ) hits, q
+        ORDER BY hits.rango DESC, hits.tipo, hits.id
+    """), params).fetchall()
@@ -0,0 +1,160 @@
+"""Índice espacial en memoria (k-d tree) para buscar parroquias cercanas.
+
+Cada worker construye su propio índice a partir de `parroquia.par_latitud/par_longitud`.
+Los puntos se proyectan a coordenadas cartesianas sobre la esfera unitaria, así la
+distancia euclidiana (cuerda) ordena igual que la distancia real sobre la Tierra y el
+árbol funciona sin problemas cerca del antimeridiano o de los polos.
+
+El índice se invalida en las escrituras de parroquias de este worker y, para ver los
+cambios hechos por otros workers, se reconstruye cuando supera SPATIAL_INDEX_TTL segundos.
+"""
+import heapq
+import math
+import threading
+import time
+
+from flask import current_app
+from app import db
+from app.models import Parroquia, Distrito
+
+RADIO_TIERRA_KM = 6371.0088
+
+
+def to_xyz(lat, lon):
+    """Convierte lat/lon en grados a un punto sobre la esfera unitaria"""
+    phi, lam = math.radians(lat), math.radians(lon)
+    cos_phi = math.cos(phi)
+    return (cos_phi * math.cos(lam), cos_phi * math.sin(lam), math.sin(phi))
+
+
+def chord_to_km(chord):
+    """Distancia de cuerda (esfera unitaria) a distancia de gran círculo en km"""
+    return 2 * RADIO_TIERRA_KM * math.asin(min(1.0, chord / 2))
+
+
+class KDTree:
+    """k-d tree estático de 3 dimensiones. `items` es una lista de (xyz, payload)"""
+
+    def __init__(self, items):
+        n = len(items)
+        self.points = [None] * n
+        self.payloads = [None] * n
+        self.left = [-1] * n
+        self.right = [-1] * n
+        self.axis = [0] * n
+        self._slot = 0
+        self.root = self._build(list(items), 0)
+        del self._slot
+
+    def __len__(self):
+        return len(self.points)
+
+    def _build(self, items, depth):
+        if not items:
+            return -1
+        axis = depth % 3
+        items.sort(key=lambda it: it[0][axis])
+        mid = len(items) // 2
+        node = self._slot
+        self._slot += 1
+        self.points[node], self.payloads[node] = items[mid]
+        self.axis[node] = axis
+        self.left[node] = self._build(items[:mid], depth + 1)
+        self.right[node] = self._build(items[mid + 1:], depth + 1)
+        return node
+
+    def nearest(self, point, k=1):
+        """Devuelve [(distancia_cuerda, payload)] de los k puntos más cercanos, ordenados"""
+        if self.root == -1 or k <= 0:
+            return []
+        heap = []  # max-heap por distancia: (-d2, node)
+        points, left, right, axes = self.points, self.left, self.right, self.axis
+        px, py, pz = point
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node == -1:
+                continue
+            x, y, z = points[node]
+            d2 = (x - px) ** 2 + (y - py) ** 2 + (z - pz) ** 2
+            if len(heap) < k:
+                heapq.heappush(heap, (-d2, node))
+            elif d2 < -heap[0][0]:
+                heapq.heapreplace(heap, (-d2, node))
+
+            axis = axes[node]
+            diff = point[axis] - points[node][axis]
+            near, far = (left[node], right[node]) if diff < 0 else (right[node], left[node])
+            # Se apila primero la rama lejana para visitar antes la cercana
+            if far != -1 and (len(heap) < k or diff * diff < -heap[0][0]):
+                stack.append(far)
+            stack.append(near)
+
+        result = sorted((-negd2, node) for negd2, node in heap)
+        return [(math.sqrt(d2), self.payloads[node]) for d2, node in result]
+
+
+# =========================================================
+# ÍNDICE DE PARROQUIAS POR WORKER
+# =========================================================
+
+_lock = threading.Lock()
+_index = None
+_built_at = 0.0
+
+
+def invalidate_parroquias_index():
+    """Marca el índice como obsoleto (llamar tras crear/editar/eliminar parroquias)"""
+    global _index
+    with _lock:
+        _index = None
+
+
+def _build_parroquias_index():
+    rows = db.session.query(
+        Parroquia.parroquiaid,
+        Parroquia.par_nombre,
+        Parroquia.par_direccion,
+        Parroquia.par_telefono1,
+        Parroquia.par_latitud,
+        Parroquia.par_longitud,
+        Distrito.dis_nombre
+    ).outerjoin(Distrito, Parroquia.distritoid == Distrito.distritoid).filter(
+        Parroquia.par_latitud.isnot(None),
+        Parroquia.par_longitud.isnot(None)
+    ).all()
+
+    items = []
+    for r in rows:
+        items.append((to_xyz(r.par_latitud, r.par_longitud), {
+            'parroquiaid': r.parroquiaid,
+            'par_nombre': r.par_nombre,
+            'par_direccion': r.par_direccion,
+            'par_telefono1': r.par_telefono1,
+            'dis_nombre': r.dis_nombre,
+            'par_latitud': r.par_latitud,
+            'par_longitud': r.par_longitud
+        }))
+    return KDTree(items)
+
+
+def get_parroquias_index():
+    """Devuelve el k-d tree de parroquias, reconstruyéndolo si está vacío o vencido"""
+    global _index, _built_at
+    ttl = current_app.config.get('SPATIAL_INDEX_TTL', 300)
+    with _lock:
+        if _index is None or (time.monotonic() - _built_at) > ttl:
+            _index = _build_parroquias_index()
+            _built_at = time.monotonic()
+        return _index
+
+
+def nearest_parroquias(lat, lon, k=5):
+    """Lista de parroquias más cercanas a (lat, lon) con su distancia en km"""
+    index = get_parroquias_index()
+    result = []
+    for chord, payload in index.nearest(to_xyz(lat, lon), k):
+        item = dict(payload)
+        item['distancia_km'] = round(chord_to_km(chord), 3)
+        result.append(item)
+    return result
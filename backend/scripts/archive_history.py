@@ -0,0 +1,81 @@
+# archive_history.py (ejecutar con: python scripts/archive_history.py [--anios N] [--lote N] [--exportar DIR])
+# Mueve a archivo_bloque los horarios y reservas de años cerrados (anteriores al 1 de enero
+# de hace N años) y los borra de las tablas vivas. Pensado para correr una vez al año (enero)
+# o a mano; es idempotente. --exportar escribe además reservas_<año>.csv.gz por año archivado.
+# Las particiones vacías que quedan no se eliminan: crear_particiones() asume un rango continuo.
+import os
+import sys
+import csv
+import gzip
+import time
+import argparse
+from datetime import date
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import text
+from app import create_app, db
+from app.utils.archive import (
+    RESERVA_ARCHIVADA_COLUMNAS, archive_closed_years, archive_summary, archived_reservas_sql,
+    retention_cutoff
+)
+
+parser = argparse.ArgumentParser(description='Archivar horarios y reservas de años cerrados')
+parser.add_argument('--anios', type=int, default=None, help='años cerrados que se conservan (por defecto ARCHIVO_RETENCION_ANIOS)')
+parser.add_argument('--lote', type=int, default=None, help='horarios por lote (por defecto ARCHIVO_LOTE)')
+parser.add_argument('--pausa', type=float, default=0.05, help='segundos de espera entre lotes')
+parser.add_argument('--exportar', metavar='DIR', default=None, help='carpeta para reservas_<año>.csv.gz')
+args = parser.parse_args()
+
+
+def tamanios():
+    return db.session.execute(text("""
+        SELECT pg_total_relation_size('public.horario') AS horario,
+               pg_total_relation_size('public.reserva') AS reserva
+    """)).fetchone()
+
+
+def exportar(carpeta):
+    """Un CSV comprimido por año del archivo; los que ya existen no se reescriben"""
+    os.makedirs(carpeta, exist_ok=True)
+    anios = [f.anio for f in archive_summary() if f.tipo == 'reserva']
+    for anio in anios:
+        ruta = os.path.join(carpeta, f'reservas_{anio}.csv.gz')
+        if os.path.exists(ruta):
+            print(f'↪️ {ruta} ya existe')
+            continue
+        params = {'desde': date(anio, 1, 1), 'hasta': date(anio, 12, 31)}
+        sql = archived_reservas_sql(RESERVA_ARCHIVADA_COLUMNAS, params) + ' ORDER BY x.h_fecha, x.reservaid'
+        with gzip.open(ruta + '.tmp', 'wt', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(RESERVA_ARCHIVADA_COLUMNAS)
+            filas = 0
+            for row in db.session.execute(text(sql), params):
+                writer.writerow(['' if v is None else v for v in row])
+                filas += 1
+        os.replace(ruta + '.tmp', ruta)
+        print(f'📤 {ruta}: {filas} reservas')
+
+
+app = create_app()
+with app.app_context():
+    anios = args.anios if args.anios is not None else app.config.get('ARCHIVO_RETENCION_ANIOS', 1)
+    lote = args.lote or app.config.get('ARCHIVO_LOTE', 1000)
+    corte = retention_cutoff(anios)
+
+    antes = tamanios()
+    inicio = time.monotonic()
+    resultado = archive_closed_years(corte, lote=lote, pausa=args.pausa)
+    despues = tamanios()
+    print(f"✅ Archivo anterior a {corte}: {resultado['horarios']} horarios y {resultado['reservas']} "
+          f"reservas en {resultado['bloques']} bloques ({time.monotonic() - inicio:.2f}s)")
+    print(f'   horario: {antes.horario / 2**20:.1f} MB → {despues.horario / 2**20:.1f} MB; '
+          f'reserva: {antes.reserva / 2**20:.1f} MB → {despues.reserva / 2**20:.1f} MB '
+          f'(el espacio se recupera con VACUUM)')
+
+    for fila in archive_summary():
+        print(f'   {fila.anio} {fila.tipo}: {fila.filas} filas en {fila.bloques} bloques, '
+              f'{fila.bytes / 2**20:.1f} MB comprimidos')
+
+    if args.exportar:
+        exportar(args.exportar)
@@ -0,0 +1,49 @@
+# backfill_horario_parroquia.py (ejecutar con: python scripts/backfill_horario_parroquia.py [--batch N])
+# Carga horario.parroquiaid desde actoliturgico en lotes cortos (un commit por lote) para no
+# bloquear la tabla, y luego crea idx_horario_vivos_parroquia_fecha con CREATE INDEX CONCURRENTLY.
+# Requiere la columna y los triggers de database_full.sql (los horarios nuevos ya llegan con
+# parroquia). Es idempotente: volver a ejecutarlo sólo corrige filas desfasadas.
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import text
+from app import create_app, db
+
+parser = argparse.ArgumentParser(description='Backfill en línea de horario.parroquiaid')
+parser.add_argument('--batch', type=int, default=5000, help='horarios por lote (por rango de horarioid)')
+parser.add_argument('--pausa', type=float, default=0.05, help='segundos de espera entre lotes')
+args = parser.parse_args()
+
+app = create_app()
+with app.app_context():
+    max_id = db.session.execute(text('SELECT COALESCE(MAX(horarioid), 0) FROM public.horario')).scalar()
+    db.session.commit()
+
+    total = 0
+    for desde in range(0, max_id + 1, args.batch):
+        actualizados = db.session.execute(text("""
+            UPDATE public.horario h
+            SET parroquiaid = a.parroquiaid
+            FROM public.actoliturgico a
+            WHERE a.actoliturgicoid = h.actoliturgicoid
+              AND h.horarioid > :desde AND h.horarioid <= :hasta
+              AND h.parroquiaid IS DISTINCT FROM a.parroquiaid
+        """), {'desde': desde, 'hasta': desde + args.batch}).rowcount
+        db.session.commit()
+        total += actualizados
+        if actualizados:
+            print(f"🔄 Horarios {desde + 1}-{desde + args.batch}: {actualizados} actualizados")
+            time.sleep(args.pausa)
+    print(f"✅ Backfill completo: {total} horarios actualizados")
+
+    # CONCURRENTLY no puede ir dentro de una transacción
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.execute(text("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_horario_vivos_parroquia_fecha
+            ON public.horario(parroquiaid, h_fecha, h_hora) WHERE deleted_at IS NULL
+        """))
+    print("✅ Índice idx_horario_vivos_parroquia_fecha disponible")
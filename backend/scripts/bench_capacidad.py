@@ -0,0 +1,183 @@
+# bench_capacidad.py (ejecutar con: python scripts/bench_capacidad.py [--clientes 200] [--capacidad 50])
+# Prueba de concurrencia del control de cupos: crea un acto + horario temporal con h_capacidad,
+# lanza N clientes en paralelo (cada uno con su propia conexión) y verifica que no se vendió
+# ningún cupo de más y que los contadores cuadran con las reservas. Dos escenarios:
+#   reservas:     todos los clientes intentan reservar a la vez
+#   reactivacion: la mitad reactiva un pago vencido (vencido -> pagado) con su reserva ya hecha
+#                 y la otra mitad reserva; los cupos liberados por los vencidos se revenden
+# Al terminar borra el acto de prueba (los horarios y reservas se borran en cascada) y sus pagos.
+import os
+import sys
+import time
+import argparse
+import threading
+from datetime import date, timedelta, time as dtime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.pool import NullPool
+from app import create_app
+
+parser = argparse.ArgumentParser(description='Benchmark de reservas concurrentes con cupos')
+parser.add_argument('--clientes', type=int, default=200, help='clientes en paralelo')
+parser.add_argument('--capacidad', type=int, default=50, help='cupos del horario de prueba')
+parser.add_argument('--intentos', type=int, default=1, help='reservas que intenta cada cliente')
+parser.add_argument('--escenario', choices=['reservas', 'reactivacion', 'todos'], default='todos')
+args = parser.parse_args()
+
+app = create_app()
+engine = create_engine(app.config['SQLALCHEMY_DATABASE_URI'], poolclass=NullPool)
+# Dentro del horizonte de particiones (crear_particiones no crea décadas de meses vacíos)
+fecha = date.today() + timedelta(days=365)
+
+
+def crear_horario(conn, acto_id, hora):
+    return conn.execute(text("""
+        INSERT INTO public.horario (actoliturgicoid, h_fecha, h_hora, h_capacidad)
+        VALUES (:acto, :fecha, :hora, :capacidad)
+        RETURNING horarioid
+    """), {'acto': acto_id, 'fecha': fecha, 'hora': hora, 'capacidad': args.capacidad}).scalar()
+
+
+def reservar(conn, horario_id, nombre):
+    conn.execute(text("""
+        INSERT INTO public.reserva (horarioid, h_fecha, res_persona_nombre)
+        VALUES (:horario, :fecha, :nombre)
+    """), {'horario': horario_id, 'fecha': fecha, 'nombre': nombre})
+
+
+def reactivar(conn, pago_id):
+    conn.execute(text("""
+        UPDATE public.pago SET pago_estado = 'pagado', pago_confirmado = NOW() WHERE pagoid = :id
+    """), {'id': pago_id})
+
+
+def correr(trabajos):
+    """Ejecuta trabajos [(funcion, *args)] a la vez, uno por cliente; devuelve (resultados, latencias, segundos)"""
+    resultados = {'ok': 0, 'sin_cupo': 0, 'error': 0}
+    latencias = []
+    lock = threading.Lock()
+    barrera = threading.Barrier(len(trabajos))
+
+    def cliente(trabajo):
+        with engine.connect() as conn:
+            barrera.wait()  # todos los clientes arrancan a la vez
+            funcion, *parametros = trabajo
+            inicio = time.perf_counter()
+            try:
+                with conn.begin():
+                    funcion(conn, *parametros)
+                estado = 'ok'
+            except IntegrityError as e:
+                diag = getattr(e.orig, 'diag', None)
+                estado = 'sin_cupo' if getattr(diag, 'constraint_name', None) == 'horario_capacidad' else 'error'
+            except Exception:
+                estado = 'error'
+            with lock:
+                resultados[estado] += 1
+                latencias.append(time.perf_counter() - inicio)
+
+    hilos = [threading.Thread(target=cliente, args=(t,)) for t in trabajos]
+    inicio = time.perf_counter()
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    return resultados, latencias, time.perf_counter() - inicio
+
+
+def contadores(horario_id):
+    with engine.connect() as conn:
+        return conn.execute(text("""
+            SELECT h.reservas_total, h.reservas_activas,
+                   COUNT(r.reservaid) AS reales,
+                   COUNT(r.reservaid) FILTER (WHERE reserva_pago_activo(r.pagoid)) AS reales_activas
+            FROM public.horario h
+            LEFT JOIN public.reserva r ON r.horarioid = h.horarioid AND r.h_fecha = h.h_fecha
+            WHERE h.horarioid = :id
+            GROUP BY h.horarioid, h.reservas_total, h.reservas_activas
+        """), {'id': horario_id}).fetchone()
+
+
+def informe(titulo, resultados, latencias, total, fila):
+    latencias.sort()
+    p50 = latencias[len(latencias) // 2] * 1000
+    p99 = latencias[max(int(len(latencias) * 0.99) - 1, 0)] * 1000
+    print(f"🧪 {titulo}")
+    print(f"   ✅ OK: {resultados['ok']}  ⛔ Sin cupo: {resultados['sin_cupo']}  ❌ Errores: {resultados['error']}")
+    print(f"   ⏱️ Total {total:.2f}s, p50 {p50:.1f} ms, p99 {p99:.1f} ms")
+    print(f"   📊 Contadores: total={fila.reservas_total} activas={fila.reservas_activas} "
+          f"reservas reales={fila.reales} activas reales={fila.reales_activas}")
+
+
+def escenario_reservas(acto_id):
+    with engine.begin() as conn:
+        horario_id = crear_horario(conn, acto_id, dtime(7, 0))
+    trabajos = [(reservar, horario_id, f'cliente {n}-{i}')
+                for n in range(args.clientes) for i in range(args.intentos)]
+    resultados, latencias, total = correr(trabajos)
+    fila = contadores(horario_id)
+    informe(f'Reservas: {len(trabajos)} intentos, capacidad {args.capacidad}', resultados, latencias, total, fila)
+
+    esperadas = min(args.capacidad, len(trabajos))
+    return (resultados['ok'] == esperadas == fila.reales == fila.reservas_activas == fila.reservas_total
+            and resultados['error'] == 0)
+
+
+def escenario_reactivacion(acto_id, pagos):
+    # La mitad de los clientes tiene una reserva con el pago vencido (no ocupa cupo)
+    vencidas = args.clientes // 2
+    with engine.begin() as conn:
+        horario_id = crear_horario(conn, acto_id, dtime(9, 0))
+        for n in range(vencidas):
+            pago_id = conn.execute(text("""
+                INSERT INTO public.pago (pago_medio, pago_monto, pago_estado, pago_descripcion)
+                VALUES ('Efectivo', 0, 'vencido', 'Benchmark de cupos')
+                RETURNING pagoid
+            """)).scalar()
+            pagos.append(pago_id)
+            conn.execute(text("""
+                INSERT INTO public.reserva (horarioid, h_fecha, res_persona_nombre, pagoid)
+                VALUES (:horario, :fecha, :nombre, :pago)
+            """), {'horario': horario_id, 'fecha': fecha, 'nombre': f'vencida {n}', 'pago': pago_id})
+
+    trabajos = [(reactivar, p) for p in pagos[-vencidas:]]
+    trabajos += [(reservar, horario_id, f'cliente {n}') for n in range(args.clientes - vencidas)]
+    resultados, latencias, total = correr(trabajos)
+    fila = contadores(horario_id)
+    informe(f'Reactivación: {vencidas} pagos vencidos reactivados + {args.clientes - vencidas} reservas, '
+            f'capacidad {args.capacidad}', resultados, latencias, total, fila)
+
+    esperadas = min(args.capacidad, len(trabajos))
+    return (resultados['ok'] == esperadas == fila.reales_activas == fila.reservas_activas
+            and fila.reservas_total == fila.reales
+            and resultados['error'] == 0)
+
+
+pagos = []
+with engine.begin() as conn:
+    conn.execute(text('SELECT crear_particiones(:fecha)'), {'fecha': fecha})
+    acto_id = conn.execute(text("""
+        INSERT INTO public.actoliturgico (act_nombre, act_titulo, act_estado)
+        VALUES ('misa', 'Benchmark de cupos', FALSE)
+        RETURNING actoliturgicoid
+    """)).scalar()
+
+try:
+    print(f"👥 {args.clientes} clientes en paralelo")
+    correcto = True
+    if args.escenario in ('reservas', 'todos'):
+        correcto = escenario_reservas(acto_id) and correcto
+    if args.escenario in ('reactivacion', 'todos'):
+        correcto = escenario_reactivacion(acto_id, pagos) and correcto
+    print("✅ Sin sobreventa y contadores consistentes" if correcto else "❌ Inconsistencia detectada")
+    exit_code = 0 if correcto else 1
+finally:
+    with engine.begin() as conn:
+        conn.execute(text('DELETE FROM public.actoliturgico WHERE actoliturgicoid = :id'), {'id': acto_id})
+        if pagos:
+            conn.execute(text('DELETE FROM public.pago WHERE pagoid = ANY(:ids)'), {'ids': pagos})
+
+sys.exit(exit_code)
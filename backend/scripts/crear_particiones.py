@@ -0,0 +1,33 @@
+# crear_particiones.py (ejecutar con: python scripts/crear_particiones.py [--meses N])
+# Crea las particiones mensuales de horario y reserva que falten hasta N meses adelante.
+# Pensado para correr a diario o semanal (cron): es idempotente. Sin particionar
+# (scripts/partition_horario_reserva.py) no hace nada.
+import os
+import sys
+import argparse
+from datetime import date
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import text
+from app import create_app, db
+from app.utils.partitions import is_partitioned, list_partitions, month_start
+
+parser = argparse.ArgumentParser(description='Crear particiones futuras de horario y reserva')
+parser.add_argument('--meses', type=int, default=None, help='meses por adelantado (por defecto PARTICIONES_MESES_ADELANTE)')
+args = parser.parse_args()
+
+app = create_app()
+with app.app_context():
+    if not is_partitioned():
+        print('ℹ️ horario no está particionado; nada que hacer')
+        sys.exit(0)
+
+    meses = args.meses or app.config.get('PARTICIONES_MESES_ADELANTE', 36)
+    antes = len(list_partitions('horario'))
+    horizonte = db.session.execute(
+        text('SELECT crear_particiones(:hasta)'), {'hasta': month_start(date.today(), meses)}
+    ).scalar()
+    db.session.commit()
+    creadas = len(list_partitions('horario')) - antes
+    print(f'✅ {creadas} meses nuevos; particiones creadas hasta {horizonte}')
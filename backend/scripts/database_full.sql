@@ -20,6 +20,18 @@
 
 -- Extensiones necesarias
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
+CREATE EXTENSION IF NOT EXISTS btree_gist; -- índices GiST que combinan parroquiaid con rangos de tiempo
+CREATE EXTENSION IF NOT EXISTS unaccent;   -- búsqueda de texto sin tildes
+
+-- Configuración de búsqueda: español (stemming, stopwords) ignorando tildes ('Pérez' = 'perez')
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'es_unaccent') THEN
+    CREATE TEXT SEARCH CONFIGURATION public.es_unaccent (COPY = pg_catalog.spanish);
+    ALTER TEXT SEARCH CONFIGURATION public.es_unaccent
+      ALTER MAPPING FOR hword, hword_part, word WITH public.unaccent, pg_catalog.spanish_stem;
+  END IF;
+END$$;
 
 -- =========================================================
 -- 1) TABLAS DEL SISTEMA DE SEGURIDAD
@@ -111,7 +123,19 @@ CREATE TABLE IF NOT EXISTS public.parroquia (
   par_direccion  VARCHAR NOT NULL,
   distritoid     INTEGER NOT NULL REFERENCES public.distrito(distritoid),
   par_telefono1  VARCHAR NOT NULL,
-  par_telefono2  VARCHAR
+  par_telefono2  VARCHAR,
+  par_latitud    DOUBLE PRECISION, -- geocodificada en backend (app/utils/geocoding.py)
+  par_longitud   DOUBLE PRECISION
+);
+
+-- Cache persistente de geocodificación (clave: dirección normalizada)
+-- latitud/longitud NULL = el proveedor no encontró la dirección (cache negativo)
+CREATE TABLE IF NOT EXISTS public.geocode_cache (
+  direccion_norm  VARCHAR(500) PRIMARY KEY,
+  latitud         DOUBLE PRECISION,
+  longitud        DOUBLE PRECISION,
+  proveedor       VARCHAR(30) NOT NULL,
+  created_at      TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW()
 );
 
 -- Personas (1:1 con users por userid; pertenece a parroquia)
@@ -124,10 +148,29 @@ CREATE TABLE IF NOT EXISTS public.persona (
   per_telefono     VARCHAR,
   fecha_nacimiento DATE    NOT NULL,
   parroquiaid      INTEGER NOT NULL REFERENCES public.parroquia(parroquiaid) ON DELETE RESTRICT,
+  per_busqueda     TSVECTOR, -- búsqueda de texto, mantenida por triggers (sección 10)
   created_at       TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
   updated_at       TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW()
 );
 
+-- Candidatos a fusión de personas duplicadas (job scripts/dedupe_personas.py)
+-- Sin FK a persona: las filas aplicadas quedan como auditoría tras borrar el duplicado
+CREATE TABLE IF NOT EXISTS public.persona_merge_candidato (
+  candidatoid   INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+  personaid_a   INTEGER NOT NULL, -- se conserva
+  personaid_b   INTEGER NOT NULL, -- duplicado que se fusiona en A
+  parroquiaid   INTEGER NOT NULL,
+  puntaje       NUMERIC(4,3) NOT NULL,
+  clave_bloque  VARCHAR(255) NOT NULL,
+  estado        VARCHAR(15) NOT NULL DEFAULT 'pendiente'
+                CHECK (estado IN ('pendiente', 'aplicado', 'descartado')),
+  created_at    TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
+  resuelto_at   TIMESTAMP WITHOUT TIME ZONE,
+  CONSTRAINT uq_persona_merge_par UNIQUE (personaid_a, personaid_b)
+);
+CREATE INDEX IF NOT EXISTS idx_persona_merge_estado ON public.persona_merge_candidato(estado, parroquiaid);
+CREATE INDEX IF NOT EXISTS idx_persona_parroquia ON public.persona(parroquiaid);
+
 -- =========================================================
 -- 4) TABLAS DEL SISTEMA LITÚRGICO
 -- =========================================================
@@ -140,6 +183,8 @@ CREATE TABLE IF NOT EXISTS public.actoliturgico (
   act_titulo       VARCHAR(200) NOT NULL, -- ej. Misa Dominical, Misa Señor de los Milagros
   act_descripcion  TEXT,
   act_estado       BOOLEAN NOT NULL DEFAULT TRUE,
+  act_busqueda     TSVECTOR, -- búsqueda de texto, mantenida por triggers (sección 10)
+  deleted_at       TIMESTAMP WITHOUT TIME ZONE, -- borrado lógico (scripts/purge_deleted.py)
   created_at       TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
   updated_at       TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW()
 );
@@ -148,17 +193,79 @@ CREATE TABLE IF NOT EXISTS public.actoliturgico (
 CREATE TABLE IF NOT EXISTS public.horario (
   horarioid        INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
   actoliturgicoid  INTEGER NOT NULL REFERENCES public.actoliturgico(actoliturgicoid) ON DELETE CASCADE,
+  parroquiaid      INTEGER, -- copia de actoliturgico.parroquiaid, mantenida por triggers (sección 10)
   h_fecha          DATE NOT NULL, -- fecha específica del horario
   h_hora           TIME NOT NULL, -- hora específica del horario
+  reservas_total   INTEGER NOT NULL DEFAULT 0, -- contadores mantenidos por triggers (sección 10)
+  reservas_activas INTEGER NOT NULL DEFAULT 0, -- reservas con pago pendiente/pagado o sin pago
+  h_capacidad      INTEGER CHECK (h_capacidad >= 0), -- cupos; NULL = sin límite
+  h_duracion       SMALLINT NOT NULL DEFAULT 60 CHECK (h_duracion > 0), -- minutos que ocupa el acto
+  -- Intervalo [inicio, fin) que ocupa el horario (disponibilidad, índice GiST en sección 10)
+  h_rango          TSRANGE GENERATED ALWAYS AS
+                   (tsrange(h_fecha + h_hora, h_fecha + h_hora + h_duracion * INTERVAL '1 minute')) STORED,
+  deleted_at       TIMESTAMP WITHOUT TIME ZONE, -- borrado lógico (scripts/purge_deleted.py)
   created_at       TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
   updated_at       TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW()
 );
 
+-- Reglas de recurrencia que generan horarios (app/utils/recurrence.py)
+CREATE TABLE IF NOT EXISTS public.horario_recurrencia (
+  recurrenciaid    INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+  actoliturgicoid  INTEGER NOT NULL REFERENCES public.actoliturgico(actoliturgicoid) ON DELETE CASCADE,
+  frecuencia       VARCHAR(10) NOT NULL CHECK (frecuencia IN ('semanal', 'mensual')),
+  dia_semana       SMALLINT NOT NULL CHECK (dia_semana BETWEEN 0 AND 6), -- 0 = lunes
+  semana_mes       SMALLINT CHECK (semana_mes IN (-1, 1, 2, 3, 4, 5)), -- mensual: n-ésimo o último (-1)
+  intervalo        SMALLINT NOT NULL DEFAULT 1 CHECK (intervalo >= 1), -- semanal: cada N semanas
+  h_hora           TIME NOT NULL,
+  fecha_inicio     DATE NOT NULL,
+  fecha_fin        DATE,
+  excepciones      DATE[] NOT NULL DEFAULT '{}', -- fechas en las que no se genera horario
+  omitir_liturgia  TEXT[] NOT NULL DEFAULT '{}', -- tiempos/fiestas sin horario (app/utils/liturgical_year.py)
+  activo           BOOLEAN NOT NULL DEFAULT TRUE,
+  created_at       TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
+  updated_at       TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
+  CHECK (frecuencia <> 'mensual' OR semana_mes IS NOT NULL),
+  CHECK (fecha_fin IS NULL OR fecha_fin >= fecha_inicio)
+);
+
+-- Jornada de atención por parroquia y día (disponibilidad; sin filas = DISPONIBILIDAD_JORNADA)
+CREATE TABLE IF NOT EXISTS public.parroquia_jornada (
+  jornadaid        INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+  parroquiaid      INTEGER NOT NULL REFERENCES public.parroquia(parroquiaid) ON DELETE CASCADE,
+  dia_semana       SMALLINT NOT NULL CHECK (dia_semana BETWEEN 0 AND 6), -- 0 = lunes
+  hora_inicio      TIME NOT NULL,
+  hora_fin         TIME NOT NULL,
+  CHECK (hora_fin > hora_inicio)
+);
+
+-- Agenda precalculada por (día, parroquia) para GET /horarios/fecha/<fecha> (app/utils/agenda.py).
+-- La cargan agenda_refrescar() y el job scripts/warm_agenda.py; los triggers de la sección 10
+-- borran los días que cambian y la siguiente lectura los vuelve a calcular.
+CREATE TABLE IF NOT EXISTS public.agenda_dia (
+  fecha            DATE NOT NULL,
+  parroquiaid      INTEGER NOT NULL REFERENCES public.parroquia(parroquiaid) ON DELETE CASCADE,
+  horarios         JSONB NOT NULL DEFAULT '[]', -- horarios con asistentes y estado de pago
+  resumen          JSONB NOT NULL DEFAULT '{}', -- totales del día
+  calculado_at     TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (fecha, parroquiaid)
+);
+
 -- Índices para tablas litúrgicas
 CREATE INDEX IF NOT EXISTS idx_actoliturgico_parroquia ON public.actoliturgico(parroquiaid);
 CREATE INDEX IF NOT EXISTS idx_actoliturgico_estado ON public.actoliturgico(act_estado);
-CREATE INDEX IF NOT EXISTS idx_horario_fecha ON public.horario(h_fecha);
 CREATE INDEX IF NOT EXISTS idx_horario_acto ON public.horario(actoliturgicoid);
+CREATE INDEX IF NOT EXISTS idx_horario_recurrencia_acto ON public.horario_recurrencia(actoliturgicoid) WHERE activo;
+CREATE INDEX IF NOT EXISTS idx_parroquia_jornada ON public.parroquia_jornada(parroquiaid, dia_semana);
+-- uq_horario_acto_fecha_hora (un acto no repite fecha y hora) se crea en la sección 10,
+-- parcial sobre deleted_at
+-- Destino de la FK compuesta de reserva (horarioid, h_fecha). Con horario particionado
+-- (scripts/partition_horario_reserva.py) ese papel lo cumple la PK (horarioid, h_fecha).
+DO $$
+BEGIN
+  IF (SELECT relkind FROM pg_class WHERE oid = 'public.horario'::regclass) = 'r' THEN
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_horario_id_fecha ON public.horario(horarioid, h_fecha);
+  END IF;
+END$$;
 
 -- =========================================================
 -- 5) TABLAS DEL SISTEMA DE PAGOS
@@ -198,13 +305,18 @@ CREATE INDEX IF NOT EXISTS idx_pago_medio ON public.pago(pago_medio);
 -- Reservas de actos litúrgicos
 CREATE TABLE IF NOT EXISTS public.reserva (
   reservaid        INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
-  horarioid        INTEGER NOT NULL REFERENCES public.horario(horarioid) ON DELETE CASCADE,
+  horarioid        INTEGER NOT NULL,
+  h_fecha          DATE NOT NULL, -- copia de horario.h_fecha: clave de partición y parte de la FK
   personaid        INTEGER REFERENCES public.persona(personaid) ON DELETE SET NULL,
   res_persona_nombre VARCHAR(255), -- Nombre de persona no registrada (si personaid es NULL)
   res_descripcion  TEXT NULL,
   pagoid           INTEGER REFERENCES public.pago(pagoid) ON DELETE SET NULL, -- FK a public.pago
+  res_busqueda     TSVECTOR, -- búsqueda de texto, mantenida por triggers (sección 10)
   created_at       TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
-  updated_at       TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW()
+  updated_at       TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW(),
+  -- Mover el horario de fecha arrastra h_fecha en sus reservas
+  CONSTRAINT reserva_horario_fkey FOREIGN KEY (horarioid, h_fecha)
+    REFERENCES public.horario(horarioid, h_fecha) ON UPDATE CASCADE ON DELETE CASCADE
 );
 
 -- Índices para tabla reserva
@@ -213,6 +325,29 @@ CREATE INDEX IF NOT EXISTS idx_reserva_persona ON public.reserva(personaid);
 CREATE INDEX IF NOT EXISTS idx_reserva_pago ON public.reserva(pagoid);
 -- Nota: res_estado eliminado - el estado se obtiene dinámicamente desde tabla pago (pagoid FK)
 
+-- Índices para paginación por cursor de /api/liturgical/reservas (ORDER BY created_at DESC, reservaid DESC)
+CREATE INDEX IF NOT EXISTS idx_reserva_keyset ON public.reserva(created_at DESC, reservaid DESC);
+CREATE INDEX IF NOT EXISTS idx_reserva_persona_keyset ON public.reserva(personaid, created_at DESC, reservaid DESC);
+CREATE INDEX IF NOT EXISTS idx_reserva_horario_keyset ON public.reserva(horarioid, created_at DESC, reservaid DESC);
+
+-- Archivo de años cerrados (app/utils/archive.py, scripts/archive_history.py): horarios y
+-- reservas anteriores a la ventana de retención, movidos por lotes. Un bloque por tipo,
+-- parroquia y mes; `datos` es un array de filas desnormalizadas que TOAST guarda comprimido.
+-- Sin FK a parroquia: el historial se conserva aunque la parroquia se borre.
+CREATE TABLE IF NOT EXISTS public.archivo_bloque (
+  bloqueid         INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+  tipo             VARCHAR(10) NOT NULL CHECK (tipo IN ('horario', 'reserva')),
+  parroquiaid      INTEGER,
+  desde            DATE NOT NULL, -- h_fecha mínima y máxima del bloque
+  hasta            DATE NOT NULL,
+  filas            INTEGER NOT NULL,
+  datos            JSONB NOT NULL,
+  created_at       TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_archivo_bloque ON public.archivo_bloque(tipo, parroquiaid, desde, hasta);
+CREATE INDEX IF NOT EXISTS idx_actoliturgico_parroquia_nombre ON public.actoliturgico(parroquiaid, act_nombre);
+
 -- =========================================================
 -- 7) DATOS POR DEFECTO E INSERTS
 -- =========================================================
@@ -264,7 +399,7 @@ BEGIN
   IF NOT EXISTS (
     SELECT 1 FROM pg_class c
     JOIN pg_namespace n ON n.oid = c.relnamespace
-    WHERE c.relkind = 'i'
+    WHERE c.relkind IN ('i', 'I')
       AND c.relname = 'idx_reserva_pago'
       AND n.nspname = 'public'
   ) THEN
@@ -324,6 +459,75 @@ BEGIN
   END IF;
 END $$;
 
+-- Coordenadas de parroquia (geocodificación en backend)
+ALTER TABLE public.parroquia ADD COLUMN IF NOT EXISTS par_latitud DOUBLE PRECISION;
+ALTER TABLE public.parroquia ADD COLUMN IF NOT EXISTS par_longitud DOUBLE PRECISION;
+
+-- Contadores de reservas por horario (se cargan con reconciliar_contadores_horario())
+ALTER TABLE public.horario ADD COLUMN IF NOT EXISTS reservas_total INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE public.horario ADD COLUMN IF NOT EXISTS reservas_activas INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE public.horario ADD COLUMN IF NOT EXISTS h_capacidad INTEGER CHECK (h_capacidad >= 0);
+
+-- Duración e intervalo ocupado por cada horario (la columna generada reescribe la tabla una vez)
+ALTER TABLE public.horario ADD COLUMN IF NOT EXISTS h_duracion SMALLINT NOT NULL DEFAULT 60 CHECK (h_duracion > 0);
+ALTER TABLE public.horario ADD COLUMN IF NOT EXISTS h_rango TSRANGE GENERATED ALWAYS AS
+  (tsrange(h_fecha + h_hora, h_fecha + h_hora + h_duracion * INTERVAL '1 minute')) STORED;
+
+-- Parroquia desnormalizada en horario (sin DEFAULT: el ALTER no reescribe la tabla).
+-- En bases existentes, cargarla con scripts/backfill_horario_parroquia.py (por lotes,
+-- crea además idx_horario_vivos_parroquia_fecha con CONCURRENTLY).
+ALTER TABLE public.horario ADD COLUMN IF NOT EXISTS parroquiaid INTEGER;
+
+-- Borrado lógico de actos y horarios: las lecturas filtran deleted_at IS NULL y
+-- scripts/purge_deleted.py borra por lotes las reservas, horarios y actos marcados
+ALTER TABLE public.actoliturgico ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP WITHOUT TIME ZONE;
+ALTER TABLE public.horario ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP WITHOUT TIME ZONE;
+
+-- Fecha del horario copiada en reserva: permite particionar reserva por h_fecha igual que
+-- horario. La FK simple (horarioid) se reemplaza por la compuesta (horarioid, h_fecha).
+ALTER TABLE public.reserva ADD COLUMN IF NOT EXISTS h_fecha DATE;
+DO $$
+BEGIN
+  IF EXISTS (
+    SELECT 1 FROM information_schema.columns
+    WHERE table_schema = 'public' AND table_name = 'reserva' AND column_name = 'h_fecha'
+      AND is_nullable = 'YES'
+  ) THEN
+    UPDATE public.reserva r
+    SET h_fecha = h.h_fecha
+    FROM public.horario h
+    WHERE h.horarioid = r.horarioid
+      AND r.h_fecha IS NULL;
+    ALTER TABLE public.reserva ALTER COLUMN h_fecha SET NOT NULL;
+  END IF;
+
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_constraint
+    WHERE conrelid = 'public.reserva'::regclass AND conname = 'reserva_horario_fkey'
+  ) THEN
+    ALTER TABLE public.reserva ADD CONSTRAINT reserva_horario_fkey FOREIGN KEY (horarioid, h_fecha)
+      REFERENCES public.horario(horarioid, h_fecha) ON UPDATE CASCADE ON DELETE CASCADE;
+  END IF;
+  ALTER TABLE public.reserva DROP CONSTRAINT IF EXISTS reserva_horarioid_fkey;
+END $$;
+
+-- Tiempos o fiestas litúrgicas en que una regla de recurrencia no genera horarios
+ALTER TABLE public.horario_recurrencia ADD COLUMN IF NOT EXISTS omitir_liturgia TEXT[] NOT NULL DEFAULT '{}';
+
+-- Documentos de búsqueda de texto (se cargan en la sección 10)
+ALTER TABLE public.actoliturgico ADD COLUMN IF NOT EXISTS act_busqueda TSVECTOR;
+ALTER TABLE public.persona ADD COLUMN IF NOT EXISTS per_busqueda TSVECTOR;
+ALTER TABLE public.reserva ADD COLUMN IF NOT EXISTS res_busqueda TSVECTOR;
+
+-- Archivo comprimido con lz4 (más rápido que pglz al leer). PostgreSQL < 14 o compilado
+-- sin lz4: queda pglz. EXECUTE para que el error sea capturable.
+DO $$
+BEGIN
+  EXECUTE 'ALTER TABLE public.archivo_bloque ALTER COLUMN datos SET COMPRESSION lz4';
+EXCEPTION WHEN feature_not_supported OR syntax_error THEN
+  RAISE NOTICE 'archivo_bloque.datos queda con la compresión por defecto (pglz)';
+END $$;
+
 -- Limpieza defensiva si existiera la columna antigua en entornos viejos
 DO $$
 BEGIN
@@ -420,6 +624,16 @@ BEGIN
     FOR EACH ROW
     EXECUTE FUNCTION set_updated_at();
   END IF;
+
+  -- Trigger para horario_recurrencia
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_trigger WHERE tgname = 'trg_horario_recurrencia_set_updated_at'
+  ) THEN
+    CREATE TRIGGER trg_horario_recurrencia_set_updated_at
+    BEFORE UPDATE ON public.horario_recurrencia
+    FOR EACH ROW
+    EXECUTE FUNCTION set_updated_at();
+  END IF;
 END$$;
 
 -- =========================================================
@@ -471,6 +685,810 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+-- Nombre normalizado de persona (minúsculas, sin tildes, espacios simples)
+-- Debe coincidir con app/utils/normalize.py:normalize_person_name
+CREATE OR REPLACE FUNCTION persona_nombre_norm(nombres TEXT, apellidos TEXT)
+RETURNS TEXT AS $$
+  SELECT btrim(regexp_replace(
+    translate(lower(COALESCE(nombres, '') || ' ' || COALESCE(apellidos, '')),
+              'áàäâãéèëêíìïîóòöôõúùüûñç', 'aaaaaeeeeiiiiooooouuuunc'),
+    '[^a-z0-9]+', ' ', 'g'))
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Índice para deduplicar personas (importación masiva): nombre normalizado + nacimiento + parroquia
+CREATE INDEX IF NOT EXISTS idx_persona_dedupe
+  ON public.persona (persona_nombre_norm(per_nombres, per_apellidos), fecha_nacimiento, parroquiaid);
+
+-- ---------------------------------------------------------
+-- Contadores de reservas en horario (reservas_total / reservas_activas)
+-- Una reserva es activa si no tiene pago o su pago está 'pendiente' o 'pagado'.
+-- ---------------------------------------------------------
+
+-- Un pago inexistente (NULL o ya borrado) cuenta como 'pendiente', igual que en las consultas
+CREATE OR REPLACE FUNCTION reserva_pago_activo(p_pagoid INTEGER)
+RETURNS BOOLEAN AS $$
+  SELECT COALESCE(
+    (SELECT pago_estado FROM public.pago WHERE pagoid = p_pagoid), 'pendiente'
+  ) IN ('pendiente', 'pagado')
+$$ LANGUAGE sql STABLE;
+
+-- Una reserva activa ocupa un cupo: el incremento es condicional (reservas_activas < h_capacidad)
+-- y se hace en un solo UPDATE, que sólo bloquea la fila del horario (sin LOCK TABLE).
+-- Sin cupo se lanza check_violation con CONSTRAINT 'horario_capacidad' (la app responde 409).
+CREATE OR REPLACE FUNCTION horario_contadores_reserva()
+RETURNS TRIGGER AS $$
+DECLARE
+  activa BOOLEAN;
+BEGIN
+  -- Sólo por horarioid: con tablas particionadas, mover un horario a otro mes mueve sus
+  -- reservas de partición (DELETE + INSERT) y OLD.h_fecha ya no es la fecha del horario
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    UPDATE public.horario
+    SET reservas_total = reservas_total - 1,
+        reservas_activas = reservas_activas - CASE WHEN reserva_pago_activo(OLD.pagoid) THEN 1 ELSE 0 END
+    WHERE horarioid = OLD.horarioid;
+  END IF;
+  -- NEW.h_fecha sí es la fecha vigente (FK compuesta): sólo se visita una partición
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    activa := reserva_pago_activo(NEW.pagoid);
+    UPDATE public.horario
+    SET reservas_total = reservas_total + 1,
+        reservas_activas = reservas_activas + CASE WHEN activa THEN 1 ELSE 0 END
+    WHERE horarioid = NEW.horarioid
+      AND h_fecha = NEW.h_fecha
+      AND (NOT activa OR h_capacidad IS NULL OR reservas_activas < h_capacidad);
+    IF NOT FOUND AND EXISTS (
+      SELECT 1 FROM public.horario WHERE horarioid = NEW.horarioid AND h_fecha = NEW.h_fecha
+    ) THEN
+      RAISE EXCEPTION 'El horario % no tiene cupos disponibles', NEW.horarioid
+        USING ERRCODE = 'check_violation', CONSTRAINT = 'horario_capacidad';
+    END IF;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Cambio de estado de un pago: ajusta reservas_activas de los horarios de sus reservas.
+-- Un pago vencido/fallido que vuelve a pendiente/pagado reactiva sus reservas:
+-- igual que al reservar, el incremento es condicional al cupo; si en algún horario los
+-- cupos liberados ya se vendieron se lanza check_violation 'horario_capacidad'.
+--
+-- Borrar un pago: la FK de reserva lo pone en NULL y una reserva sin pago es 'pendiente'
+-- (reserva_pago_activo, reconciliar_contadores_horario y la app leen así pagoid NULL). Por
+-- eso borrar un pago no activo vuelve sus reservas a pendiente y ocupa cupo otra vez: con
+-- cupos se cuentan como activas; sin cupos el borrado se rechaza con 'horario_capacidad'
+-- (primero hay que borrar o mover esas reservas). Borrar un pago activo no cambia nada.
+CREATE OR REPLACE FUNCTION horario_contadores_pago()
+RETURNS TRIGGER AS $$
+DECLARE
+  antes BOOLEAN := OLD.pago_estado IN ('pendiente', 'pagado');
+  despues BOOLEAN;
+  delta INTEGER;
+  horarios INTEGER;
+  actualizados INTEGER;
+BEGIN
+  -- Al borrar el pago, sus reservas quedan con pagoid NULL (= pendiente, activa). El
+  -- trigger de reserva de ese SET NULL ya no encuentra el pago y no cambia nada.
+  despues := CASE WHEN TG_OP = 'DELETE' THEN TRUE ELSE NEW.pago_estado IN ('pendiente', 'pagado') END;
+  IF antes = despues THEN
+    RETURN OLD;
+  END IF;
+  delta := CASE WHEN despues THEN 1 ELSE -1 END;
+
+  UPDATE public.horario h
+  SET reservas_activas = h.reservas_activas + delta * r.n
+  FROM (
+    SELECT horarioid, h_fecha, COUNT(*) AS n
+    FROM public.reserva
+    WHERE pagoid = OLD.pagoid
+    GROUP BY horarioid, h_fecha
+  ) r
+  WHERE h.horarioid = r.horarioid
+    AND h.h_fecha = r.h_fecha
+    AND (delta < 0 OR h.h_capacidad IS NULL OR h.reservas_activas + r.n <= h.h_capacidad);
+  GET DIAGNOSTICS actualizados = ROW_COUNT;
+
+  IF delta > 0 THEN
+    SELECT COUNT(*) INTO horarios
+    FROM (SELECT DISTINCT horarioid, h_fecha FROM public.reserva WHERE pagoid = OLD.pagoid) r;
+    IF actualizados < horarios AND TG_OP = 'DELETE' THEN
+      RAISE EXCEPTION 'No se puede borrar el pago %: sus reservas volverían a pendiente y ya no hay cupos', OLD.pagoid
+        USING ERRCODE = 'check_violation', CONSTRAINT = 'horario_capacidad';
+    ELSIF actualizados < horarios THEN
+      RAISE EXCEPTION 'Las reservas del pago % ya no tienen cupos disponibles', OLD.pagoid
+        USING ERRCODE = 'check_violation', CONSTRAINT = 'horario_capacidad';
+    END IF;
+  END IF;
+  -- En el trigger BEFORE DELETE, devolver NULL cancelaría el borrado del pago
+  RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_reserva_contadores_horario') THEN
+    CREATE TRIGGER trg_reserva_contadores_horario
+    AFTER INSERT OR DELETE ON public.reserva
+    FOR EACH ROW
+    EXECUTE FUNCTION horario_contadores_reserva();
+  END IF;
+
+  IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_reserva_contadores_horario_upd') THEN
+    CREATE TRIGGER trg_reserva_contadores_horario_upd
+    AFTER UPDATE OF horarioid, pagoid ON public.reserva
+    FOR EACH ROW
+    WHEN (OLD.horarioid IS DISTINCT FROM NEW.horarioid OR OLD.pagoid IS DISTINCT FROM NEW.pagoid)
+    EXECUTE FUNCTION horario_contadores_reserva();
+  END IF;
+
+  IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_pago_contadores_horario') THEN
+    CREATE TRIGGER trg_pago_contadores_horario
+    AFTER UPDATE OF pago_estado ON public.pago
+    FOR EACH ROW
+    WHEN (OLD.pago_estado IS DISTINCT FROM NEW.pago_estado)
+    EXECUTE FUNCTION horario_contadores_pago();
+  END IF;
+
+  -- BEFORE: las reservas todavía apuntan al pago (el SET NULL de la FK corre después)
+  IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_pago_contadores_horario_del') THEN
+    CREATE TRIGGER trg_pago_contadores_horario_del
+    BEFORE DELETE ON public.pago
+    FOR EACH ROW
+    EXECUTE FUNCTION horario_contadores_pago();
+  END IF;
+END$$;
+
+-- Recalcula los contadores desde reserva/pago y corrige los horarios desfasados.
+-- Devuelve cuántos horarios se corrigieron (scripts/reconcile_horario_counters.py)
+CREATE OR REPLACE FUNCTION reconciliar_contadores_horario()
+RETURNS INTEGER AS $$
+DECLARE
+  corregidos INTEGER;
+BEGIN
+  UPDATE public.horario h
+  SET reservas_total = c.total,
+      reservas_activas = c.activas
+  FROM (
+    SELECT
+      h2.horarioid,
+      h2.h_fecha,
+      COUNT(r.reservaid) AS total,
+      COUNT(r.reservaid) FILTER (
+        WHERE COALESCE(pg.pago_estado, 'pendiente') IN ('pendiente', 'pagado')
+      ) AS activas
+    FROM public.horario h2
+    LEFT JOIN public.reserva r ON r.horarioid = h2.horarioid AND r.h_fecha = h2.h_fecha
+    LEFT JOIN public.pago pg ON pg.pagoid = r.pagoid
+    GROUP BY h2.horarioid, h2.h_fecha
+  ) c
+  -- Clave completa (horarioid, h_fecha), como la de la tabla particionada
+  WHERE h.horarioid = c.horarioid
+    AND h.h_fecha = c.h_fecha
+    AND (h.reservas_total <> c.total OR h.reservas_activas <> c.activas);
+
+  GET DIAGNOSTICS corregidos = ROW_COUNT;
+  RETURN corregidos;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Carga inicial de los contadores (idempotente)
+SELECT reconciliar_contadores_horario();
+
+-- ---------------------------------------------------------
+-- horario.parroquiaid = actoliturgico.parroquiaid
+-- ---------------------------------------------------------
+
+-- Al crear un horario o moverlo a otro acto, copia la parroquia del acto
+CREATE OR REPLACE FUNCTION horario_copiar_parroquia()
+RETURNS TRIGGER AS $$
+DECLARE
+  v_parroquiaid INTEGER;
+BEGIN
+  SELECT parroquiaid INTO v_parroquiaid
+  FROM public.actoliturgico
+  WHERE actoliturgicoid = NEW.actoliturgicoid;
+  -- Un acto insertado en la misma sentencia (WITH a AS (INSERT ...)) todavía no es
+  -- visible: en ese caso se conserva la parroquia que trae la fila
+  IF FOUND THEN
+    NEW.parroquiaid := v_parroquiaid;
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Al cambiar la parroquia de un acto (o quedar NULL al borrar la parroquia), la propaga
+CREATE OR REPLACE FUNCTION actoliturgico_propagar_parroquia()
+RETURNS TRIGGER AS $$
+BEGIN
+  UPDATE public.horario
+  SET parroquiaid = NEW.parroquiaid
+  WHERE actoliturgicoid = NEW.actoliturgicoid
+    AND parroquiaid IS DISTINCT FROM NEW.parroquiaid;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_horario_copiar_parroquia') THEN
+    CREATE TRIGGER trg_horario_copiar_parroquia
+    BEFORE INSERT OR UPDATE OF actoliturgicoid ON public.horario
+    FOR EACH ROW
+    EXECUTE FUNCTION horario_copiar_parroquia();
+  END IF;
+
+  IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_actoliturgico_propagar_parroquia') THEN
+    CREATE TRIGGER trg_actoliturgico_propagar_parroquia
+    AFTER UPDATE OF parroquiaid ON public.actoliturgico
+    FOR EACH ROW
+    WHEN (OLD.parroquiaid IS DISTINCT FROM NEW.parroquiaid)
+    EXECUTE FUNCTION actoliturgico_propagar_parroquia();
+  END IF;
+END$$;
+
+-- ---------------------------------------------------------
+-- Búsqueda de texto (GET /api/liturgical/search, app/utils/search.py)
+-- act_busqueda: título (A), tipo de acto y sinónimos (B), descripción (C)
+-- per_busqueda: nombres y apellidos (A)
+-- res_busqueda: persona (A), acto (B), descripción (C), mes y año del horario (D), para
+-- encontrar "matrimonio Pérez marzo" en una sola búsqueda
+-- ---------------------------------------------------------
+
+-- Palabras con que se busca cada tipo de acto además de su nombre
+CREATE OR REPLACE FUNCTION busqueda_sinonimos_acto(p_act_nombre TEXT)
+RETURNS TEXT AS $$
+  SELECT CASE lower(COALESCE(p_act_nombre, ''))
+    WHEN 'matrimonio' THEN 'boda casamiento'
+    WHEN 'bautismo' THEN 'bautizo'
+    WHEN 'exequias' THEN 'funeral difunto'
+    WHEN 'comunion' THEN 'primera comunión'
+    ELSE ''
+  END
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION busqueda_mes(p_fecha DATE)
+RETURNS TEXT AS $$
+  SELECT (ARRAY['enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio', 'julio', 'agosto',
+                'septiembre', 'octubre', 'noviembre', 'diciembre'])[EXTRACT(MONTH FROM p_fecha)::INTEGER]
+         || ' ' || EXTRACT(YEAR FROM p_fecha)::INTEGER
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION acto_documento(p_titulo TEXT, p_nombre TEXT, p_descripcion TEXT)
+RETURNS TSVECTOR AS $$
+  SELECT setweight(to_tsvector('public.es_unaccent', COALESCE(p_titulo, '')), 'A')
+      || setweight(to_tsvector('public.es_unaccent',
+                               COALESCE(p_nombre, '') || ' ' || busqueda_sinonimos_acto(p_nombre)), 'B')
+      || setweight(to_tsvector('public.es_unaccent', COALESCE(p_descripcion, '')), 'C')
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION persona_documento(p_nombres TEXT, p_apellidos TEXT)
+RETURNS TSVECTOR AS $$
+  SELECT setweight(to_tsvector('public.es_unaccent',
+                               COALESCE(p_nombres, '') || ' ' || COALESCE(p_apellidos, '')), 'A')
+$$ LANGUAGE sql STABLE;
+
+-- Lee persona, horario y acto: los triggers de esas tablas refrescan las reservas afectadas
+CREATE OR REPLACE FUNCTION reserva_documento(
+  p_personaid INTEGER, p_persona_nombre TEXT, p_descripcion TEXT, p_horarioid INTEGER, p_h_fecha DATE
+)
+RETURNS TSVECTOR AS $$
+  SELECT setweight(to_tsvector('public.es_unaccent', concat_ws(' ',
+                     per.per_nombres, per.per_apellidos, p_persona_nombre)), 'A')
+      || setweight(to_tsvector('public.es_unaccent', concat_ws(' ',
+                     a.act_titulo, a.act_nombre, busqueda_sinonimos_acto(a.act_nombre))), 'B')
+      || setweight(to_tsvector('public.es_unaccent', COALESCE(p_descripcion, '')), 'C')
+      || setweight(to_tsvector('public.es_unaccent', COALESCE(busqueda_mes(p_h_fecha), '')), 'D')
+  FROM (SELECT 1) uno
+  LEFT JOIN public.persona per ON per.personaid = p_personaid
+  LEFT JOIN public.horario h ON h.horarioid = p_horarioid AND h.h_fecha = p_h_fecha
+  LEFT JOIN public.actoliturgico a ON a.actoliturgicoid = h.actoliturgicoid
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION actoliturgico_busqueda()
+RETURNS TRIGGER AS $$
+BEGIN
+  NEW.act_busqueda := acto_documento(NEW.act_titulo, NEW.act_nombre, NEW.act_descripcion);
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION persona_busqueda()
+RETURNS TRIGGER AS $$
+BEGIN
+  NEW.per_busqueda := persona_documento(NEW.per_nombres, NEW.per_apellidos);
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION reserva_busqueda()
+RETURNS TRIGGER AS $$
+BEGIN
+  NEW.res_busqueda := reserva_documento(
+    NEW.personaid, NEW.res_persona_nombre, NEW.res_descripcion, NEW.horarioid, NEW.h_fecha);
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Cambió el nombre de una persona, el título/tipo de un acto o el acto de un horario:
+-- recalcula el documento de las reservas que lo muestran
+CREATE OR REPLACE FUNCTION reservas_refrescar_busqueda()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_TABLE_NAME = 'persona' THEN
+    UPDATE public.reserva r
+    SET res_busqueda = reserva_documento(r.personaid, r.res_persona_nombre, r.res_descripcion, r.horarioid, r.h_fecha)
+    WHERE r.personaid = NEW.personaid;
+  ELSIF TG_TABLE_NAME = 'actoliturgico' THEN
+    UPDATE public.reserva r
+    SET res_busqueda = reserva_documento(r.personaid, r.res_persona_nombre, r.res_descripcion, r.horarioid, r.h_fecha)
+    FROM public.horario h
+    WHERE h.actoliturgicoid = NEW.actoliturgicoid
+      AND r.horarioid = h.horarioid
+      AND r.h_fecha = h.h_fecha;
+  ELSE
+    UPDATE public.reserva r
+    SET res_busqueda = reserva_documento(r.personaid, r.res_persona_nombre, r.res_descripcion, r.horarioid, r.h_fecha)
+    WHERE r.horarioid = NEW.horarioid
+      AND r.h_fecha = NEW.h_fecha;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_actoliturgico_busqueda') THEN
+    CREATE TRIGGER trg_actoliturgico_busqueda
+    BEFORE INSERT OR UPDATE OF act_titulo, act_nombre, act_descripcion ON public.actoliturgico
+    FOR EACH ROW
+    EXECUTE FUNCTION actoliturgico_busqueda();
+  END IF;
+
+  IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_persona_busqueda') THEN
+    CREATE TRIGGER trg_persona_busqueda
+    BEFORE INSERT OR UPDATE OF per_nombres, per_apellidos ON public.persona
+    FOR EACH ROW
+    EXECUTE FUNCTION persona_busqueda();
+  END IF;
+
+  -- h_fecha: el ON UPDATE CASCADE de un horario movido de fecha también pasa por aquí
+  IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_reserva_busqueda') THEN
+    CREATE TRIGGER trg_reserva_busqueda
+    BEFORE INSERT OR UPDATE OF personaid, res_persona_nombre, res_descripcion, horarioid, h_fecha
+    ON public.reserva
+    FOR EACH ROW
+    EXECUTE FUNCTION reserva_busqueda();
+  END IF;
+
+  IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_persona_refrescar_reservas') THEN
+    CREATE TRIGGER trg_persona_refrescar_reservas
+    AFTER UPDATE OF per_nombres, per_apellidos ON public.persona
+    FOR EACH ROW
+    WHEN (OLD.per_nombres IS DISTINCT FROM NEW.per_nombres OR OLD.per_apellidos IS DISTINCT FROM NEW.per_apellidos)
+    EXECUTE FUNCTION reservas_refrescar_busqueda();
+  END IF;
+
+  IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_actoliturgico_refrescar_reservas') THEN
+    CREATE TRIGGER trg_actoliturgico_refrescar_reservas
+    AFTER UPDATE OF act_titulo, act_nombre ON public.actoliturgico
+    FOR EACH ROW
+    WHEN (OLD.act_titulo IS DISTINCT FROM NEW.act_titulo OR OLD.act_nombre IS DISTINCT FROM NEW.act_nombre)
+    EXECUTE FUNCTION reservas_refrescar_busqueda();
+  END IF;
+
+  IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_horario_refrescar_reservas') THEN
+    CREATE TRIGGER trg_horario_refrescar_reservas
+    AFTER UPDATE OF actoliturgicoid ON public.horario
+    FOR EACH ROW
+    WHEN (OLD.actoliturgicoid IS DISTINCT FROM NEW.actoliturgicoid)
+    EXECUTE FUNCTION reservas_refrescar_busqueda();
+  END IF;
+END$$;
+
+-- Carga inicial de los documentos (idempotente: sólo filas sin documento)
+UPDATE public.actoliturgico
+SET act_busqueda = acto_documento(act_titulo, act_nombre, act_descripcion)
+WHERE act_busqueda IS NULL;
+UPDATE public.persona
+SET per_busqueda = persona_documento(per_nombres, per_apellidos)
+WHERE per_busqueda IS NULL;
+UPDATE public.reserva
+SET res_busqueda = reserva_documento(personaid, res_persona_nombre, res_descripcion, horarioid, h_fecha)
+WHERE res_busqueda IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_actoliturgico_busqueda ON public.actoliturgico USING gin (act_busqueda);
+CREATE INDEX IF NOT EXISTS idx_persona_busqueda ON public.persona USING gin (per_busqueda);
+CREATE INDEX IF NOT EXISTS idx_reserva_busqueda ON public.reserva USING gin (res_busqueda);
+
+-- ---------------------------------------------------------
+-- Agenda del día precalculada (agenda_dia)
+-- ---------------------------------------------------------
+
+-- Calcula y guarda la agenda de cada parroquia (o sólo p_parroquiaid) y día del rango.
+-- Los días sin horarios también se guardan (agenda vacía). Con p_solo_faltantes sólo
+-- calcula los que no están. Devuelve cuántas filas escribió.
+CREATE OR REPLACE FUNCTION agenda_refrescar(
+  p_desde DATE, p_hasta DATE, p_parroquiaid INTEGER DEFAULT NULL, p_solo_faltantes BOOLEAN DEFAULT FALSE
+)
+RETURNS INTEGER AS $$
+DECLARE
+  escritas INTEGER;
+BEGIN
+  WITH dias AS (
+    SELECT p.parroquiaid, p.par_nombre, d::DATE AS fecha
+    FROM public.parroquia p
+    CROSS JOIN generate_series(p_desde, p_hasta, INTERVAL '1 day') d
+    WHERE (p_parroquiaid IS NULL OR p.parroquiaid = p_parroquiaid)
+      AND NOT (p_solo_faltantes AND EXISTS (
+        SELECT 1 FROM public.agenda_dia ad WHERE ad.fecha = d::DATE AND ad.parroquiaid = p.parroquiaid
+      ))
+  ), asistentes AS (
+    SELECT
+      r.horarioid,
+      r.h_fecha,
+      jsonb_agg(jsonb_build_object(
+        'reservaid', r.reservaid,
+        'persona_nombre', COALESCE(per.per_nombres || ' ' || per.per_apellidos, r.res_persona_nombre),
+        'pago_estado', COALESCE(pg.pago_estado, 'pendiente'),
+        'pago_monto', pg.pago_monto
+      ) ORDER BY r.created_at, r.reservaid) AS lista,
+      COUNT(*) FILTER (WHERE COALESCE(pg.pago_estado, 'pendiente') = 'pendiente') AS pendientes,
+      COUNT(*) FILTER (WHERE pg.pago_estado = 'pagado') AS pagados,
+      COUNT(*) FILTER (WHERE pg.pago_estado IN ('vencido', 'fallido')) AS anulados,
+      COALESCE(SUM(pg.pago_monto) FILTER (WHERE pg.pago_estado = 'pagado'), 0) AS monto_pagado,
+      COALESCE(SUM(pg.pago_monto) FILTER (WHERE pg.pago_estado = 'pendiente'), 0) AS monto_pendiente
+    FROM public.reserva r
+    JOIN public.horario h ON h.horarioid = r.horarioid AND h.h_fecha = r.h_fecha
+    LEFT JOIN public.persona per ON per.personaid = r.personaid
+    LEFT JOIN public.pago pg ON pg.pagoid = r.pagoid
+    WHERE r.h_fecha BETWEEN p_desde AND p_hasta
+      AND h.deleted_at IS NULL
+      AND (p_parroquiaid IS NULL OR h.parroquiaid = p_parroquiaid)
+    GROUP BY r.horarioid, r.h_fecha
+  ), por_dia AS (
+    SELECT
+      h.parroquiaid,
+      h.h_fecha,
+      jsonb_agg(jsonb_build_object(
+        'horarioid', h.horarioid,
+        'h_fecha', to_char(h.h_fecha, 'YYYY-MM-DD'),
+        'h_hora', to_char(h.h_hora, 'HH24:MI'),
+        'h_duracion', h.h_duracion,
+        'act_nombre', a.act_nombre,
+        'act_titulo', a.act_titulo,
+        'reservas_total', h.reservas_total,
+        'reservas_activas', h.reservas_activas,
+        'h_capacidad', h.h_capacidad,
+        'cupos_disponibles', CASE WHEN h.h_capacidad IS NULL THEN NULL
+                                  ELSE GREATEST(h.h_capacidad - h.reservas_activas, 0) END,
+        'asistentes', COALESCE(s.lista, '[]'::JSONB)
+      ) ORDER BY h.h_hora, h.horarioid) AS lista,
+      COUNT(*) AS horarios,
+      SUM(h.reservas_total) AS reservas,
+      COALESCE(SUM(s.pendientes), 0) AS pendientes,
+      COALESCE(SUM(s.pagados), 0) AS pagados,
+      COALESCE(SUM(s.anulados), 0) AS anulados,
+      COALESCE(SUM(s.monto_pagado), 0) AS monto_pagado,
+      COALESCE(SUM(s.monto_pendiente), 0) AS monto_pendiente
+    FROM public.horario h
+    LEFT JOIN public.actoliturgico a ON a.actoliturgicoid = h.actoliturgicoid
+    LEFT JOIN asistentes s ON s.horarioid = h.horarioid AND s.h_fecha = h.h_fecha
+    WHERE h.h_fecha BETWEEN p_desde AND p_hasta
+      AND h.deleted_at IS NULL
+      AND (p_parroquiaid IS NULL OR h.parroquiaid = p_parroquiaid)
+    GROUP BY h.parroquiaid, h.h_fecha
+  )
+  INSERT INTO public.agenda_dia (fecha, parroquiaid, horarios, resumen, calculado_at)
+  SELECT
+    d.fecha,
+    d.parroquiaid,
+    COALESCE(x.lista, '[]'::JSONB),
+    jsonb_build_object(
+      'parroquia_nombre', d.par_nombre,
+      'horarios', COALESCE(x.horarios, 0),
+      'reservas', COALESCE(x.reservas, 0),
+      'pagos_pendientes', COALESCE(x.pendientes, 0),
+      'pagos_pagados', COALESCE(x.pagados, 0),
+      'pagos_anulados', COALESCE(x.anulados, 0),
+      'monto_pagado', COALESCE(x.monto_pagado, 0),
+      'monto_pendiente', COALESCE(x.monto_pendiente, 0)
+    ),
+    NOW()
+  FROM dias d
+  LEFT JOIN por_dia x ON x.parroquiaid = d.parroquiaid AND x.h_fecha = d.fecha
+  ON CONFLICT (fecha, parroquiaid) DO UPDATE
+  SET horarios = EXCLUDED.horarios,
+      resumen = EXCLUDED.resumen,
+      calculado_at = EXCLUDED.calculado_at;
+
+  GET DIAGNOSTICS escritas = ROW_COUNT;
+  RETURN escritas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Borra los días de agenda que muestran la fila modificada (borrar por PK es barato; el
+-- cálculo queda para la siguiente lectura). Una lectura concurrente con la escritura puede
+-- guardar la versión anterior: la corrige la siguiente escritura del día o el job nocturno.
+CREATE OR REPLACE FUNCTION agenda_invalidar()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_TABLE_NAME = 'horario' THEN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+      DELETE FROM public.agenda_dia WHERE fecha = OLD.h_fecha AND parroquiaid = OLD.parroquiaid;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+      DELETE FROM public.agenda_dia WHERE fecha = NEW.h_fecha AND parroquiaid = NEW.parroquiaid;
+    END IF;
+  ELSIF TG_TABLE_NAME = 'reserva' THEN
+    -- Si el horario ya no existe (borrado en cascada) lo invalidó su propio trigger
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+      DELETE FROM public.agenda_dia ad
+      USING public.horario h
+      WHERE h.horarioid = OLD.horarioid AND h.h_fecha = OLD.h_fecha
+        AND ad.fecha = h.h_fecha AND ad.parroquiaid = h.parroquiaid;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+      DELETE FROM public.agenda_dia ad
+      USING public.horario h
+      WHERE h.horarioid = NEW.horarioid AND h.h_fecha = NEW.h_fecha
+        AND ad.fecha = h.h_fecha AND ad.parroquiaid = h.parroquiaid;
+    END IF;
+  ELSIF TG_TABLE_NAME = 'pago' THEN
+    DELETE FROM public.agenda_dia ad
+    USING public.reserva r
+    JOIN public.horario h ON h.horarioid = r.horarioid AND h.h_fecha = r.h_fecha
+    WHERE r.pagoid = NEW.pagoid
+      AND ad.fecha = h.h_fecha AND ad.parroquiaid = h.parroquiaid;
+  ELSIF TG_TABLE_NAME = 'persona' THEN
+    DELETE FROM public.agenda_dia ad
+    USING public.reserva r
+    JOIN public.horario h ON h.horarioid = r.horarioid AND h.h_fecha = r.h_fecha
+    WHERE r.personaid = NEW.personaid
+      AND ad.fecha = h.h_fecha AND ad.parroquiaid = h.parroquiaid;
+  ELSIF TG_TABLE_NAME = 'actoliturgico' THEN
+    DELETE FROM public.agenda_dia ad
+    USING public.horario h
+    WHERE h.actoliturgicoid = NEW.actoliturgicoid
+      AND ad.fecha = h.h_fecha AND ad.parroquiaid = h.parroquiaid;
+  ELSIF TG_TABLE_NAME = 'parroquia' THEN
+    DELETE FROM public.agenda_dia WHERE parroquiaid = NEW.parroquiaid;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+  -- Cubre también los contadores (cada reserva actualiza su horario)
+  IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_horario_agenda') THEN
+    CREATE TRIGGER trg_horario_agenda
+    AFTER INSERT OR UPDATE OR DELETE ON public.horario
+    FOR EACH ROW
+    EXECUTE FUNCTION agenda_invalidar();
+  END IF;
+
+  IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_reserva_agenda') THEN
+    CREATE TRIGGER trg_reserva_agenda
+    AFTER INSERT OR DELETE OR UPDATE OF horarioid, h_fecha, personaid, res_persona_nombre, pagoid
+    ON public.reserva
+    FOR EACH ROW
+    EXECUTE FUNCTION agenda_invalidar();
+  END IF;
+
+  IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_pago_agenda') THEN
+    CREATE TRIGGER trg_pago_agenda
+    AFTER UPDATE OF pago_estado, pago_monto ON public.pago
+    FOR EACH ROW
+    WHEN (OLD.pago_estado IS DISTINCT FROM NEW.pago_estado OR OLD.pago_monto IS DISTINCT FROM NEW.pago_monto)
+    EXECUTE FUNCTION agenda_invalidar();
+  END IF;
+
+  IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_persona_agenda') THEN
+    CREATE TRIGGER trg_persona_agenda
+    AFTER UPDATE OF per_nombres, per_apellidos ON public.persona
+    FOR EACH ROW
+    WHEN (OLD.per_nombres IS DISTINCT FROM NEW.per_nombres OR OLD.per_apellidos IS DISTINCT FROM NEW.per_apellidos)
+    EXECUTE FUNCTION agenda_invalidar();
+  END IF;
+
+  IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_actoliturgico_agenda') THEN
+    CREATE TRIGGER trg_actoliturgico_agenda
+    AFTER UPDATE OF act_titulo, act_nombre ON public.actoliturgico
+    FOR EACH ROW
+    WHEN (OLD.act_titulo IS DISTINCT FROM NEW.act_titulo OR OLD.act_nombre IS DISTINCT FROM NEW.act_nombre)
+    EXECUTE FUNCTION agenda_invalidar();
+  END IF;
+
+  IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trg_parroquia_agenda') THEN
+    CREATE TRIGGER trg_parroquia_agenda
+    AFTER UPDATE OF par_nombre ON public.parroquia
+    FOR EACH ROW
+    WHEN (OLD.par_nombre IS DISTINCT FROM NEW.par_nombre)
+    EXECUTE FUNCTION agenda_invalidar();
+  END IF;
+END$$;
+
+-- Búsquedas de horarios por parroquia y rango de fechas (calendario, listados). Índices
+-- parciales: las filas con borrado lógico no ocupan espacio en los índices de lectura.
+CREATE INDEX IF NOT EXISTS idx_horario_vivos_parroquia_fecha ON public.horario(parroquiaid, h_fecha, h_hora)
+  WHERE deleted_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_horario_vivos_fecha ON public.horario(h_fecha, h_hora) WHERE deleted_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_actoliturgico_vivos ON public.actoliturgico(parroquiaid, actoliturgicoid)
+  WHERE deleted_at IS NULL;
+DROP INDEX IF EXISTS public.idx_horario_parroquia_fecha;
+DROP INDEX IF EXISTS public.idx_horario_fecha;
+
+-- Reporte de ocupación (/reportes/ocupacion): reservas de un rango de meses de todas las
+-- parroquias; con parroquia el plan parte de idx_horario_vivos_parroquia_fecha
+CREATE INDEX IF NOT EXISTS idx_reserva_fecha ON public.reserva(h_fecha, horarioid);
+
+-- Un acto no repite fecha y hora entre sus horarios vivos: permite expandir recurrencias
+-- con ON CONFLICT DO NOTHING (si falla en una base existente, hay horarios duplicados que
+-- se deben depurar antes). Parcial como horario_sin_solape: un horario con borrado lógico
+-- no impide volver a crear el mismo horario antes de la purga. Las sentencias que lo usan
+-- como árbitro repiten el predicado: ON CONFLICT (...) WHERE deleted_at IS NULL.
+DO $$
+BEGIN
+  IF EXISTS (
+    SELECT 1 FROM pg_index
+    WHERE indexrelid = to_regclass('public.uq_horario_acto_fecha_hora') AND indpred IS NULL
+  ) THEN
+    DROP INDEX public.uq_horario_acto_fecha_hora;
+  END IF;
+END$$;
+CREATE UNIQUE INDEX IF NOT EXISTS uq_horario_acto_fecha_hora ON public.horario(actoliturgicoid, h_fecha, h_hora)
+  WHERE deleted_at IS NULL;
+
+-- Cola del purgador: sólo las filas marcadas
+CREATE INDEX IF NOT EXISTS idx_horario_borrados ON public.horario(horarioid) WHERE deleted_at IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_actoliturgico_borrados ON public.actoliturgico(actoliturgicoid)
+  WHERE deleted_at IS NOT NULL;
+
+-- Dos horarios de la misma parroquia no pueden cruzarse (la app responde 409).
+-- El índice GiST de la restricción sirve también a la disponibilidad (h_rango && rango)
+-- y al reporte de conflictos. Si la base ya tiene horarios solapados la restricción no
+-- se crea: se listan con GET /api/liturgical/horarios/conflictos, se corrigen y se vuelve
+-- a cargar este script; mientras tanto queda el índice GiST simple.
+-- Con horario particionado la restricción va en cada partición (ver más abajo).
+DO $$
+BEGIN
+  IF (SELECT relkind FROM pg_class WHERE oid = 'public.horario'::regclass) <> 'r' THEN
+    RETURN;
+  END IF;
+
+  -- Versión anterior sin predicado: los horarios borrados no deben ocupar la agenda
+  IF EXISTS (
+    SELECT 1 FROM pg_constraint
+    WHERE conname = 'horario_sin_solape' AND pg_get_constraintdef(oid) NOT LIKE '%deleted_at%'
+  ) THEN
+    ALTER TABLE public.horario DROP CONSTRAINT horario_sin_solape;
+  END IF;
+
+  IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'horario_sin_solape') THEN
+    BEGIN
+      ALTER TABLE public.horario ADD CONSTRAINT horario_sin_solape
+        EXCLUDE USING gist (parroquiaid WITH =, h_rango WITH &&) WHERE (deleted_at IS NULL);
+    EXCEPTION WHEN exclusion_violation THEN
+      RAISE WARNING 'horario_sin_solape no se creó: hay horarios solapados en la misma parroquia';
+    END;
+  END IF;
+
+  IF EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'horario_sin_solape') THEN
+    DROP INDEX IF EXISTS public.idx_horario_parroquia_rango;
+  ELSE
+    CREATE INDEX IF NOT EXISTS idx_horario_parroquia_rango ON public.horario USING gist (parroquiaid, h_rango)
+      WHERE deleted_at IS NULL;
+  END IF;
+END$$;
+
+-- ---------------------------------------------------------
+-- Particiones mensuales de horario y reserva por h_fecha
+-- La conversión la hace scripts/partition_horario_reserva.py (una vez); con tablas
+-- normales estas funciones no hacen nada. Los índices de las secciones 4 y 6 creados
+-- sobre la tabla particionada existen en cada partición, así que las consultas de la
+-- ventana del calendario y el autovacuum sólo tocan los meses recientes.
+-- ---------------------------------------------------------
+
+-- Postgres no admite la exclusión de solapes sobre la tabla particionada (h_rango no es la
+-- clave de partición): se crea en cada partición. Un cruce entre las 23:xx del último día
+-- de un mes y el día 1 siguiente no se detecta. Si la partición ya tiene solapes queda un
+-- índice GiST simple, como en la tabla normal.
+CREATE OR REPLACE FUNCTION horario_particion_sin_solape(p_particion TEXT)
+RETURNS VOID AS $$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_constraint
+    WHERE conrelid = format('public.%I', p_particion)::regclass AND conname = p_particion || '_sin_solape'
+  ) THEN
+    BEGIN
+      EXECUTE format(
+        'ALTER TABLE public.%I ADD CONSTRAINT %I '
+        'EXCLUDE USING gist (parroquiaid WITH =, h_rango WITH &&) WHERE (deleted_at IS NULL)',
+        p_particion, p_particion || '_sin_solape');
+    EXCEPTION WHEN exclusion_violation THEN
+      RAISE WARNING '%_sin_solape no se creó: hay horarios solapados en la misma parroquia', p_particion;
+      EXECUTE format(
+        'CREATE INDEX IF NOT EXISTS %I ON public.%I USING gist (parroquiaid, h_rango) WHERE deleted_at IS NULL',
+        p_particion || '_rango', p_particion);
+      RETURN;
+    END;
+  END IF;
+  EXECUTE format('DROP INDEX IF EXISTS public.%I', p_particion || '_rango');
+END;
+$$ LANGUAGE plpgsql;
+
+-- Crea las particiones mensuales que falten hasta el mes de p_hasta (por defecto desde hace
+-- un año) y devuelve el primer día no cubierto. Idempotente; NULL si horario no está
+-- particionado. La llaman la app antes de escribir horarios (app/utils/partitions.py) y el
+-- cron scripts/crear_particiones.py, que mantiene PARTICIONES_MESES_ADELANTE meses creados.
+-- Más de 10 años adelante es un error (una fecha mal escrita crearía miles de particiones
+-- con el advisory lock tomado); la app ya limita antes a HORARIO_HORIZONTE_MAX_DIAS.
+CREATE OR REPLACE FUNCTION crear_particiones(p_hasta DATE, p_desde DATE DEFAULT NULL)
+RETURNS DATE AS $$
+DECLARE
+  v_mes DATE := date_trunc('month', COALESCE(p_desde, CURRENT_DATE - INTERVAL '12 months'))::DATE;
+  v_fin DATE := (date_trunc('month', p_hasta) + INTERVAL '1 month')::DATE;
+  v_sufijo TEXT;
+BEGIN
+  IF (SELECT relkind FROM pg_class WHERE oid = 'public.horario'::regclass) <> 'p' THEN
+    RETURN NULL;
+  END IF;
+  IF p_hasta > CURRENT_DATE + INTERVAL '10 years' THEN
+    RAISE EXCEPTION 'crear_particiones: % está a más de 10 años', p_hasta
+      USING ERRCODE = 'invalid_parameter_value';
+  END IF;
+  -- Camino rápido: el mes pedido ya existe (los anteriores se crean siempre antes)
+  IF to_regclass(format('public.horario_%s', to_char(p_hasta, '"p"YYYY_MM'))) IS NOT NULL
+     AND to_regclass(format('public.reserva_%s', to_char(p_hasta, '"p"YYYY_MM'))) IS NOT NULL THEN
+    RETURN v_fin;
+  END IF;
+
+  -- Dos sesiones creando el mismo mes: la segunda espera y ya lo encuentra
+  PERFORM pg_advisory_xact_lock(hashtext('crear_particiones'));
+  WHILE v_mes < v_fin LOOP
+    v_sufijo := to_char(v_mes, '"p"YYYY_MM');
+    IF to_regclass('public.horario_' || v_sufijo) IS NULL THEN
+      EXECUTE format('CREATE TABLE public.%I PARTITION OF public.horario FOR VALUES FROM (%L) TO (%L)',
+                     'horario_' || v_sufijo, v_mes, (v_mes + INTERVAL '1 month')::DATE);
+      PERFORM horario_particion_sin_solape('horario_' || v_sufijo);
+    END IF;
+    IF to_regclass('public.reserva_' || v_sufijo) IS NULL THEN
+      EXECUTE format('CREATE TABLE public.%I PARTITION OF public.reserva FOR VALUES FROM (%L) TO (%L)',
+                     'reserva_' || v_sufijo, v_mes, (v_mes + INTERVAL '1 month')::DATE);
+    END IF;
+    v_mes := (v_mes + INTERVAL '1 month')::DATE;
+  END LOOP;
+  RETURN v_fin;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Reservas archivadas como filas (consultas de reportes en SQL). Mismas columnas que
+-- RESERVA_ARCHIVADA en app/utils/archive.py. Los filtros se aplican después de expandir
+-- cada bloque: para rangos acotados conviene filtrar antes archivo_bloque por parroquiaid,
+-- desde y hasta, como hace la app (archived_reservas_sql).
+CREATE OR REPLACE VIEW public.reserva_archivada AS
+SELECT x.*
+FROM public.archivo_bloque b
+CROSS JOIN LATERAL jsonb_to_recordset(b.datos) AS x(
+  reservaid INTEGER, horarioid INTEGER, h_fecha DATE, h_hora TIME, actoliturgicoid INTEGER,
+  act_nombre VARCHAR, act_titulo VARCHAR, parroquiaid INTEGER, parroquia_nombre VARCHAR,
+  personaid INTEGER, persona_nombre TEXT, res_persona_nombre VARCHAR, res_descripcion TEXT,
+  pagoid INTEGER, pago_estado VARCHAR, pago_monto NUMERIC, pago_medio VARCHAR,
+  created_at TIMESTAMP, updated_at TIMESTAMP
+)
+WHERE b.tipo = 'reserva';
+
+-- Reintenta la exclusión en las particiones que quedaron sólo con el índice GiST
+DO $$
+BEGIN
+  IF (SELECT relkind FROM pg_class WHERE oid = 'public.horario'::regclass) = 'p' THEN
+    PERFORM horario_particion_sin_solape(c.relname)
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'public.horario'::regclass;
+  END IF;
+END$$;
+
 -- =========================================================
 -- 11) CONSULTAS ÚTILES PARA REPORTES Y DEBUGGING
 -- =========================================================
@@ -530,7 +1548,7 @@ SELECT
   -- Información de persona
   per.per_nombres || ' ' || per.per_apellidos as persona_nombre
 FROM public.reserva r
-LEFT JOIN public.horario h ON r.horarioid = h.horarioid
+LEFT JOIN public.horario h ON r.horarioid = h.horarioid AND r.h_fecha = h.h_fecha
 LEFT JOIN public.actoliturgico a ON h.actoliturgicoid = a.actoliturgicoid
 LEFT JOIN public.parroquia p ON a.parroquiaid = p.parroquiaid
 LEFT JOIN public.pago pg ON r.pagoid = pg.pagoid
@@ -554,7 +1572,7 @@ SELECT
   p.par_nombre as parroquia_nombre
 FROM public.pago pg
 LEFT JOIN public.reserva r ON pg.pagoid = r.pagoid
-LEFT JOIN public.horario h ON r.horarioid = h.horarioid
+LEFT JOIN public.horario h ON r.horarioid = h.horarioid AND r.h_fecha = h.h_fecha
 LEFT JOIN public.actoliturgico a ON h.actoliturgicoid = a.actoliturgicoid
 LEFT JOIN public.parroquia p ON a.parroquiaid = p.parroquiaid
 WHERE pg.pago_estado = 'pendiente'
@@ -586,7 +1604,7 @@ SELECT
 FROM public.horario h
 LEFT JOIN public.actoliturgico a ON h.actoliturgicoid = a.actoliturgicoid
 LEFT JOIN public.parroquia p ON a.parroquiaid = p.parroquiaid
-LEFT JOIN public.reserva r ON h.horarioid = r.horarioid
+LEFT JOIN public.reserva r ON h.horarioid = r.horarioid AND h.h_fecha = r.h_fecha
 LEFT JOIN public.pago pg ON r.pagoid = pg.pagoid
 WHERE h.h_fecha = CURRENT_DATE + INTERVAL '1 day' -- Ejemplo: horarios para mañana
 GROUP BY h.horarioid, h.h_fecha, h.h_hora, a.act_nombre, a.act_titulo, p.par_nombre
@@ -601,7 +1619,7 @@ SELECT
   COUNT(CASE WHEN COALESCE(pg.pago_estado, 'pendiente') IN ('vencido', 'fallido') THEN 1 END) as reservas_canceladas
 FROM public.actoliturgico a
 LEFT JOIN public.horario h ON a.actoliturgicoid = h.actoliturgicoid
-LEFT JOIN public.reserva r ON h.horarioid = r.horarioid
+LEFT JOIN public.reserva r ON h.horarioid = r.horarioid AND h.h_fecha = r.h_fecha
 LEFT JOIN public.pago pg ON r.pagoid = pg.pagoid
 WHERE a.act_estado = TRUE
 GROUP BY a.act_nombre
@@ -621,7 +1639,7 @@ SELECT
 FROM public.horario h
 LEFT JOIN public.actoliturgico a ON h.actoliturgicoid = a.actoliturgicoid
 LEFT JOIN public.parroquia p ON a.parroquiaid = p.parroquiaid
-LEFT JOIN public.reserva r ON h.horarioid = r.horarioid
+LEFT JOIN public.reserva r ON h.horarioid = r.horarioid AND h.h_fecha = r.h_fecha
 LEFT JOIN public.pago pg ON r.pagoid = pg.pagoid
 WHERE h.h_fecha >= CURRENT_DATE
   AND h.h_fecha < CURRENT_DATE + INTERVAL '30 days'
@@ -0,0 +1,20 @@
+# dedupe_personas.py (ejecutar con: python scripts/dedupe_personas.py [--parroquia ID])
+# Busca personas duplicadas por bloques (fonética + año de nacimiento + parroquia) y registra
+# los pares en persona_merge_candidato. Se revisan/aplican desde /api/personas/duplicados.
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.utils.persona_dedupe import detect_duplicates
+
+parser = argparse.ArgumentParser(description='Detecta personas duplicadas')
+parser.add_argument('--parroquia', type=int, default=None, help='procesar sólo esta parroquia')
+args = parser.parse_args()
+
+app = create_app()
+with app.app_context():
+    nuevos = detect_duplicates(args.parroquia)
+    print(f"✅ Candidatos nuevos a fusión: {nuevos}")
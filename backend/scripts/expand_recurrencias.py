@@ -0,0 +1,30 @@
+# expand_recurrencias.py (ejecutar con: python scripts/expand_recurrencias.py [--dias N] [--parroquia ID])
+# Genera los horarios de las reglas activas de horario_recurrencia hasta N días adelante.
+# Pensado para correr a diario (cron): es idempotente y sólo inserta los horarios que faltan.
+import os
+import sys
+import time
+import argparse
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from app.utils.recurrence import expand_recurrences
+
+parser = argparse.ArgumentParser(description='Expandir reglas de recurrencia en horarios')
+parser.add_argument('--dias', type=int, default=None, help='horizonte en días (por defecto RECURRENCIA_HORIZONTE_DIAS)')
+parser.add_argument('--parroquia', type=int, default=None, help='sólo reglas de esta parroquia')
+args = parser.parse_args()
+
+app = create_app()
+with app.app_context():
+    dias = args.dias or app.config.get('RECURRENCIA_HORIZONTE_DIAS', 365)
+    desde = date.today()
+    hasta = desde + timedelta(days=dias)
+
+    inicio = time.monotonic()
+    resultado = expand_recurrences(desde, hasta, parroquiaid=args.parroquia)
+    db.session.commit()
+    print(f"✅ {resultado['reglas']} reglas, {resultado['generados']} fechas, "
+          f"{resultado['creados']} horarios nuevos ({desde} a {hasta}) en {time.monotonic() - inicio:.2f}s")
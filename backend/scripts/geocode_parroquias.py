@@ -0,0 +1,24 @@
+# geocode_parroquias.py (ejecutar con: python scripts/geocode_parroquias.py [--limit N])
+# Geocodifica en backend las parroquias que aún no tienen par_latitud/par_longitud.
+# Las direcciones ya resueltas se toman de geocode_cache, así que volver a ejecutarlo es barato.
+# Las rutas de parroquias no geocodifican al guardar: programarlo (cron) cada pocos minutos
+# para completar las parroquias nuevas o con dirección cambiada.
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.utils.geocoding import geocode_pending
+
+parser = argparse.ArgumentParser(description='Geocodifica parroquias sin coordenadas')
+parser.add_argument('--limit', type=int, default=None, help='máximo de parroquias a procesar')
+args = parser.parse_args()
+
+app = create_app()
+with app.app_context():
+    ok, pendientes = geocode_pending(limit=args.limit)
+    print(f"✅ Parroquias geocodificadas: {ok}")
+    if pendientes:
+        print(f"⚠️ Parroquias sin coordenadas (revisar dirección): {pendientes}")
@@ -0,0 +1,190 @@
+# partition_horario_reserva.py (ejecutar con: python scripts/partition_horario_reserva.py [--meses N])
+# Convierte horario y reserva en tablas particionadas por mes de h_fecha. Se corre una sola vez,
+# con la app detenida: bloquea ambas tablas mientras copia. Todo va en una transacción; si algo
+# falla la base queda como estaba.
+#
+# Requisitos: PostgreSQL 15+ (antes, mover un horario a otro mes borraba sus reservas por el
+# ON DELETE CASCADE en lugar de aplicar el ON UPDATE CASCADE de la FK compuesta), database_full.sql
+# ya cargado (reserva.h_fecha y crear_particiones()) y ningún horario solapado.
+#
+# Particiones: <tabla>_historico (todo lo anterior al 1 de enero del año pasado) y una por mes
+# desde ahí hasta N meses adelante (PARTICIONES_MESES_ADELANTE). Después, scripts/crear_particiones.py
+# (cron) y la propia app crean los meses siguientes.
+#
+# La poda de particiones de las consultas por ventana de fechas se comprueba con EXPLAIN en
+# tests/test_partition_pruning.py (python -m pytest -q tests).
+import os
+import sys
+import time
+import argparse
+from datetime import date
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import text
+from app import create_app, db
+from app.utils.partitions import is_partitioned, list_partitions, month_start
+
+SQL_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), 'database_full.sql'))
+IDENTIDAD = {'horario': 'horarioid', 'reserva': 'reservaid'}
+
+parser = argparse.ArgumentParser(description='Particionar horario y reserva por mes')
+parser.add_argument('--meses', type=int, default=None, help='meses creados por adelantado (por defecto PARTICIONES_MESES_ADELANTE)')
+args = parser.parse_args()
+
+
+def ejecutar(sql, params=None):
+    return db.session.execute(text(sql), params or {})
+
+
+def columnas(tabla):
+    """Columnas copiables (sin h_rango, que es generada)"""
+    return [r.column_name for r in ejecutar("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = :tabla AND is_generated = 'NEVER'
+        ORDER BY ordinal_position
+    """, {'tabla': tabla})]
+
+
+def validar():
+    """Mensaje de error si la base no cumple los requisitos, o None"""
+    if int(ejecutar('SHOW server_version_num').scalar()) < 150000:
+        return 'Se requiere PostgreSQL 15 o superior'
+    if ejecutar("SELECT to_regprocedure('crear_particiones(date, date)')").scalar() is None:
+        return 'Falta crear_particiones(): cargar primero scripts/database_full.sql'
+    nula = ejecutar("""
+        SELECT is_nullable FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = 'reserva' AND column_name = 'h_fecha'
+    """).scalar()
+    if nula != 'NO':
+        return 'Falta reserva.h_fecha NOT NULL: cargar primero scripts/database_full.sql'
+    solapes = ejecutar("""
+        SELECT COUNT(*)
+        FROM public.horario h1
+        JOIN public.horario h2
+          ON h2.parroquiaid = h1.parroquiaid
+         AND h2.horarioid > h1.horarioid
+         AND h2.h_rango && h1.h_rango
+        WHERE h1.deleted_at IS NULL AND h2.deleted_at IS NULL
+    """).scalar()
+    if solapes:
+        return (f'Hay {solapes} pares de horarios solapados: corregirlos antes '
+                '(GET /api/liturgical/horarios/conflictos)')
+    return None
+
+
+def renombrar_antigua(tabla):
+    """tabla → tabla_old junto con sus índices y su secuencia, para liberar los nombres"""
+    secuencia = ejecutar('SELECT pg_get_serial_sequence(:tabla, :col)',
+                         {'tabla': f'public.{tabla}', 'col': IDENTIDAD[tabla]}).scalar()
+    indices = [r.relname for r in ejecutar("""
+        SELECT c.relname
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = CAST(:tabla AS regclass)
+    """, {'tabla': f'public.{tabla}'})]
+    ejecutar(f'ALTER TABLE public.{tabla} RENAME TO {tabla}_old')
+    for indice in indices:
+        ejecutar(f'ALTER INDEX public."{indice}" RENAME TO "{indice}_old"')
+    ejecutar(f'ALTER SEQUENCE {secuencia} RENAME TO {tabla}_old_{IDENTIDAD[tabla]}_seq')
+
+
+def crear_particionada(tabla, inicio):
+    """Tabla particionada con la misma definición que tabla_old, más su partición histórica"""
+    ejecutar(f"""
+        CREATE TABLE public.{tabla} (
+            LIKE public.{tabla}_old
+            INCLUDING DEFAULTS INCLUDING GENERATED INCLUDING IDENTITY INCLUDING CONSTRAINTS
+        ) PARTITION BY RANGE (h_fecha)
+    """)
+    ejecutar(f"""
+        CREATE TABLE public.{tabla}_historico PARTITION OF public.{tabla}
+        FOR VALUES FROM (MINVALUE) TO ('{inicio.isoformat()}')
+    """)
+
+
+def copiar(tabla):
+    cols = ', '.join(columnas(f'{tabla}_old'))
+    filas = ejecutar(f"""
+        INSERT INTO public.{tabla} ({cols})
+        OVERRIDING SYSTEM VALUE
+        SELECT {cols} FROM public.{tabla}_old
+    """).rowcount
+    # La identidad nueva sigue donde iba la antigua
+    ejecutar(f"""
+        SELECT setval(pg_get_serial_sequence('public.{tabla}', '{IDENTIDAD[tabla]}'),
+                      nextval('public.{tabla}_old_{IDENTIDAD[tabla]}_seq'), false)
+    """)
+    return filas
+
+
+def migrar(meses):
+    hoy = date.today()
+    inicio = date(hoy.year - 1, 1, 1)
+    hasta = month_start(hoy, meses)
+
+    ejecutar("SET LOCAL lock_timeout = '10s'")
+    ejecutar('LOCK TABLE public.horario, public.reserva IN ACCESS EXCLUSIVE MODE')
+    error = validar()
+    if error:
+        db.session.rollback()
+        print(f'❌ {error}')
+        sys.exit(1)
+
+    for tabla in ('reserva', 'horario'):
+        renombrar_antigua(tabla)
+    for tabla in ('horario', 'reserva'):
+        crear_particionada(tabla, inicio)
+    ejecutar("SELECT horario_particion_sin_solape('horario_historico')")
+    ejecutar('SELECT crear_particiones(:hasta, :desde)', {'hasta': hasta, 'desde': inicio})
+
+    horarios = copiar('horario')
+    reservas = copiar('reserva')
+
+    # La clave de partición tiene que ser parte de la PK; la FK de reserva usa (horarioid, h_fecha)
+    ejecutar('ALTER TABLE public.horario ADD CONSTRAINT horario_pkey PRIMARY KEY (horarioid, h_fecha)')
+    ejecutar('ALTER TABLE public.reserva ADD CONSTRAINT reserva_pkey PRIMARY KEY (reservaid, h_fecha)')
+    ejecutar("""
+        ALTER TABLE public.horario ADD CONSTRAINT horario_actoliturgicoid_fkey FOREIGN KEY (actoliturgicoid)
+          REFERENCES public.actoliturgico(actoliturgicoid) ON DELETE CASCADE
+    """)
+    ejecutar("""
+        ALTER TABLE public.reserva ADD CONSTRAINT reserva_personaid_fkey FOREIGN KEY (personaid)
+          REFERENCES public.persona(personaid) ON DELETE SET NULL
+    """)
+    ejecutar("""
+        ALTER TABLE public.reserva ADD CONSTRAINT reserva_pagoid_fkey FOREIGN KEY (pagoid)
+          REFERENCES public.pago(pagoid) ON DELETE SET NULL
+    """)
+    ejecutar("""
+        ALTER TABLE public.reserva ADD CONSTRAINT reserva_horario_fkey FOREIGN KEY (horarioid, h_fecha)
+          REFERENCES public.horario(horarioid, h_fecha) ON UPDATE CASCADE ON DELETE CASCADE
+    """)
+
+    ejecutar('DROP TABLE public.reserva_old')
+    ejecutar('DROP TABLE public.horario_old')
+
+    # Índices (se propagan a cada partición), triggers y funciones vuelven a salir del esquema
+    with open(SQL_PATH, 'r', encoding='utf-8') as f:
+        esquema = f.read()
+    cursor = db.session.connection().connection.cursor()
+    cursor.execute(esquema)
+    cursor.close()
+
+    ejecutar('ANALYZE public.horario')
+    ejecutar('ANALYZE public.reserva')
+    db.session.commit()
+    return horarios, reservas
+
+
+app = create_app()
+with app.app_context():
+    meses = args.meses or app.config.get('PARTICIONES_MESES_ADELANTE', 36)
+
+    if is_partitioned():
+        print('ℹ️ horario ya está particionado')
+        sys.exit(0)
+    inicio = time.monotonic()
+    horarios, reservas = migrar(meses)
+    print(f"✅ {horarios} horarios y {reservas} reservas copiados a "
+          f"{len(list_partitions('horario'))} particiones en {time.monotonic() - inicio:.2f}s")
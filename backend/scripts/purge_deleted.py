@@ -0,0 +1,27 @@
+# purge_deleted.py (ejecutar con: python scripts/purge_deleted.py [--lote N] [--pausa S])
+# Borra por lotes los actos y horarios con borrado lógico (deleted_at) y sus reservas.
+# Pensado para correr cada pocos minutos (cron): un commit por lote, sin bloqueos largos.
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app
+from app.utils.purge import purge_deleted
+
+parser = argparse.ArgumentParser(description='Purgar actos/horarios con borrado lógico')
+parser.add_argument('--lote', type=int, default=None, help='filas por lote (por defecto PURGA_LOTE)')
+parser.add_argument('--pausa', type=float, default=0.05, help='segundos de espera entre lotes')
+args = parser.parse_args()
+
+app = create_app()
+with app.app_context():
+    lote = args.lote or app.config.get('PURGA_LOTE', 1000)
+
+    inicio = time.monotonic()
+    resultado = purge_deleted(lote=lote, pausa=args.pausa)
+    print(f"✅ Purga: {resultado['reservas']} reservas, {resultado['horarios']} horarios, "
+          f"{resultado['actos']} actos borrados ({resultado['horarios_marcados']} horarios de actos "
+          f"borrados marcados) en {time.monotonic() - inicio:.2f}s")
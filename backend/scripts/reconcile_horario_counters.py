@@ -0,0 +1,25 @@
+# reconcile_horario_counters.py (ejecutar con: python scripts/reconcile_horario_counters.py [--dry-run])
+# Recalcula horario.reservas_total / reservas_activas desde reserva y pago y corrige los desfasados.
+# Los triggers mantienen los contadores al día; esto es para cargas directas o restauraciones.
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import text
+from app import create_app, db
+
+parser = argparse.ArgumentParser(description='Reconciliar contadores de reservas por horario')
+parser.add_argument('--dry-run', action='store_true', help='sólo informar, sin guardar cambios')
+args = parser.parse_args()
+
+app = create_app()
+with app.app_context():
+    corregidos = db.session.execute(text('SELECT reconciliar_contadores_horario()')).scalar()
+    if args.dry_run:
+        db.session.rollback()
+        print(f"🔎 Horarios con contadores desfasados: {corregidos}")
+    else:
+        db.session.commit()
+        print(f"✅ Horarios corregidos: {corregidos}")
@@ -0,0 +1,37 @@
+# warm_agenda.py (ejecutar con: python scripts/warm_agenda.py [--dias N] [--parroquia ID])
+# Recalcula la agenda del día (agenda_dia) de hoy a N días adelante para todas las parroquias
+# y borra la de días pasados más viejos que AGENDA_DIAS_ATRAS. Pensado para correr cada noche
+# (cron): los triggers sólo invalidan, así la primera consulta del día ya encuentra la agenda.
+import os
+import sys
+import time
+import argparse
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from app.utils.agenda import prune_agenda, refresh_agenda
+
+parser = argparse.ArgumentParser(description='Precalcular la agenda del día por parroquia')
+parser.add_argument('--dias', type=int, default=None, help='días por adelantado (por defecto AGENDA_DIAS_ADELANTE)')
+parser.add_argument('--parroquia', type=int, default=None, help='sólo esta parroquia')
+args = parser.parse_args()
+
+app = create_app()
+with app.app_context():
+    dias = args.dias if args.dias is not None else app.config.get('AGENDA_DIAS_ADELANTE', 14)
+    atras = app.config.get('AGENDA_DIAS_ATRAS', 7)
+    hoy = date.today()
+
+    inicio = time.monotonic()
+    # Un día por transacción: no se bloquea la agenda entera mientras se calcula
+    escritas = 0
+    for i in range(dias + 1):
+        dia = hoy + timedelta(days=i)
+        escritas += refresh_agenda(dia, dia, args.parroquia)
+        db.session.commit()
+    borradas = prune_agenda(hoy - timedelta(days=atras))
+    db.session.commit()
+    print(f'✅ Agenda: {escritas} días-parroquia calculados ({hoy} a {hoy + timedelta(days=dias)}), '
+          f'{borradas} filas antiguas borradas en {time.monotonic() - inicio:.2f}s')
@@ -0,0 +1,116 @@
+"""Fixtures comunes de las pruebas (ejecutar desde backend/: python -m pytest -q tests).
+
+Las pruebas usan la base que configura create_app (PostgreSQL con scripts/database_full.sql
+cargado); si no hay conexión se omiten. Los datos de prueba cuelgan de una parroquia
+creada para la sesión y se borran al terminar.
+"""
+import itertools
+import os
+import sys
+import uuid
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, text
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        try:
+            db.session.execute(text('SELECT 1'))
+        except Exception as e:
+            pytest.skip(f'PostgreSQL no disponible: {e}')
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture(scope='session')
+def datos(app):
+    """Usuario y parroquia (con su distrito) de la sesión de pruebas"""
+    marca = uuid.uuid4().hex[:8]
+    ids = {}
+    ids['departamentoid'] = db.session.execute(text(
+        'INSERT INTO public.departamento (dep_nombre) VALUES (:n) RETURNING departamentoid'
+    ), {'n': f'Prueba {marca}'}).scalar()
+    ids['provinciaid'] = db.session.execute(text(
+        'INSERT INTO public.provincia (prov_nombre, departamentoid) VALUES (:n, :d) RETURNING provinciaid'
+    ), {'n': f'Prueba {marca}', 'd': ids['departamentoid']}).scalar()
+    ids['distritoid'] = db.session.execute(text(
+        'INSERT INTO public.distrito (dis_nombre, provinciaid) VALUES (:n, :p) RETURNING distritoid'
+    ), {'n': f'Prueba {marca}', 'p': ids['provinciaid']}).scalar()
+    ids['parroquiaid'] = db.session.execute(text("""
+        INSERT INTO public.parroquia (par_nombre, par_direccion, par_telefono1, distritoid)
+        VALUES (:n, 'Calle de prueba 1', '000000000', :d)
+        RETURNING parroquiaid
+    """), {'n': f'Parroquia de prueba {marca}', 'd': ids['distritoid']}).scalar()
+    ids['userid'] = db.session.execute(text("""
+        INSERT INTO public.users (name, email, password_hash, role)
+        VALUES ('Pruebas', :email, 'x', 'admin')
+        RETURNING id
+    """), {'email': f'pruebas-{marca}@example.com'}).scalar()
+    db.session.commit()
+    ids['token'] = create_access_token(identity=str(ids['userid']))
+    ids['dias'] = itertools.count(30, 2)  # cada prueba puede usar su día y el siguiente
+
+    yield ids
+
+    db.session.rollback()
+    # Primero los actos (y en cascada horarios y reservas): borrar un pago vencido con sus
+    # reservas todavía en un horario lleno se rechaza (horario_capacidad)
+    pagos = [r.pagoid for r in db.session.execute(text("""
+        SELECT r.pagoid FROM public.reserva r
+        JOIN public.horario h ON h.horarioid = r.horarioid AND h.h_fecha = r.h_fecha
+        WHERE h.parroquiaid = :p AND r.pagoid IS NOT NULL
+    """), {'p': ids['parroquiaid']})]
+    db.session.execute(text('DELETE FROM public.actoliturgico WHERE parroquiaid = :p'), {'p': ids['parroquiaid']})
+    db.session.execute(text('DELETE FROM public.pago WHERE pagoid = ANY(:ids)'), {'ids': pagos})
+    db.session.execute(text('DELETE FROM public.parroquia WHERE parroquiaid = :p'), {'p': ids['parroquiaid']})
+    db.session.execute(text('DELETE FROM public.distrito WHERE distritoid = :d'), {'d': ids['distritoid']})
+    db.session.execute(text('DELETE FROM public.provincia WHERE provinciaid = :p'), {'p': ids['provinciaid']})
+    db.session.execute(text('DELETE FROM public.departamento WHERE departamentoid = :d'), {'d': ids['departamentoid']})
+    db.session.execute(text('DELETE FROM public.users WHERE id = :u'), {'u': ids['userid']})
+    db.session.commit()
+
+
+@pytest.fixture
+def fecha(datos):
+    """Un día futuro propio de la prueba (y el siguiente): los horarios de la parroquia no se
+    cruzan entre pruebas"""
+    return date.today() + timedelta(days=next(datos['dias']))
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth(datos):
+    return {'Authorization': f"Bearer {datos['token']}"}
+
+
+@pytest.fixture
+def sentencias(app):
+    """Context manager que junta las sentencias SQL enviadas a la base mientras está abierto"""
+    @contextmanager
+    def contar():
+        enviadas = []
+
+        def registrar(conn, cursor, statement, parameters, context, executemany):
+            enviadas.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', registrar)
+        try:
+            yield enviadas
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', registrar)
+    return contar
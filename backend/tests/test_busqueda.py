@@ -0,0 +1,59 @@
+"""GET /api/liturgical/search: búsqueda de texto en actos y reservas (sin tildes, -excluir,
+filtro por tipos, actos borrados fuera)"""
+import random
+import string
+
+import pytest
+
+API = '/api/liturgical'
+
+
+@pytest.fixture
+def palabra(client, auth, datos, fecha):
+    """Palabra única en el título de un acto con horario y una reserva de 'María' en él"""
+    palabra = ''.join(random.choices(string.ascii_lowercase, k=10))
+    r = client.post(f'{API}/actos-con-horario', json={
+        'parroquiaid': datos['parroquiaid'], 'act_nombre': 'matrimonio', 'act_titulo': f'Boda {palabra}',
+        'h_fecha': fecha.isoformat(), 'h_hora': '17:00'
+    }, headers=auth)
+    assert r.status_code == 201, r.get_json()
+    cuerpo = r.get_json()
+    r = client.post(f'{API}/reservas', json={
+        'horarioid': cuerpo['horario']['horarioid'], 'persona_nombre': 'María Quispe'
+    }, headers=auth)
+    assert r.status_code == 201, r.get_json()
+    return palabra, cuerpo['acto']['actoliturgicoid']
+
+
+def _buscar(client, auth, datos, q, **extra):
+    r = client.get(f'{API}/search', query_string={'q': q, 'parroquiaid': datos['parroquiaid'], **extra},
+                   headers=auth)
+    assert r.status_code == 200, r.get_json()
+    return r.get_json()['items']
+
+
+def test_busca_acto_y_reservas(client, auth, datos, palabra):
+    items = _buscar(client, auth, datos, palabra[0])
+    assert sorted(i['tipo'] for i in items) == ['acto', 'reserva']
+    acto = next(i for i in items if i['tipo'] == 'acto')
+    assert acto['id'] == palabra[1]
+    assert '«' in acto['fragmento']
+
+
+def test_sin_tildes_y_exclusion(client, auth, datos, palabra):
+    assert [i['tipo'] for i in _buscar(client, auth, datos, f'maria {palabra[0]}')] == ['reserva']
+    assert [i['tipo'] for i in _buscar(client, auth, datos, f'{palabra[0]} -maria')] == ['acto']
+
+
+def test_filtro_por_tipos(client, auth, datos, palabra):
+    assert [i['tipo'] for i in _buscar(client, auth, datos, palabra[0], tipos='acto')] == ['acto']
+
+
+def test_acto_borrado(client, auth, datos, palabra):
+    assert client.delete(f'{API}/actos/{palabra[1]}', headers=auth).status_code == 200
+    assert _buscar(client, auth, datos, palabra[0]) == []
+
+
+@pytest.mark.parametrize('params', [{'q': 'a'}, {'q': 'misa', 'tipos': 'horario'}, {'q': 'misa', 'desde': '2026-13-01'}])
+def test_parametros_invalidos(client, auth, params):
+    assert client.get(f'{API}/search', query_string=params, headers=auth).status_code == 400
@@ -0,0 +1,169 @@
+"""Cupos de horario (h_capacidad, reservas_activas): reservas sobre el cupo (409), reservas
+concurrentes, reactivación y borrado de pagos.
+
+Una reserva sin pago es 'pendiente', así que borrar un pago vencido devuelve sus reservas
+a activas: con cupos se cuentan, sin cupos el borrado se rechaza (horario_capacidad).
+"""
+import threading
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+
+API = '/api/liturgical'
+
+
+@pytest.fixture
+def horario(client, auth, datos, fecha):
+    """Fábrica de horarios con capacidad en el día de la prueba"""
+    def crear(capacidad, hora='08:00'):
+        r = client.post(f'{API}/actos', json={
+            'parroquiaid': datos['parroquiaid'], 'act_nombre': 'misa', 'act_titulo': 'Cupos'
+        }, headers=auth)
+        assert r.status_code == 201, r.get_json()
+        r = client.post(f'{API}/horarios', json={
+            'actoliturgicoid': r.get_json()['item']['actoliturgicoid'],
+            'h_fecha': fecha.isoformat(), 'h_hora': hora, 'h_capacidad': capacidad
+        }, headers=auth)
+        assert r.status_code == 201, r.get_json()
+        return r.get_json()['item']
+    return crear
+
+
+def reservar(client, auth, horario, nombre='Reserva de prueba'):
+    return client.post(f'{API}/reservas', json={
+        'horarioid': horario['horarioid'], 'persona_nombre': nombre
+    }, headers=auth)
+
+
+def reserva_con_pago(horario, estado):
+    """Reserva (por SQL) con un pago en `estado`; devuelve el pagoid"""
+    pagoid = db.session.execute(text("""
+        INSERT INTO public.pago (pago_medio, pago_monto, pago_estado, pago_descripcion)
+        VALUES ('Efectivo', 10, :estado, 'Prueba de cupos')
+        RETURNING pagoid
+    """), {'estado': estado}).scalar()
+    db.session.execute(text("""
+        INSERT INTO public.reserva (horarioid, h_fecha, res_persona_nombre, pagoid)
+        VALUES (:h, :f, 'Con pago', :p)
+    """), {'h': horario['horarioid'], 'f': horario['h_fecha'], 'p': pagoid})
+    db.session.commit()
+    return pagoid
+
+
+def contadores(horario):
+    return tuple(db.session.execute(text(
+        'SELECT reservas_total, reservas_activas FROM public.horario WHERE horarioid = :id'
+    ), {'id': horario['horarioid']}).one())
+
+
+def borrar_pago(pagoid):
+    db.session.execute(text('DELETE FROM public.pago WHERE pagoid = :id'), {'id': pagoid})
+    db.session.commit()
+
+
+def test_borrar_pago_vencido_con_horario_lleno(client, auth, horario):
+    h = horario(1)
+    pagoid = reserva_con_pago(h, 'vencido')
+    assert reservar(client, auth, h).status_code == 201
+    assert contadores(h) == (2, 1)
+
+    with pytest.raises(IntegrityError) as error:
+        borrar_pago(pagoid)
+    db.session.rollback()
+    assert error.value.orig.diag.constraint_name == 'horario_capacidad'
+    assert db.session.execute(text('SELECT pago_estado FROM public.pago WHERE pagoid = :id'),
+                              {'id': pagoid}).scalar() == 'vencido'
+    assert contadores(h) == (2, 1)
+
+
+def test_borrar_pago_vencido_con_cupos(horario):
+    h = horario(2)
+    pagoid = reserva_con_pago(h, 'vencido')
+    assert contadores(h) == (1, 0)
+
+    borrar_pago(pagoid)
+    # La reserva queda sin pago (pendiente) y vuelve a ocupar su cupo
+    assert db.session.execute(text('SELECT pagoid FROM public.reserva WHERE horarioid = :id'),
+                              {'id': h['horarioid']}).scalar() is None
+    assert contadores(h) == (1, 1)
+
+
+def test_borrar_pago_pagado(horario):
+    h = horario(1)
+    pagoid = reserva_con_pago(h, 'pagado')
+    borrar_pago(pagoid)
+    assert contadores(h) == (1, 1)
+
+
+def test_reserva_sin_cupo(client, auth, horario):
+    h = horario(1)
+    assert reservar(client, auth, h).status_code == 201
+    r = reservar(client, auth, h)
+    assert r.status_code == 409
+    assert contadores(h) == (1, 1)
+
+
+def test_mover_reserva_a_horario_lleno(client, auth, horario):
+    lleno, libre = horario(1, '08:00'), horario(1, '10:00')
+    assert reservar(client, auth, lleno).status_code == 201
+    reserva = reservar(client, auth, libre).get_json()['item']
+    r = client.put(f"{API}/reservas/{reserva['reservaid']}", json={
+        'horarioid': lleno['horarioid'], 'persona_nombre': 'Otra persona'
+    }, headers=auth)
+    assert r.status_code == 409
+    assert contadores(lleno) == (1, 1)
+    assert contadores(libre) == (1, 1)
+
+
+@pytest.mark.parametrize('lleno', [True, False])
+def test_reactivar_pago(client, auth, horario, lleno):
+    h = horario(1)
+    pagoid = reserva_con_pago(h, 'vencido')
+    if lleno:
+        assert reservar(client, auth, h).status_code == 201
+
+    reactivar = text("UPDATE public.pago SET pago_estado = 'pagado' WHERE pagoid = :id")
+    if lleno:
+        with pytest.raises(IntegrityError) as error:
+            db.session.execute(reactivar, {'id': pagoid})
+        db.session.rollback()
+        assert error.value.orig.diag.constraint_name == 'horario_capacidad'
+        assert contadores(h) == (2, 1)
+    else:
+        db.session.execute(reactivar, {'id': pagoid})
+        db.session.commit()
+        assert contadores(h) == (1, 1)
+
+
+def test_reservas_concurrentes(horario):
+    """Más clientes que cupos a la vez, cada uno con su conexión: ninguno de más"""
+    capacidad, clientes = 3, 10
+    h = horario(capacidad)
+    resultados = []
+    barrera = threading.Barrier(clientes)
+    engine = db.engine  # los hilos no tienen el contexto de la app
+
+    def cliente(n):
+        with engine.connect() as conn:
+            barrera.wait()
+            try:
+                with conn.begin():
+                    conn.execute(text("""
+                        INSERT INTO public.reserva (horarioid, h_fecha, res_persona_nombre)
+                        VALUES (:h, :f, :n)
+                    """), {'h': h['horarioid'], 'f': h['h_fecha'], 'n': f'cliente {n}'})
+                resultados.append('ok')
+            except IntegrityError as e:
+                resultados.append(e.orig.diag.constraint_name)
+
+    hilos = [threading.Thread(target=cliente, args=(n,)) for n in range(clientes)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert sorted(resultados) == ['horario_capacidad'] * (clientes - capacidad) + ['ok'] * capacidad
+    assert contadores(h) == (capacidad, capacidad)
@@ -0,0 +1,29 @@
+"""reconciliar_contadores_horario(): corrige reservas_total/reservas_activas desfasados"""
+from sqlalchemy import text
+
+from app import db
+
+API = '/api/liturgical'
+
+
+def test_reconciliar_contadores(client, auth, datos, fecha):
+    r = client.post(f'{API}/actos-con-horario', json={
+        'parroquiaid': datos['parroquiaid'], 'act_nombre': 'misa', 'act_titulo': 'Contadores',
+        'h_fecha': fecha.isoformat(), 'h_hora': '11:00'
+    }, headers=auth)
+    assert r.status_code == 201, r.get_json()
+    horario = r.get_json()['horario']
+    r = client.post(f'{API}/reservas', json={'horarioid': horario['horarioid'], 'persona_nombre': 'Uno'},
+                    headers=auth)
+    assert r.status_code == 201, r.get_json()
+
+    params = {'id': horario['horarioid'], 'f': fecha}
+    db.session.execute(text("""
+        UPDATE public.horario SET reservas_total = 7, reservas_activas = 5
+        WHERE horarioid = :id AND h_fecha = :f
+    """), params)
+    assert db.session.execute(text('SELECT reconciliar_contadores_horario()')).scalar() >= 1
+    db.session.commit()
+    assert tuple(db.session.execute(text(
+        'SELECT reservas_total, reservas_activas FROM public.horario WHERE horarioid = :id AND h_fecha = :f'
+    ), params).one()) == (1, 1)
@@ -0,0 +1,60 @@
+"""GET /api/liturgical/disponibilidad: huecos libres en la jornada de la parroquia"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.utils.availability import free_slots, merge_intervals
+
+API = '/api/liturgical'
+
+
+def _t(hora):
+    return datetime(2026, 1, 5, *map(int, hora.split(':')))
+
+
+def test_merge_intervals():
+    intervalos = [(_t('08:00'), _t('09:00')), (_t('09:00'), _t('10:00')),
+                  (_t('09:30'), _t('09:45')), (_t('11:00'), _t('12:00'))]
+    assert merge_intervals(intervalos) == [(_t('08:00'), _t('10:00')), (_t('11:00'), _t('12:00'))]
+
+
+def test_free_slots():
+    ocupados = [(_t('07:30'), _t('08:30')), (_t('10:00'), _t('11:00')), (_t('12:30'), _t('14:00'))]
+    ventanas = [(_t('08:00'), _t('13:00'))]
+    huecos = list(free_slots(ventanas, ocupados, [f for _, f in ocupados], timedelta(hours=1)))
+    assert huecos == [(_t('08:30'), _t('10:00')), (_t('11:00'), _t('12:30'))]
+
+
+@pytest.fixture
+def ocupado(client, auth, datos, fecha):
+    """Un horario de 09:00 a 10:00 en el día de la prueba"""
+    r = client.post(f'{API}/actos-con-horario', json={
+        'parroquiaid': datos['parroquiaid'], 'act_nombre': 'misa', 'act_titulo': 'Disponibilidad',
+        'h_fecha': fecha.isoformat(), 'h_hora': '09:00'
+    }, headers=auth)
+    assert r.status_code == 201, r.get_json()
+    return fecha
+
+
+@pytest.mark.parametrize('duracion, esperados', [
+    (60, [('08:00', '09:00'), ('10:00', '13:00'), ('15:00', '20:00')]),
+    (90, [('10:00', '13:00'), ('15:00', '20:00')]),
+])
+def test_disponibilidad(client, auth, datos, ocupado, duracion, esperados):
+    r = client.get(f'{API}/disponibilidad', query_string={
+        'from': ocupado.isoformat(), 'to': ocupado.isoformat(),
+        'parroquiaid': datos['parroquiaid'], 'duracion': duracion
+    }, headers=auth)
+    assert r.status_code == 200, r.get_json()
+    items = r.get_json()['items']
+    assert {i['parroquiaid'] for i in items} == {datos['parroquiaid']}
+    assert [(i['inicio'], i['fin']) for i in items] == esperados
+
+
+@pytest.mark.parametrize('params', [
+    {'from': '2026-02-10', 'to': '2026-02-01'},
+    {'from': '2026-01-01', 'to': '2027-12-31'},
+    {'from': '2026-01-01', 'to': '2026-01-02', 'duracion': 0},
+])
+def test_disponibilidad_parametros_invalidos(client, auth, params):
+    assert client.get(f'{API}/disponibilidad', query_string=params, headers=auth).status_code == 400
@@ -0,0 +1,61 @@
+"""Fechas de horario más allá de HORARIO_HORIZONTE_MAX_DIAS: 400 antes de crear particiones,
+y crear_particiones() se niega por su cuenta a ir más de 10 años adelante"""
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app import db
+from app.utils.partitions import ensure_partitions, is_partitioned, max_horario_date
+
+API = '/api/liturgical'
+LEJANA = '9999-01-01'
+
+
+@pytest.fixture
+def acto(client, auth, datos):
+    r = client.post(f'{API}/actos', json={
+        'parroquiaid': datos['parroquiaid'], 'act_nombre': 'misa', 'act_titulo': 'Horizonte'
+    }, headers=auth)
+    assert r.status_code == 201, r.get_json()
+    return r.get_json()['item']
+
+
+def test_create_horario_fuera_de_horizonte(client, auth, acto):
+    r = client.post(f'{API}/horarios', json={
+        'actoliturgicoid': acto['actoliturgicoid'], 'h_fecha': LEJANA, 'h_hora': '08:00'
+    }, headers=auth)
+    assert r.status_code == 400
+
+
+def test_update_acto_fuera_de_horizonte(client, auth, acto):
+    r = client.put(f"{API}/actos/{acto['actoliturgicoid']}", json={
+        'act_titulo': 'Horizonte', 'h_fecha': LEJANA, 'h_hora': '08:00'
+    }, headers=auth)
+    assert r.status_code == 400
+
+
+def test_bulk_fuera_de_horizonte(client, auth, acto, fecha):
+    r = client.post(f'{API}/horarios/bulk', json={'items': [
+        {'actoliturgicoid': acto['actoliturgicoid'], 'h_fecha': fecha.isoformat(), 'h_hora': '08:00'},
+        {'actoliturgicoid': acto['actoliturgicoid'], 'h_fecha': LEJANA, 'h_hora': '08:00'},
+    ]}, headers=auth)
+    assert r.status_code == 400
+    assert [e['indice'] for e in r.get_json()['errores']] == [1]
+
+
+def test_ensure_partitions_fuera_de_horizonte(app):
+    with pytest.raises(ValueError):
+        ensure_partitions([date(9999, 1, 1)])
+    assert max_horario_date() < date(9999, 1, 1)
+
+
+def test_crear_particiones_tope(app):
+    if not is_partitioned():
+        pytest.skip('horario no está particionado')
+    try:
+        with pytest.raises(DBAPIError, match='más de 10 años'):
+            db.session.execute(text('SELECT crear_particiones(:hasta)'), {'hasta': date(9999, 1, 1)})
+    finally:
+        db.session.rollback()
@@ -0,0 +1,45 @@
+"""Feed iCalendar de una parroquia: ETag y GET condicional (If-None-Match → 304)"""
+API = '/api/liturgical'
+
+
+def _feed(client, datos, etag=None):
+    headers = {'If-None-Match': etag} if etag else {}
+    return client.get(f"{API}/parroquias/{datos['parroquiaid']}/calendar.ics", headers=headers)
+
+
+def _horario(client, auth, datos, fecha, titulo):
+    r = client.post(f'{API}/actos-con-horario', json={
+        'parroquiaid': datos['parroquiaid'], 'act_nombre': 'misa', 'act_titulo': titulo,
+        'h_fecha': fecha.isoformat(), 'h_hora': '12:00'
+    }, headers=auth)
+    assert r.status_code == 201, r.get_json()
+
+
+def test_feed_y_get_condicional(client, auth, datos, fecha):
+    _horario(client, auth, datos, fecha, 'Misa del feed')
+
+    r = _feed(client, datos)
+    assert r.status_code == 200
+    assert r.mimetype == 'text/calendar'
+    cuerpo = r.get_data(as_text=True)
+    assert 'BEGIN:VCALENDAR' in cuerpo and 'Misa del feed' in cuerpo
+    etag = r.headers['ETag']
+
+    r = _feed(client, datos, etag)
+    assert r.status_code == 304
+    assert r.headers['ETag'] == etag
+    assert r.get_data() == b''
+
+
+def test_etag_cambia_con_los_horarios(client, auth, datos, fecha):
+    etag = _feed(client, datos).headers['ETag']
+    _horario(client, auth, datos, fecha, 'Misa nueva')
+
+    r = _feed(client, datos, etag)
+    assert r.status_code == 200
+    assert r.headers['ETag'] != etag
+    assert 'Misa nueva' in r.get_data(as_text=True)
+
+
+def test_parroquia_inexistente(client):
+    assert client.get(f'{API}/parroquias/0/calendar.ics').status_code == 404
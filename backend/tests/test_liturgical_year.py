@@ -0,0 +1,43 @@
+"""Año litúrgico: límites de los tiempos y rango de años de /api/liturgical/anio-liturgico"""
+from datetime import date
+
+import pytest
+
+from app.utils.liturgical_year import ANIO_MAX, ANIO_MIN, classify_date, liturgical_year
+
+API = '/api/liturgical'
+
+
+@pytest.mark.parametrize('trasladar', [True, False])
+def test_bautismo_cierra_navidad(trasladar):
+    bautismo = classify_date(date(2026, 1, 11), trasladar)
+    assert bautismo['fiesta'] == 'bautismo_del_senor'
+    assert bautismo['tiempo'] == 'navidad'
+    assert classify_date(date(2026, 1, 12), trasladar)['tiempo'] == 'ordinario'
+
+
+def test_bautismo_en_lunes():
+    # 2024: Epifanía trasladada al domingo 7, Bautismo el lunes 8
+    assert classify_date(date(2024, 1, 8))['tiempo'] == 'navidad'
+    assert classify_date(date(2024, 1, 9))['semana'] == 1
+    assert classify_date(date(2024, 1, 14))['semana'] == 2
+
+
+def test_ultimo_anio_representable():
+    assert date(9999, 12, 31) in liturgical_year(9999)['dias']
+
+
+@pytest.mark.parametrize('desde, hasta', [
+    (f'{ANIO_MIN - 1}-12-31', f'{ANIO_MIN}-01-01'),
+    (f'{ANIO_MAX}-12-31', f'{ANIO_MAX + 1}-01-01'),
+])
+def test_dias_fuera_de_rango(client, auth, desde, hasta):
+    r = client.get(f'{API}/anio-liturgico/dias', query_string={'from': desde, 'to': hasta}, headers=auth)
+    assert r.status_code == 400
+
+
+def test_dias_dentro_de_rango(client, auth):
+    r = client.get(f'{API}/anio-liturgico/dias', query_string={'from': '2026-01-10', 'to': '2026-01-12'},
+                   headers=auth)
+    assert r.status_code == 200
+    assert [d['tiempo'] for d in r.get_json()['items']] == ['navidad', 'navidad', 'ordinario']
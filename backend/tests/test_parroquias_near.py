@@ -0,0 +1,42 @@
+"""/api/parroquias/near con `direccion`: se resuelve sólo desde geocode_cache, nunca con una
+consulta al proveedor dentro del request"""
+import uuid
+
+import pytest
+from sqlalchemy import text
+
+from app import db
+from app.utils.geocoding import NominatimProvider, normalize_address
+
+
+@pytest.fixture(autouse=True)
+def sin_proveedor(monkeypatch):
+    def geocode(self, query):
+        raise AssertionError('near_parroquias consultó al proveedor de geocodificación')
+    monkeypatch.setattr(NominatimProvider, 'geocode', geocode)
+
+
+@pytest.fixture
+def direccion(app):
+    direccion = f'Av. de prueba {uuid.uuid4().hex[:8]}, Lima'
+    yield direccion
+    db.session.rollback()
+    db.session.execute(text('DELETE FROM public.geocode_cache WHERE direccion_norm = :d'),
+                       {'d': normalize_address(direccion)})
+    db.session.commit()
+
+
+def test_direccion_sin_cache(client, auth, direccion):
+    r = client.get('/api/parroquias/near', query_string={'direccion': direccion}, headers=auth)
+    assert r.status_code == 404
+
+
+def test_direccion_en_cache(client, auth, direccion):
+    db.session.execute(text("""
+        INSERT INTO public.geocode_cache (direccion_norm, latitud, longitud, proveedor)
+        VALUES (:d, -12.05, -77.04, 'prueba')
+    """), {'d': normalize_address(direccion)})
+    db.session.commit()
+    r = client.get('/api/parroquias/near', query_string={'direccion': direccion}, headers=auth)
+    assert r.status_code == 200
+    assert (r.get_json()['lat'], r.get_json()['lon']) == (-12.05, -77.04)
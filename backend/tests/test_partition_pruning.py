@@ -0,0 +1,73 @@
+"""Poda de particiones: las consultas por ventana de fechas (calendario, horarios de un día,
+reservas por rango, disponibilidad) sólo recorren las particiones mensuales de esas fechas.
+
+Se comprueba con EXPLAIN (scanned_partitions) contra expected_partitions. Sólo corren con
+horario y reserva ya particionadas (scripts/partition_horario_reserva.py).
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app.utils.partitions import is_partitioned, scanned_partitions, expected_partitions
+
+HOY = date.today()
+DESDE, HASTA = HOY - timedelta(days=30), HOY + timedelta(days=60)
+INICIO = datetime.combine(DESDE, datetime.min.time())
+FIN = datetime.combine(HASTA + timedelta(days=1), datetime.min.time())
+
+CONSULTAS = [
+    pytest.param(DESDE, HASTA, """
+        SELECT h.h_fecha, h.h_hora, a.act_titulo
+        FROM public.horario h
+        JOIN public.actoliturgico a ON h.actoliturgicoid = a.actoliturgicoid
+        WHERE h.h_fecha BETWEEN :desde AND :hasta
+          AND h.deleted_at IS NULL
+        ORDER BY h.h_fecha, h.h_hora
+    """, {'desde': DESDE, 'hasta': HASTA}, id='calendario'),
+    pytest.param(HOY, HOY, """
+        SELECT h.horarioid, h.h_hora
+        FROM public.horario h
+        WHERE h.h_fecha = :dia AND h.deleted_at IS NULL
+    """, {'dia': HOY}, id='horarios-de-un-dia'),
+    pytest.param(DESDE, HASTA, """
+        SELECT r.reservaid, h.h_hora
+        FROM public.reserva r
+        LEFT JOIN public.horario h ON r.horarioid = h.horarioid AND r.h_fecha = h.h_fecha
+        WHERE h.deleted_at IS NULL
+          AND r.h_fecha >= :desde AND h.h_fecha >= :desde
+          AND r.h_fecha <= :hasta AND h.h_fecha <= :hasta
+        ORDER BY r.created_at DESC, r.reservaid DESC
+        LIMIT 100
+    """, {'desde': DESDE, 'hasta': HASTA}, id='reservas-por-rango'),
+    pytest.param(DESDE, HASTA, """
+        SELECT h.parroquiaid, lower(h.h_rango), upper(h.h_rango)
+        FROM public.horario h
+        WHERE h.h_rango && tsrange(:inicio, :fin)
+          AND h.h_fecha BETWEEN CAST(:inicio AS DATE) - 1 AND CAST(:fin AS DATE)
+          AND h.deleted_at IS NULL
+    """, {'inicio': INICIO, 'fin': FIN}, id='disponibilidad'),
+]
+
+
+@pytest.fixture(autouse=True)
+def particionada(app):
+    if not is_partitioned():
+        pytest.skip('horario no está particionado (scripts/partition_horario_reserva.py)')
+
+
+@pytest.mark.parametrize('desde, hasta, sql, params', CONSULTAS)
+def test_poda_por_fecha(desde, hasta, sql, params):
+    # La disponibilidad lee además el día anterior y el siguiente
+    permitidas = expected_partitions(desde - timedelta(days=1), hasta + timedelta(days=1))
+    escaneadas = scanned_partitions(sql, params)
+    recorridas = set(escaneadas['horario']) | set(escaneadas['reserva'])
+    assert escaneadas['horario'], 'el plan no recorre ninguna partición de horario'
+    assert recorridas <= permitidas, f'sobran: {sorted(recorridas - permitidas)}'
+
+
+def test_sin_filtro_de_fecha_no_poda():
+    """Control: sin h_fecha en el WHERE el plan recorre todas las particiones (incluida la
+    histórica), así que las pruebas de arriba sí detectan una consulta que no poda"""
+    escaneadas = scanned_partitions('SELECT h.horarioid FROM public.horario h WHERE h.deleted_at IS NULL')
+    assert 'horario_historico' in escaneadas['horario']
+    assert not set(escaneadas['horario']) <= expected_partitions(DESDE, HASTA)
@@ -0,0 +1,117 @@
+"""Sentencias por escritura en /api/liturgical: cada endpoint escribe y arma la respuesta
+en una sola sentencia (CTEs con RETURNING). Las escrituras de horarios envían además
+SELECT crear_particiones (ensure_partitions) antes del INSERT/UPDATE.
+"""
+from datetime import timedelta
+
+import pytest
+
+API = '/api/liturgical'
+
+
+def _acto(client, auth, datos, **extra):
+    r = client.post(f'{API}/actos', json={
+        'parroquiaid': datos['parroquiaid'], 'act_nombre': 'misa', 'act_titulo': 'Misa de prueba', **extra
+    }, headers=auth)
+    assert r.status_code == 201, r.get_json()
+    return r.get_json()['item']
+
+
+def _horario(client, auth, acto, fecha, hora):
+    r = client.post(f'{API}/horarios', json={
+        'actoliturgicoid': acto['actoliturgicoid'], 'h_fecha': fecha.isoformat(), 'h_hora': hora
+    }, headers=auth)
+    assert r.status_code == 201, r.get_json()
+    return r.get_json()['item']
+
+
+def _reserva(client, auth, horario):
+    r = client.post(f'{API}/reservas', json={
+        'horarioid': horario['horarioid'], 'persona_nombre': 'Reserva de prueba'
+    }, headers=auth)
+    assert r.status_code == 201, r.get_json()
+    return r.get_json()['item']
+
+
+def _assert_sentencias(enviadas, esperadas):
+    assert len(enviadas) == esperadas, '\n---\n'.join(enviadas)
+
+
+def test_create_acto(client, auth, datos, sentencias):
+    with sentencias() as enviadas:
+        r = client.post(f'{API}/actos', json={
+            'parroquiaid': datos['parroquiaid'], 'act_nombre': 'misa', 'act_titulo': 'Sin horario'
+        }, headers=auth)
+    assert r.status_code == 201
+    _assert_sentencias(enviadas, 1)
+
+
+def test_create_acto_con_horario_opcional(client, auth, datos, fecha, sentencias):
+    with sentencias() as enviadas:
+        r = client.post(f'{API}/actos', json={
+            'parroquiaid': datos['parroquiaid'], 'act_nombre': 'misa', 'act_titulo': 'Con horario',
+            'h_fecha': fecha.isoformat(), 'h_hora': '06:00'
+        }, headers=auth)
+    assert r.status_code == 201
+    assert r.get_json()['item']['horarioid']
+    _assert_sentencias(enviadas, 2)
+
+
+def test_create_acto_con_horario(client, auth, datos, fecha, sentencias):
+    with sentencias() as enviadas:
+        r = client.post(f'{API}/actos-con-horario', json={
+            'parroquiaid': datos['parroquiaid'], 'act_nombre': 'misa', 'act_titulo': 'Acto con horario',
+            'h_fecha': fecha.isoformat(), 'h_hora': '06:00'
+        }, headers=auth)
+    assert r.status_code == 201
+    assert r.get_json()['horario']['horarioid']
+    _assert_sentencias(enviadas, 2)
+
+
+@pytest.mark.parametrize('con_horario', [False, True])
+def test_update_acto(client, auth, datos, fecha, sentencias, con_horario):
+    acto = _acto(client, auth, datos)
+    body = {'act_titulo': 'Actualizado'}
+    if con_horario:
+        body.update({'h_fecha': fecha.isoformat(), 'h_hora': '07:00'})
+    with sentencias() as enviadas:
+        r = client.put(f"{API}/actos/{acto['actoliturgicoid']}", json=body, headers=auth)
+    assert r.status_code == 200, r.get_json()
+    _assert_sentencias(enviadas, 2 if con_horario else 1)
+
+
+def test_create_horario(client, auth, datos, fecha, sentencias):
+    acto = _acto(client, auth, datos)
+    with sentencias() as enviadas:
+        r = client.post(f'{API}/horarios', json={
+            'actoliturgicoid': acto['actoliturgicoid'], 'h_fecha': fecha.isoformat(), 'h_hora': '08:00'
+        }, headers=auth)
+    assert r.status_code == 201
+    _assert_sentencias(enviadas, 2)
+
+
+@pytest.mark.parametrize('con_pago', [False, True])
+def test_create_reserva(client, auth, datos, fecha, sentencias, con_pago):
+    horario = _horario(client, auth, _acto(client, auth, datos), fecha, '09:00')
+    body = {'horarioid': horario['horarioid'], 'persona_nombre': 'Reserva de prueba'}
+    if con_pago:
+        body.update({'pago_medio': 'Efectivo', 'pago_monto': 10, 'pago_descripcion': 'Prueba'})
+    with sentencias() as enviadas:
+        r = client.post(f'{API}/reservas', json=body, headers=auth)
+    assert r.status_code == 201, r.get_json()
+    assert bool(r.get_json()['pago']) == con_pago
+    _assert_sentencias(enviadas, 1)
+
+
+def test_update_reserva(client, auth, datos, fecha, sentencias):
+    acto = _acto(client, auth, datos)
+    horario = _horario(client, auth, acto, fecha, '10:00')
+    destino = _horario(client, auth, acto, fecha + timedelta(days=1), '10:00')
+    reserva = _reserva(client, auth, horario)
+    with sentencias() as enviadas:
+        r = client.put(f"{API}/reservas/{reserva['reservaid']}", json={
+            'horarioid': destino['horarioid'], 'persona_nombre': 'Otra persona'
+        }, headers=auth)
+    assert r.status_code == 200, r.get_json()
+    assert r.get_json()['item']['horarioid'] == destino['horarioid']
+    _assert_sentencias(enviadas, 1)
@@ -0,0 +1,91 @@
+"""POST /api/liturgical/recurrencias y /recurrencias/expandir: validación del horizonte,
+actos borrados y alcance por parroquia"""
+import uuid
+
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import text
+
+from app import db
+
+API = '/api/liturgical'
+
+
+@pytest.fixture
+def acto(client, auth, datos):
+    r = client.post(f'{API}/actos', json={
+        'parroquiaid': datos['parroquiaid'], 'act_nombre': 'misa', 'act_titulo': 'Recurrente'
+    }, headers=auth)
+    assert r.status_code == 201, r.get_json()
+    return r.get_json()['item']
+
+
+def _regla(acto, fecha, **extra):
+    return {
+        'actoliturgicoid': acto['actoliturgicoid'], 'frecuencia': 'semanal',
+        'dia_semana': fecha.weekday(), 'h_hora': '18:00', 'fecha_inicio': fecha.isoformat(), **extra
+    }
+
+
+def test_create_recurrencia_horizonte_excedido(client, auth, acto, fecha):
+    r = client.post(f'{API}/recurrencias', json=_regla(acto, fecha, desde=fecha.isoformat(), hasta='2999-12-31'),
+                    headers=auth)
+    assert r.status_code == 400
+    assert 'días' in r.get_json()['error']
+
+
+def test_expandir_horizonte_excedido(client, auth, fecha):
+    r = client.post(f'{API}/recurrencias/expandir', json={'desde': fecha.isoformat(), 'hasta': '2999-12-31'},
+                    headers=auth)
+    assert r.status_code == 400
+
+
+def test_create_recurrencia(client, auth, acto, fecha):
+    # Sólo esta fecha: la regla semanal no pisa los días de otras pruebas
+    r = client.post(f'{API}/recurrencias', json=_regla(acto, fecha, desde=fecha.isoformat(), hasta=fecha.isoformat()),
+                    headers=auth)
+    assert r.status_code == 201, r.get_json()
+    assert r.get_json()['expansion']['creados'] == 1
+
+
+@pytest.fixture
+def auth_otra_parroquia(datos):
+    """Token de un usuario restringido (rol sin 'seguridad') a otra parroquia"""
+    marca = uuid.uuid4().hex[:8]
+    parroquiaid = db.session.execute(text("""
+        INSERT INTO public.parroquia (par_nombre, par_direccion, par_telefono1, distritoid)
+        VALUES (:n, 'Calle de prueba 2', '000000000', :d)
+        RETURNING parroquiaid
+    """), {'n': f'Otra parroquia {marca}', 'd': datos['distritoid']}).scalar()
+    userid = db.session.execute(text("""
+        INSERT INTO public.users (name, email, password_hash, role)
+        VALUES ('Restringido', :email, 'x', 'sin_rol')
+        RETURNING id
+    """), {'email': f'restringido-{marca}@example.com'}).scalar()
+    db.session.execute(text("""
+        INSERT INTO public.persona (userid, per_nombres, per_apellidos, fecha_nacimiento, parroquiaid)
+        VALUES (:u, 'Usuario', 'Restringido', '1990-01-01', :p)
+    """), {'u': userid, 'p': parroquiaid})
+    db.session.commit()
+
+    yield {'Authorization': f'Bearer {create_access_token(identity=str(userid))}'}
+
+    db.session.rollback()
+    db.session.execute(text('DELETE FROM public.persona WHERE userid = :u'), {'u': userid})
+    db.session.execute(text('DELETE FROM public.users WHERE id = :u'), {'u': userid})
+    db.session.execute(text('DELETE FROM public.parroquia WHERE parroquiaid = :p'), {'p': parroquiaid})
+    db.session.commit()
+
+
+def test_create_recurrencia_acto_borrado(client, auth, acto, fecha):
+    assert client.delete(f"{API}/actos/{acto['actoliturgicoid']}", headers=auth).status_code == 200
+    r = client.post(f'{API}/recurrencias', json=_regla(acto, fecha), headers=auth)
+    assert r.status_code == 404
+
+
+def test_create_recurrencia_otra_parroquia(client, auth_otra_parroquia, acto, fecha):
+    r = client.post(f'{API}/recurrencias', json=_regla(acto, fecha), headers=auth_otra_parroquia)
+    assert r.status_code == 404
+    assert db.session.execute(text(
+        'SELECT COUNT(*) FROM public.horario_recurrencia WHERE actoliturgicoid = :a'
+    ), {'a': acto['actoliturgicoid']}).scalar() == 0
@@ -0,0 +1,94 @@
+"""POST /api/liturgical/reservas/batch: reservas de grupo en una transacción"""
+import pytest
+from sqlalchemy import text
+
+from app import db
+
+API = '/api/liturgical'
+
+
+@pytest.fixture
+def horario(client, auth, datos, fecha):
+    def crear(capacidad=None):
+        r = client.post(f'{API}/actos', json={
+            'parroquiaid': datos['parroquiaid'], 'act_nombre': 'bautismo', 'act_titulo': 'Bautizos'
+        }, headers=auth)
+        assert r.status_code == 201, r.get_json()
+        r = client.post(f'{API}/horarios', json={
+            'actoliturgicoid': r.get_json()['item']['actoliturgicoid'],
+            'h_fecha': fecha.isoformat(), 'h_hora': '16:00', 'h_capacidad': capacidad
+        }, headers=auth)
+        assert r.status_code == 201, r.get_json()
+        return r.get_json()['item']
+    return crear
+
+
+@pytest.fixture
+def persona(datos):
+    personaid = db.session.execute(text("""
+        INSERT INTO public.persona (per_nombres, per_apellidos, fecha_nacimiento, parroquiaid)
+        VALUES ('José', 'Pérez Lote', '2000-01-01', :p)
+        RETURNING personaid
+    """), {'p': datos['parroquiaid']}).scalar()
+    db.session.commit()
+    yield personaid
+    db.session.rollback()
+    db.session.execute(text('DELETE FROM public.persona WHERE personaid = :id'), {'id': personaid})
+    db.session.commit()
+
+
+def _batch(client, auth, horario, reservas):
+    return client.post(f'{API}/reservas/batch', json={'horarioid': horario['horarioid'], 'reservas': reservas},
+                       headers=auth)
+
+
+def _reservas(horario):
+    return db.session.execute(text(
+        'SELECT COUNT(*) FROM public.reserva WHERE horarioid = :id'
+    ), {'id': horario['horarioid']}).scalar()
+
+
+def test_batch(client, auth, horario, persona):
+    h = horario()
+    r = _batch(client, auth, h, [
+        {'persona_nombre': 'Ana Lote'},
+        {'persona_nombre': 'jose PEREZ lote', 'pago_medio': 'Efectivo', 'pago_monto': 20},
+        {'persona_nombre': 'Luis Lote', 'res_descripcion': 'Padrino'},
+    ])
+    assert r.status_code == 201, r.get_json()
+    cuerpo = r.get_json()
+    assert [i['persona_nombre'] for i in cuerpo['items']] == ['Ana Lote', 'José Pérez Lote', 'Luis Lote']
+    assert cuerpo['items'][1]['personaid'] == persona
+    assert cuerpo['items'][1]['pago_estado'] == 'pagado'
+    assert cuerpo['resumen'] == {'reservas': 3, 'personas_registradas': 1, 'pagos': 1}
+
+
+def test_batch_item_invalido(client, auth, horario):
+    h = horario()
+    r = _batch(client, auth, h, [
+        {'persona_nombre': 'Ana Lote'},
+        {'persona_nombre': ''},
+        {'persona_nombre': 'Luis Lote', 'pago_medio': 'Cheque', 'pago_monto': 5},
+    ])
+    assert r.status_code == 400
+    assert [e['indice'] for e in r.get_json()['errores']] == [1, 2]
+    assert _reservas(h) == 0
+
+
+def test_batch_sin_cupo(client, auth, horario):
+    h = horario(capacidad=2)
+    pagos = db.session.execute(text('SELECT COUNT(*) FROM public.pago')).scalar()
+    r = _batch(client, auth, h, [
+        {'persona_nombre': 'Ana Lote', 'pago_medio': 'Efectivo', 'pago_monto': 20},
+        {'persona_nombre': 'Luis Lote'},
+        {'persona_nombre': 'Eva Lote'},
+    ])
+    assert r.status_code == 409
+    # Ni reservas ni pagos: todo el lote se revierte
+    assert _reservas(h) == 0
+    assert db.session.execute(text('SELECT COUNT(*) FROM public.pago')).scalar() == pagos
+
+
+def test_batch_horario_inexistente(client, auth):
+    r = _batch(client, auth, {'horarioid': 2 ** 31 - 1}, [{'persona_nombre': 'Ana Lote'}])
+    assert r.status_code == 404
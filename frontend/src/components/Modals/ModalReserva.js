@@ -26,24 +26,12 @@ const getFallbackCoords = (distrito) => {
   return fallbacks[distrito] || fallbacks.default;
 };
 
-const geocodeParroquia = async (parroquia) => {
-  if (!parroquia) return getFallbackCoords('default');
-  const cacheKey = `coords_${parroquia.parroquiaid}`;
-  const cached = localStorage.getItem(cacheKey);
-  if (cached) return JSON.parse(cached);
-  try {
-    const query = `${parroquia.par_direccion || ''}, ${parroquia.dis_nombre || ''}, Lambayeque, Perú`;
-    const res = await fetch(`https://nominatim.openstreetmap.org/search?format=json&q=${encodeURIComponent(query)}&limit=1`);
-    const data = await res.json();
-    if (data && data.length) {
-      const coords = { lat: parseFloat(data[0].lat), lng: parseFloat(data[0].lon) };
-      localStorage.setItem(cacheKey, JSON.stringify(coords));
-      return coords;
-    }
-  } catch (e) {
-    // ignore
+// Coordenadas de la parroquia: vienen geocodificadas desde el backend (/api/parroquias)
+const getParroquiaCoords = (parroquia) => {
+  if (parroquia && parroquia.par_latitud != null && parroquia.par_longitud != null) {
+    return { lat: parroquia.par_latitud, lng: parroquia.par_longitud };
   }
-  return getFallbackCoords(parroquia.dis_nombre);
+  return getFallbackCoords(parroquia?.dis_nombre);
 };
 
 const createCustomIcon = (label) => L.divIcon({
@@ -139,20 +127,13 @@ const ModalReserva = ({ isOpen, onClose, initialValues = {}, onSubmit, authFetch
     }
   }, [parroquias, data.parroquiaid, initialValues?.parroquiaid]);
 
-  // geocode parroquias
+  // coordenadas de parroquias (geocodificadas en backend)
   useEffect(() => {
     if (!parroquias.length) return;
-    let mounted = true;
-    const geocodeAll = async () => {
-      const results = await Promise.all(parroquias.map(async p => ({ id: p.parroquiaid, coords: await geocodeParroquia(p), parroquia: p })));
-      if (!mounted) return;
-      const map = {};
-      results.forEach(r => { map[r.id] = { coords: r.coords, parroquia: r.parroquia }; });
-      setCoordsMap(map);
-      setMapKey(k => k + 1);
-    };
-    geocodeAll();
-    return () => { mounted = false; };
+    const map = {};
+    parroquias.forEach(p => { map[p.parroquiaid] = { coords: getParroquiaCoords(p), parroquia: p }; });
+    setCoordsMap(map);
+    setMapKey(k => k + 1);
   }, [parroquias]);
 
   const loadHorarios = useCallback(async (parroquiaId = null, fecha = null) => {
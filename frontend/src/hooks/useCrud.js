@@ -8,6 +8,8 @@ export default function useCrud(baseUrl, options = {}) {
   const [items, setItems] = useState([]);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
+  // Cursor de la siguiente página (sólo endpoints paginados devuelven next_cursor)
+  const [nextCursor, setNextCursor] = useState(null);
   const didFetchRef = useRef(false);
 
   const list = useCallback(async () => {
@@ -19,6 +21,7 @@ export default function useCrud(baseUrl, options = {}) {
       const data = await resp.json();
       const key = Object.keys(data).find(k => Array.isArray(data[k])) || 'items';
       setItems(data[key] || []);
+      setNextCursor(data.next_cursor || null);
       return { success: true, data: data[key] || [] };
     } catch (e) {
       setError(e.message || 'Error desconocido');
@@ -28,6 +31,26 @@ export default function useCrud(baseUrl, options = {}) {
     }
   }, [authFetch, baseUrl]);
 
+  const loadMore = useCallback(async () => {
+    if (!nextCursor) return { success: true, data: [] };
+    try {
+      setLoading(true);
+      const sep = baseUrl.includes('?') ? '&' : '?';
+      const resp = await authFetch(`${baseUrl}${sep}cursor=${encodeURIComponent(nextCursor)}`);
+      if (!resp.ok) throw new Error('Error al listar');
+      const data = await resp.json();
+      const key = Object.keys(data).find(k => Array.isArray(data[k])) || 'items';
+      setItems(prev => [...prev, ...(data[key] || [])]);
+      setNextCursor(data.next_cursor || null);
+      return { success: true, data: data[key] || [] };
+    } catch (e) {
+      setError(e.message || 'Error desconocido');
+      return { success: false, error: e.message };
+    } finally {
+      setLoading(false);
+    }
+  }, [authFetch, baseUrl, nextCursor]);
+
   const createItem = useCallback(async (payload) => {
     try {
       const resp = await authFetch(baseUrl, {
@@ -110,7 +133,7 @@ export default function useCrud(baseUrl, options = {}) {
     }
   }, [authFetch, baseUrl]);
 
-  const api = useMemo(() => ({ list, createItem, updateItem, removeItem, updateStatus }), [list, createItem, updateItem, removeItem, updateStatus]);
+  const api = useMemo(() => ({ list, loadMore, createItem, updateItem, removeItem, updateStatus }), [list, loadMore, createItem, updateItem, removeItem, updateStatus]);
 
   useEffect(() => {
     if (!autoList) return;
@@ -119,5 +142,5 @@ export default function useCrud(baseUrl, options = {}) {
     list();
   }, [list, autoList]);
 
-  return { items, setItems, loading, error, ...api };
+  return { items, setItems, loading, error, hasMore: !!nextCursor, ...api };
 }
@@ -2,7 +2,9 @@
 import { useState, useEffect, useCallback } from 'react';
 import { useAuth } from '../contexts/AuthContext';
 
-export default function useLiturgicalCalendar() {
+// range opcional { from, to } en YYYY-MM-DD; sin rango el backend usa -30/+60 días
+export default function useLiturgicalCalendar(range = {}) {
+  const { from, to } = range;
   const [items, setItems] = useState([]);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
@@ -12,7 +14,11 @@ export default function useLiturgicalCalendar() {
     setLoading(true);
     setError(null);
     try {
-      const response = await authFetch('http://localhost:5000/api/liturgical/calendario');
+      const params = new URLSearchParams();
+      if (from) params.set('from', from);
+      if (to) params.set('to', to);
+      const qs = params.toString();
+      const response = await authFetch(`http://localhost:5000/api/liturgical/calendario${qs ? `?${qs}` : ''}`);
       const data = await response.json();
       setItems(data.items || []);
     } catch (err) {
@@ -21,7 +27,7 @@ export default function useLiturgicalCalendar() {
     } finally {
       setLoading(false);
     }
-  }, [authFetch]);
+  }, [authFetch, from, to]);
 
   const fetchHorariosByDate = useCallback(async (date) => {
     setLoading(true);
@@ -28,33 +28,12 @@ L.Icon.Default.mergeOptions({
   shadowUrl: 'https://cdnjs.cloudflare.com/ajax/libs/leaflet/1.7.1/images/marker-shadow.png',
 });
 
-// Función de geocoding con Nominatim y cache local
-const geocodeParroquia = async (parroquia) => {
-  const cacheKey = `coords_${parroquia.parroquiaid}`;
-  const cached = localStorage.getItem(cacheKey);
-  if (cached) {
-    return JSON.parse(cached);
+// Coordenadas de la parroquia: vienen geocodificadas desde el backend (/api/parroquias)
+const getParroquiaCoords = (parroquia) => {
+  if (parroquia && parroquia.par_latitud != null && parroquia.par_longitud != null) {
+    return { lat: parroquia.par_latitud, lng: parroquia.par_longitud };
   }
-
-  try {
-    const query = `${parroquia.par_direccion}, ${parroquia.dis_nombre}, Lambayeque, Perú`;
-    const encodedQuery = encodeURIComponent(query);
-    const response = await fetch(`https://nominatim.openstreetmap.org/search?format=json&q=${encodedQuery}&limit=1`);
-    const data = await response.json();
-
-    if (data && data.length > 0) {
-      const coords = {
-        lat: parseFloat(data[0].lat),
-        lng: parseFloat(data[0].lon)
-      };
-      localStorage.setItem(cacheKey, JSON.stringify(coords));
-      return coords;
-    }
-  } catch (error) {
-    console.error('Error en geocoding:', error);
-  }
-
-  return getFallbackCoords(parroquia.dis_nombre);
+  return getFallbackCoords(parroquia?.dis_nombre);
 };
 
 const getFallbackCoords = (distrito) => {
@@ -100,12 +79,23 @@ const localizer = dateFnsLocalizer({
   locales,
 });
 
+// Rango visible del mes (con una semana de margen para las celdas de meses vecinos)
+const toISODate = (d) => {
+  const pad = (n) => String(n).padStart(2, '0');
+  return `${d.getFullYear()}-${pad(d.getMonth() + 1)}-${pad(d.getDate())}`;
+};
+const monthRange = (d) => ({
+  from: toISODate(new Date(d.getFullYear(), d.getMonth(), 1 - 7)),
+  to: toISODate(new Date(d.getFullYear(), d.getMonth() + 1, 7)),
+});
+
 const Horarios = () => {
-  const { items, loading, error, refetch } = useLiturgicalCalendar();
-  const { createItem } = useLiturgicalReservations({ autoList: false });
-  const { user, authFetch } = useAuth();
   const [view, setView] = useState('month');
   const [date, setDate] = useState(new Date());
+  const range = useMemo(() => monthRange(date), [date]);
+  const { items, loading, error, refetch } = useLiturgicalCalendar(range);
+  const { createItem } = useLiturgicalReservations({ autoList: false });
+  const { user, authFetch } = useAuth();
   const navigate = useNavigate();
   const [confirmOpen, setConfirmOpen] = useState(false);
   const [pendingReservation, setPendingReservation] = useState(null);
@@ -175,22 +165,13 @@ const Horarios = () => {
     loadPersonas();
   }, [authFetch]);
 
-  // Geocoding de parroquias
+  // Coordenadas de parroquias (sin geocoding en el navegador)
   useEffect(() => {
-    const geocodeAllParroquias = async () => {
-      if (!parroquias.length) return;
-      const coordsPromises = parroquias.map(async (parroquia) => {
-        const coords = await geocodeParroquia(parroquia);
-        return { parroquiaid: parroquia.parroquiaid, coords, parroquia };
-      });
-      const results = await Promise.all(coordsPromises);
-      const coordsMap = {};
-      results.forEach(({ parroquiaid, coords, parroquia }) => {
-        coordsMap[parroquiaid] = { coords, parroquia };
-      });
-      setParroquiasCoords(coordsMap);
-    };
-    geocodeAllParroquias();
+    const coordsMap = {};
+    parroquias.forEach((parroquia) => {
+      coordsMap[parroquia.parroquiaid] = { coords: getParroquiaCoords(parroquia), parroquia };
+    });
+    setParroquiasCoords(coordsMap);
   }, [parroquias]);
 
   // Cargar horarios
@@ -1013,7 +994,7 @@ const Horarios = () => {
   };
 
   // Estado de carga
-  if (loading) {
+  if (loading && items.length === 0) {
     return (
       <div className="space-y-6">
         <PageHeader
@@ -25,48 +25,12 @@ L.Icon.Default.mergeOptions({
   shadowUrl: 'https://cdnjs.cloudflare.com/ajax/libs/leaflet/1.7.1/images/marker-shadow.png',
 });
 
-// Función de geocoding con Nominatim y cache local
-const geocodeParroquia = async (parroquia) => {
-  const cacheKey = `coords_${parroquia.parroquiaid}`;
-
-  // Verificar cache local primero
-  const cached = localStorage.getItem(cacheKey);
-  if (cached) {
-    console.log('Usando coordenadas del cache para:', parroquia.par_nombre);
-    return JSON.parse(cached);
+// Coordenadas de la parroquia: vienen geocodificadas desde el backend (/api/parroquias)
+const getParroquiaCoords = (parroquia) => {
+  if (parroquia && parroquia.par_latitud != null && parroquia.par_longitud != null) {
+    return { lat: parroquia.par_latitud, lng: parroquia.par_longitud };
   }
-
-  // Geocoding con Nominatim
-  try {
-    const query = `${parroquia.par_direccion}, ${parroquia.dis_nombre}, Lambayeque, Perú`;
-    const encodedQuery = encodeURIComponent(query);
-
-    console.log('Geocoding parroquia:', parroquia.par_nombre, '- Query:', query);
-
-    const response = await fetch(`https://nominatim.openstreetmap.org/search?format=json&q=${encodedQuery}&limit=1`);
-    const data = await response.json();
-
-    if (data && data.length > 0) {
-      const coords = {
-        lat: parseFloat(data[0].lat),
-        lng: parseFloat(data[0].lon)
-      };
-
-      console.log('Geocoding exitoso para', parroquia.par_nombre, ':', coords);
-
-      // Guardar en cache local
-      localStorage.setItem(cacheKey, JSON.stringify(coords));
-
-      return coords;
-    } else {
-      console.log('Geocoding falló para', parroquia.par_nombre, '- usando coordenadas por defecto');
-    }
-  } catch (error) {
-    console.error('Error en geocoding para', parroquia.par_nombre, ':', error);
-  }
-
-  // Fallback a coordenadas hardcodeadas por distrito
-  return getFallbackCoords(parroquia.dis_nombre);
+  return getFallbackCoords(parroquia?.dis_nombre);
 };
 
 // Coordenadas de fallback por distrito
@@ -107,7 +71,7 @@ const createCustomIcon = (label) => {
 };
 
 const Reservacion = () => {
-  const { items, loading, error, createItem, updateItem, removeItem } = useLiturgicalReservations({ autoList: true });
+  const { items, loading, error, createItem, updateItem, removeItem, hasMore, loadMore } = useLiturgicalReservations({ autoList: true });
   const { authFetch } = useAuth();
   const [searchParams, setSearchParams] = useSearchParams();
   const [modalOpen, setModalOpen] = useState(false);
@@ -122,7 +86,6 @@ const Reservacion = () => {
   // Estado para coordenadas y control del mapa (usado por el efecto de geocoding)
   const [parroquiasCoords, setParroquiasCoords] = useState({});
   const [mapKey, setMapKey] = useState(0);
-  // Hook personalizado para geocoding de parroquias
   // Estado para modal de pago
   const [paymentModalOpen, setPaymentModalOpen] = useState(false);
   const [paymentData, setPaymentData] = useState({
@@ -135,27 +98,13 @@ const Reservacion = () => {
     cardHolder: ''
   });
 
-  // Geocoding de todas las parroquias cuando se cargan
+  // Coordenadas de todas las parroquias cuando se cargan (geocodificadas en backend)
   useEffect(() => {
-    const geocodeAllParroquias = async () => {
-      if (!parroquias.length) return;
-
-      const coordsPromises = parroquias.map(async (parroquia) => {
-        const coords = await geocodeParroquia(parroquia);
-        return { parroquiaid: parroquia.parroquiaid, coords, parroquia };
-      });
-
-      const results = await Promise.all(coordsPromises);
-      const coordsMap = {};
-      results.forEach(({ parroquiaid, coords, parroquia }) => {
-        coordsMap[parroquiaid] = { coords, parroquia };
-      });
-
-      setParroquiasCoords(coordsMap);
-      console.log('Geocoding completado para todas las parroquias:', coordsMap);
-    };
-
-    geocodeAllParroquias();
+    const coordsMap = {};
+    parroquias.forEach((parroquia) => {
+      coordsMap[parroquia.parroquiaid] = { coords: getParroquiaCoords(parroquia), parroquia };
+    });
+    setParroquiasCoords(coordsMap);
   }, [parroquias]);
   useEffect(() => {
     const loadParroquias = async () => {
@@ -1268,6 +1217,19 @@ const Reservacion = () => {
             />
           );
         })()}
+        {hasMore && (
+          <div className="flex justify-center mt-4">
+            <button
+              type="button"
+              onClick={loadMore}
+              disabled={loading}
+              className="px-4 py-2 rounded-xl font-medium transition-all hover:brightness-110 disabled:opacity-50"
+              style={{ border: '1px solid var(--border)', color: 'var(--text)' }}
+            >
+              {loading ? 'Cargando...' : 'Cargar más reservas'}
+            </button>
+          </div>
+        )}
       </Card>
 
       {/* Modal reutilizado para nueva reserva (mapa + formulario) */}